@@ -25,6 +25,15 @@ if config.config_file_name is not None:
 # for 'autogenerate' support
 target_metadata = Base.metadata
 
+# Search index objects managed by migrations / flashcard_search rather than the models;
+# keep autogenerate from dropping them
+SEARCH_INDEX_OBJECTS = {"search_vector", "ix_flashcards_search_vector"}
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    return name not in SEARCH_INDEX_OBJECTS and not name.startswith("flashcards_fts")
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -47,6 +56,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -70,7 +80,7 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata, include_object=include_object
         )
 
         with context.begin_transaction():
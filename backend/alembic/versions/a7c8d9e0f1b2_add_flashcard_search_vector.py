@@ -0,0 +1,40 @@
+"""add flashcard search vector
+
+Revision ID: a7c8d9e0f1b2
+Revises: e6a7b8c9d0f1
+Create Date: 2026-10-17 16:40:12.295174
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c8d9e0f1b2'
+down_revision: Union[str, None] = 'e6a7b8c9d0f1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Postgres only; SQLite gets an FTS5 table from flashcard_search.ensure_index() at startup
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute(
+        "ALTER TABLE flashcards ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('english', coalesce(question, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(answer, '')), 'B')"
+        ") STORED"
+    )
+    op.create_index('ix_flashcards_search_vector', 'flashcards', ['search_vector'], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.drop_index('ix_flashcards_search_vector', table_name='flashcards')
+    op.drop_column('flashcards', 'search_vector')
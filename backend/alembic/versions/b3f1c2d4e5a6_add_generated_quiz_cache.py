@@ -0,0 +1,42 @@
+"""add generated quiz cache
+
+Revision ID: b3f1c2d4e5a6
+Revises: 6a6b99bc3d46
+Create Date: 2026-10-16 09:12:41.218734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3f1c2d4e5a6'
+down_revision: Union[str, None] = '6a6b99bc3d46'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'generated_quiz_cache',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('cache_key', sa.String(length=64), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_generated_quiz_cache_id'), 'generated_quiz_cache', ['id'], unique=False)
+    op.create_index(op.f('ix_generated_quiz_cache_cache_key'), 'generated_quiz_cache', ['cache_key'], unique=True)
+    op.create_index(op.f('ix_generated_quiz_cache_expires_at'), 'generated_quiz_cache', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_generated_quiz_cache_expires_at'), table_name='generated_quiz_cache')
+    op.drop_index(op.f('ix_generated_quiz_cache_cache_key'), table_name='generated_quiz_cache')
+    op.drop_index(op.f('ix_generated_quiz_cache_id'), table_name='generated_quiz_cache')
+    op.drop_table('generated_quiz_cache')
@@ -0,0 +1,32 @@
+"""add question pool columns
+
+Revision ID: c4a2d5e6f7b8
+Revises: b3f1c2d4e5a6
+Create Date: 2026-10-16 10:03:17.552019
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4a2d5e6f7b8'
+down_revision: Union[str, None] = 'b3f1c2d4e5a6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('quiz_questions', sa.Column('explanation', sa.Text(), nullable=True))
+    op.add_column('quiz_questions', sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True))
+    op.create_index('ix_quiz_questions_quiz_id_flashcard_id', 'quiz_questions', ['quiz_id', 'flashcard_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_quiz_questions_quiz_id_flashcard_id', table_name='quiz_questions')
+    op.drop_column('quiz_questions', 'created_at')
+    op.drop_column('quiz_questions', 'explanation')
@@ -0,0 +1,34 @@
+"""add generation job expiry
+
+Revision ID: d5e3f6a7b8c9
+Revises: c4a2d5e6f7b8
+Create Date: 2026-10-16 23:48:05.118342
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5e3f6a7b8c9'
+down_revision: Union[str, None] = 'c4a2d5e6f7b8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('documents', sa.Column('expires_at', sa.DateTime(), nullable=True))
+    op.create_index(op.f('ix_documents_expires_at'), 'documents', ['expires_at'], unique=False)
+    op.add_column('quizzes', sa.Column('expires_at', sa.DateTime(), nullable=True))
+    op.create_index(op.f('ix_quizzes_expires_at'), 'quizzes', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_quizzes_expires_at'), table_name='quizzes')
+    op.drop_column('quizzes', 'expires_at')
+    op.drop_index(op.f('ix_documents_expires_at'), table_name='documents')
+    op.drop_column('documents', 'expires_at')
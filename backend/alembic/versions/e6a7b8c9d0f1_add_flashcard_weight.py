@@ -0,0 +1,28 @@
+"""add flashcard weight
+
+Revision ID: e6a7b8c9d0f1
+Revises: d5e3f6a7b8c9
+Create Date: 2026-10-17 10:12:41.507236
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6a7b8c9d0f1'
+down_revision: Union[str, None] = 'd5e3f6a7b8c9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('flashcards', sa.Column('weight', sa.Float(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('flashcards', 'weight')
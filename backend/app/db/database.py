@@ -1,4 +1,7 @@
-from sqlalchemy import create_engine
+import math
+import sqlite3
+
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from ..utils.config import DATABASE_URL
@@ -7,6 +10,15 @@ from ..utils.config import DATABASE_URL
 # The connect_args is for SQLite only to allow multithreading
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {})
 
+if "sqlite" in DATABASE_URL:
+    @event.listens_for(engine, "connect")
+    def _register_sqlite_functions(dbapi_connection, connection_record):
+        # Stratified sampling uses ln(), which SQLite only has when built with math functions
+        try:
+            dbapi_connection.execute("SELECT ln(1)")
+        except sqlite3.OperationalError:
+            dbapi_connection.create_function("ln", 1, math.log, deterministic=True)
+
 # Create session maker
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
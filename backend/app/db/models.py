@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, ARRAY, JSON, ForeignKey, DateTime, Boolean, Float
+from sqlalchemy import Column, Integer, String, Text, ARRAY, JSON, ForeignKey, DateTime, Boolean, Float, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from datetime import datetime, timedelta
@@ -27,6 +27,8 @@ class Document(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), nullable=False)
     content = Column(Text, nullable=False)
+    # Set for documents uploaded through generation jobs; deleted by the job sweeper once past
+    expires_at = Column(DateTime, nullable=True, index=True)
 
 class Chapter(Base):
     __tablename__ = "chapters"
@@ -51,8 +53,11 @@ class Flashcard(Base):
     id = Column(Integer, primary_key=True, index=True)
     question = Column(Text, nullable=False)
     answer = Column(Text, nullable=False)
-    tags = Column(ARRAY(String), nullable=True)
+    # JSON on SQLite (local runs and benchmarks), which has no ARRAY type
+    tags = Column(ARRAY(String).with_variant(JSON(), "sqlite"), nullable=True)
     category = Column(String(100), nullable=True)
+    # Relative chance of being drawn into a quiz (see flashcard_sampler / stratified_sampling)
+    weight = Column(Float, nullable=False, default=1.0, server_default="1")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # User relationship
@@ -73,6 +78,8 @@ class Quiz(Base):
     title = Column(String(255), nullable=False)
     description = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Set for quizzes produced by generation jobs; deleted by the job sweeper once past
+    expires_at = Column(DateTime, nullable=True, index=True)
     
     # User relationship
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
@@ -83,6 +90,10 @@ class Quiz(Base):
 
 class QuizQuestion(Base):
     __tablename__ = "quiz_questions"
+    __table_args__ = (
+        # Question pool lookups filter by (pool quiz, flashcard)
+        Index("ix_quiz_questions_quiz_id_flashcard_id", "quiz_id", "flashcard_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     quiz_id = Column(Integer, ForeignKey("quizzes.id"))
@@ -91,6 +102,8 @@ class QuizQuestion(Base):
     question_type = Column(String(50), nullable=False)  # multiple_choice, true_false, short_answer
     options = Column(JSON, nullable=True)  # For multiple-choice questions
     correct_answer = Column(Text, nullable=False)
+    explanation = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
     quiz = relationship("Quiz", back_populates="questions")
@@ -198,4 +211,14 @@ class StudySession(Base):
     session_duration_seconds = Column(Integer, nullable=True)
     
     # Relationships
-    user = relationship("User")
\ No newline at end of file
+    user = relationship("User")
+
+class GeneratedQuizCache(Base):
+    """Persistent tier of the content-addressed quiz generation cache"""
+    __tablename__ = "generated_quiz_cache"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    cache_key = Column(String(64), unique=True, nullable=False, index=True)  # sha256 of the request
+    payload = Column(Text, nullable=False)  # JSON-encoded generation result
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime, nullable=False, index=True)
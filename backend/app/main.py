@@ -4,6 +4,12 @@ import logging
 from .db import database, models
 from .routes import api
 from .services.chapter_service import initialize_chapters
+from .services.catalog import catalog
+from .services.flashcard_search import flashcard_search
+from .services.ai_providers import close_provider_clients
+from .services.question_pool import question_pool
+from .services.generation_jobs import generation_jobs
+from .utils import config
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -31,11 +37,34 @@ async def startup_event():
         logger.error(f"Failed to initialize chapters: {e}")
         # Don't fail startup if chapter initialization fails
         
+    try:
+        # Creates the SQLite FTS5 table on first run; Postgres gets its index from migrations
+        flashcard_search.ensure_index(database.engine)
+    except Exception as e:
+        logger.error(f"Failed to set up flashcard search: {e}")
+    
+    try:
+        # Warm the catalog snapshot so the first chapter/flashcard reads skip the database
+        catalog.load(db)
+    except Exception as e:
+        logger.error(f"Failed to load catalog snapshot: {e}")
+        
     finally:
         db.close()
     
+    if config.QUESTION_POOL_ENABLED and config.QUESTION_POOL_BUILD_ON_STARTUP:
+        question_pool.start_background_build()
+        logger.info("Started background question pool build")
+    
     logger.info("AI Quiz Generation API startup completed")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release shared resources on shutdown"""
+    await question_pool.stop()
+    await generation_jobs.stop()
+    await close_provider_clients()
+
 # CORS (Cross-Origin Resource Sharing)
 app.add_middleware(
     CORSMiddleware,
@@ -43,6 +72,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
+    expose_headers=["ETag", "X-Next-Cursor"],  # Catalog revalidation and keyset paging
 )
 
 # Include the API router. Using a prefix is good practice for versioning.
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import List, Literal, Optional
 from datetime import datetime
 
 # Pydantic models for Chapters
@@ -26,10 +26,14 @@ class FlashcardBase(BaseModel):
     tags: Optional[List[str]] = None
     category: Optional[str] = None
     chapter_id: Optional[int] = None
+    weight: float = Field(1.0, gt=0)  # Relative chance of being drawn into a quiz
 
 class FlashcardCreate(FlashcardBase):
     pass
 
+class FlashcardUpdate(FlashcardBase):
+    weight: Optional[float] = Field(None, gt=0)  # Left unchanged when omitted
+
 class Flashcard(FlashcardBase):
     id: int
     chapter: Optional[Chapter] = None
@@ -37,6 +41,9 @@ class Flashcard(FlashcardBase):
     class Config:
         orm_mode = True
 
+class FlashcardSearchResult(Flashcard):
+    relevance: float  # Higher is more relevant; only comparable within one search
+
 class FlashcardsImport(BaseModel):
     flashcards: List[FlashcardCreate]
 
@@ -45,6 +52,16 @@ class QuizRequest(BaseModel):
     category: Optional[str] = None
     count: int = 10
     question_types: List[str] = ["multiple_choice", "true_false"]
+    # "ai", "compact" (AI writes only distractors for the known answers) or "local" (instant, no LLM)
+    mode: Literal["ai", "compact", "local"] = "ai"
+    # Makes the flashcard selection reproducible
+    seed: Optional[int] = None
+
+class ExplanationRequest(BaseModel):
+    question: str
+    answer: str
+    options: Optional[List[str]] = None
+    flashcard_id: Optional[int] = None  # Explains the card itself and shares the cached entry across its variants
 
 # Pydantic models for Users
 class UserBase(BaseModel):
@@ -1,12 +1,17 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, UploadFile, File, Request, HTTPException, Query, BackgroundTasks
+from fastapi import APIRouter, Depends, UploadFile, File, Request, Response, HTTPException, Query, BackgroundTasks
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
 from ..db.database import get_db
 from ..models import schemas
 from ..services import service
 from ..services import chapter_service
+from ..services.catalog import CatalogSnapshot, catalog, flashcard_sort_key
 from ..db import models as db_models
+from ..utils.sse import SSE_HEADERS, sse_stream
+from ..utils.etag import not_modified
+from ..utils.pagination import decode_cursor, encode_cursor
 
 router = APIRouter()
 
@@ -22,10 +27,16 @@ async def health_check():
 #
 @router.post("/extract-text")
 @router.post("/extract-text/")
-async def extract_text_endpoint(file: UploadFile = File(...), db: Session = Depends(get_db)):
+async def extract_text_endpoint(
+    http_request: Request,
+    file: UploadFile = File(...),
+    current_user: Optional[db_models.User] = Depends(service.get_current_user),
+    db: Session = Depends(get_db)
+):
     # This endpoint now handles file upload and calls the service for extraction and quiz generation.
+    principal = service.generation_principal(db, current_user, http_request)
     extraction_result = await service.extract_text_from_file(db, file)
-    quiz_result = await service.generate_quiz(extraction_result["extracted_text"], 10, ["multiple_choice", "true_false"])
+    quiz_result = await service.generate_quiz_from_document(extraction_result["extracted_text"], 10, ["multiple_choice", "true_false"], principal)
     
     return {
         "filename": extraction_result["filename"],
@@ -33,19 +44,146 @@ async def extract_text_endpoint(file: UploadFile = File(...), db: Session = Depe
         "quiz": quiz_result
     }
 
+@router.post("/extract-text/stream")
+async def extract_text_stream_endpoint(
+    http_request: Request,
+    file: UploadFile = File(...),
+    current_user: Optional[db_models.User] = Depends(service.get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Same as /extract-text, but streams questions as server-sent events"""
+    principal = service.generation_principal(db, current_user, http_request)
+    extraction_result = await service.extract_text_from_file(db, file)
+    quiz_events = await service.stream_quiz_from_document(extraction_result["extracted_text"], 10, ["multiple_choice", "true_false"], principal)
+    
+    async def events():
+        yield {"event": "extracted", "data": {"filename": extraction_result["filename"], "extracted_text": extraction_result["extracted_text"]}}
+        async for event in quiz_events:
+            yield event
+    
+    return StreamingResponse(sse_stream(events()), media_type="text/event-stream", headers=SSE_HEADERS)
+
+#
+# Generation Job Endpoints
+#
+@router.post("/jobs/extract-text", status_code=202)
+@router.post("/jobs/extract-text/", status_code=202)
+async def submit_extract_text_job_endpoint(
+    http_request: Request,
+    file: UploadFile = File(...),
+    current_user: Optional[db_models.User] = Depends(service.get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Queue extraction and quiz generation for a document; answers at once with the job id"""
+    from ..services.generation_jobs import generation_jobs, JobQueueFullError
+    principal = service.generation_principal(db, current_user, http_request)
+    data = await file.read()
+    try:
+        job = generation_jobs.submit(file.filename, data, principal, current_user.id if current_user else None)
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/api/jobs/{job.id}",
+        "events_url": f"/api/jobs/{job.id}/events",
+    }
+
+@router.get("/jobs/{job_id}")
+def get_job_endpoint(job_id: str):
+    """Job status and progress events; includes the result once the job is done"""
+    from ..services.generation_jobs import generation_jobs, DONE
+    job = generation_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    response = job.snapshot()
+    if job.status == DONE:
+        response["result"] = generation_jobs.load_result(job)
+    return response
+
+@router.get("/jobs/{job_id}/events")
+async def get_job_events_endpoint(job_id: str):
+    """Replays the job's progress events, then streams new ones as server-sent events until it finishes"""
+    from ..services.generation_jobs import generation_jobs
+    job = generation_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return StreamingResponse(sse_stream(generation_jobs.subscribe(job)), media_type="text/event-stream", headers=SSE_HEADERS)
+
 #
 # Flashcard Endpoints
 #
-@router.get("/flashcards/", response_model=List[schemas.Flashcard])
-def get_flashcards_endpoint(skip: int = 0, limit: int = 100, category: Optional[str] = None, tag: Optional[str] = None, db: Session = Depends(get_db)):
-    flashcards = service.get_flashcards(db, skip, limit, category, tag)
+# Catalog reads are served from the in-memory snapshot (the session is only used
+# to rebuild it) and carry its ETag, so clients revalidate with If-None-Match
+def catalog_not_modified(request: Request, response: Response, snapshot: CatalogSnapshot) -> Optional[Response]:
+    return not_modified(request, response, f'W/"catalog-{snapshot.etag}"')
+
+def flashcard_page(response: Response, flashcards, limit: int, chapter_id: Optional[int]):
+    """Sets X-Next-Cursor when the page is full, i.e. there may be more"""
+    if flashcards and len(flashcards) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(flashcard_sort_key(flashcards[-1], chapter_id))
     return flashcards
 
+def cursor_or_400(cursor: Optional[str], chapter_id: Optional[int]):
+    try:
+        return decode_cursor(cursor, 2 if chapter_id is not None else 1)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/flashcards/", response_model=List[schemas.Flashcard])
+def get_flashcards_endpoint(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    category: Optional[str] = None,
+    tag: Optional[str] = None,
+    chapter_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Flashcards in id order, or (chapter_id, id) order with chapter_id. Pass a
+    page's X-Next-Cursor header back as cursor for the next page (skip still
+    works but scans); unchanged pages answer If-None-Match with 304.
+    """
+    snapshot = catalog.get(db)
+    cached = catalog_not_modified(request, response, snapshot)
+    if cached:
+        return cached
+    after = cursor_or_400(cursor, chapter_id)
+    flashcards = snapshot.list_flashcards(skip, limit, category, tag, chapter_id, after)
+    return flashcard_page(response, flashcards, limit, chapter_id)
+
+@router.get("/flashcards/search", response_model=List[schemas.FlashcardSearchResult])
+def search_flashcards_endpoint(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    chapter_id: Optional[int] = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """Full-text search over questions and answers, most relevant first; paged by X-Next-Cursor"""
+    try:
+        offset = (decode_cursor(cursor, 1) or (0,))[0]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    results = service.search_flashcards(db, q, chapter_id, limit, offset)
+    if len(results) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor((offset + limit,))
+    return results
+
 @router.get("/flashcards/{flashcard_id}", response_model=schemas.Flashcard)
-def get_flashcard_endpoint(flashcard_id: int, db: Session = Depends(get_db)):
-    flashcard = service.get_flashcard(db, flashcard_id)
+def get_flashcard_endpoint(flashcard_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
+    snapshot = catalog.get(db)
+    # Existence first, so a deleted card is a 404 even for a client holding a matching ETag
+    flashcard = snapshot.flashcard_by_id.get(flashcard_id)
     if flashcard is None:
         raise HTTPException(status_code=404, detail="Flashcard not found")
+    cached = catalog_not_modified(request, response, snapshot)
+    if cached:
+        return cached
     return flashcard
 
 @router.post("/flashcards/")
@@ -53,7 +191,7 @@ def create_flashcard_endpoint(flashcard: schemas.FlashcardCreate, db: Session =
     return service.create_flashcard(db, flashcard)
 
 @router.put("/flashcards/{flashcard_id}")
-def update_flashcard_endpoint(flashcard_id: int, flashcard: schemas.FlashcardCreate, db: Session = Depends(get_db)):
+def update_flashcard_endpoint(flashcard_id: int, flashcard: schemas.FlashcardUpdate, db: Session = Depends(get_db)):
     updated_flashcard = service.update_flashcard(db, flashcard_id, flashcard)
     if updated_flashcard is None:
         raise HTTPException(status_code=404, detail="Flashcard not found")
@@ -290,12 +428,112 @@ async def get_provinces_list():
 @router.post("/generate-quiz-from-flashcards/")
 async def generate_quiz_from_flashcards_endpoint(
     request: schemas.QuizRequest, 
+    http_request: Request,
     chapter_id: int = None,
+    current_user: Optional[db_models.User] = Depends(service.get_current_user),
     db: Session = Depends(get_db)
 ):
-    quiz_data = await service.generate_quiz_from_flashcards_service(db, request, chapter_id)
+    principal = service.generation_principal(db, current_user, http_request)
+    quiz_data = await service.generate_quiz_from_flashcards_service(db, request, chapter_id, principal)
     return {"quiz": quiz_data}
 
+@router.post("/generate-quiz-from-flashcards/stream")
+async def stream_quiz_from_flashcards_endpoint(
+    request: schemas.QuizRequest, 
+    http_request: Request,
+    chapter_id: int = None,
+    current_user: Optional[db_models.User] = Depends(service.get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Streaming variant: each question is sent as a server-sent event as soon as it is ready"""
+    principal = service.generation_principal(db, current_user, http_request)
+    events = await service.stream_quiz_from_flashcards_service(db, request, chapter_id, principal)
+    return StreamingResponse(sse_stream(events), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@router.post("/explanations")
+@router.post("/explanations/")
+async def get_explanation_endpoint(
+    request: schemas.ExplanationRequest,
+    http_request: Request,
+    current_user: Optional[db_models.User] = Depends(service.get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Explanation for one quiz question; generated on first request, then served from the cache"""
+    principal = service.generation_principal(db, current_user, http_request)
+    return await service.explain_question(db, request, principal)
+
+#
+# AI Provider Diagnostics (Admin)
+#
+@router.get("/admin/ai-providers")
+def get_ai_provider_health_endpoint():
+    """Circuit breaker state and rolling health of each AI provider"""
+    from ..services.ai_providers import provider_clients
+    from ..services.provider_health import provider_breakers
+    return {
+        name: {**breaker.snapshot(), "configured": provider_clients[name].is_configured}
+        for name, breaker in provider_breakers.items()
+    }
+
+@router.get("/admin/ai-generation")
+def get_ai_generation_stats_endpoint():
+    """Cache, single-flight and hedging counters for quiz generation"""
+    from ..services.ai_service import ai_generator, generation_flights
+    from ..services.quiz_cache import quiz_cache
+    from ..services.distractors import distractor_engine
+    from ..services.explanations import explanation_service
+    from ..services.flashcard_sampler import flashcard_sampler
+    return {
+        "cache": quiz_cache.memory.stats(),
+        "single_flight": generation_flights.stats(),
+        "hedging": dict(ai_generator.hedge_stats),
+        "local_distractors": distractor_engine.stats(),
+        "explanations": explanation_service.stats(),
+        "flashcard_index": flashcard_sampler.stats(),
+    }
+
+@router.get("/admin/generation-queue")
+def get_generation_queue_endpoint():
+    """Admission scheduler state: running and queued generations per tier, admitted and shed counts"""
+    from ..services.admission import generation_scheduler
+    return generation_scheduler.stats()
+
+@router.get("/admin/generation-jobs")
+def get_generation_jobs_endpoint():
+    """Asynchronous generation job pool: workers, queue depth and jobs per status"""
+    from ..services.generation_jobs import generation_jobs
+    return generation_jobs.stats()
+
+@router.get("/admin/metrics")
+def get_generation_metrics_endpoint():
+    """Per-provider histograms (latency, queueing, tokens, attempts) and outcome counters for provider calls"""
+    from ..services.generation_metrics import generation_metrics
+    return generation_metrics.snapshot()
+
+#
+# Question Pool Endpoints (Admin)
+#
+@router.get("/question-pool/stats")
+def get_question_pool_stats_endpoint():
+    """Pool hit rate and builder status"""
+    from ..services.question_pool import question_pool
+    return question_pool.stats()
+
+@router.post("/question-pool/build", status_code=202)
+async def build_question_pool_endpoint(current_user: Optional[db_models.User] = Depends(service.get_current_user)):
+    """
+    Admin only: start a background build of missing and stale pool variants.
+
+    The build calls the AI provider for every flashcard, so it needs a signed-in
+    user and is refused with 409 while a build is already running.
+    """
+    from ..services.question_pool import question_pool
+    if current_user is None:
+        raise HTTPException(status_code=401, detail="Sign in to build the question pool")
+    if not question_pool.start_background_build():
+        raise HTTPException(status_code=409, detail="Question pool build already running")
+    return {"message": "Question pool build started"}
+
 #
 # User Management Endpoints (Admin)
 #
@@ -444,38 +682,53 @@ async def create_checkout_session_endpoint(
 # Chapter Endpoints
 #
 @router.get("/chapters/", response_model=List[schemas.Chapter])
-def get_chapters_endpoint(db: Session = Depends(get_db)):
+def get_chapters_endpoint(request: Request, response: Response, db: Session = Depends(get_db)):
     """Get all Canadian citizenship test chapters"""
-    chapters = chapter_service.get_all_chapters(db)
+    snapshot = catalog.get(db)
+    cached = catalog_not_modified(request, response, snapshot)
+    if cached:
+        return cached
+    chapters = snapshot.chapters
     return chapters
 
+# Registered before /chapters/{chapter_id}, which would otherwise match "stats" and answer 422
+@router.get("/chapters/stats")
+def get_chapters_stats_endpoint(db: Session = Depends(get_db)):
+    """Get statistics about chapters and their flashcards"""
+    return catalog.get(db).stats()
+
 @router.get("/chapters/{chapter_id}", response_model=schemas.Chapter)
-def get_chapter_endpoint(chapter_id: int, db: Session = Depends(get_db)):
+def get_chapter_endpoint(chapter_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
     """Get a specific chapter by ID"""
-    chapter = chapter_service.get_chapter_by_id(db, chapter_id)
+    snapshot = catalog.get(db)
+    chapter = snapshot.chapter_by_id.get(chapter_id)
     if chapter is None:
         raise HTTPException(status_code=404, detail="Chapter not found")
+    cached = catalog_not_modified(request, response, snapshot)
+    if cached:
+        return cached
     return chapter
 
 @router.get("/chapters/{chapter_id}/flashcards", response_model=List[schemas.Flashcard])
 def get_chapter_flashcards_endpoint(
     chapter_id: int, 
-    limit: int = Query(100, le=500), 
+    request: Request,
+    response: Response,
+    limit: int = Query(100, ge=1, le=500), 
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    """Get flashcards for a specific chapter"""
+    """Get flashcards for a specific chapter, paged by the X-Next-Cursor header like /flashcards/"""
+    snapshot = catalog.get(db)
     # Verify chapter exists
-    chapter = chapter_service.get_chapter_by_id(db, chapter_id)
-    if chapter is None:
+    if chapter_id not in snapshot.chapter_by_id:
         raise HTTPException(status_code=404, detail="Chapter not found")
+    cached = catalog_not_modified(request, response, snapshot)
+    if cached:
+        return cached
     
-    flashcards = chapter_service.get_flashcards_by_chapter(db, chapter_id, limit)
-    return flashcards
-
-@router.get("/chapters/stats")
-def get_chapters_stats_endpoint(db: Session = Depends(get_db)):
-    """Get statistics about chapters and their flashcards"""
-    return chapter_service.get_chapter_stats(db)
+    flashcards = snapshot.chapter_flashcards(chapter_id, limit, cursor_or_400(cursor, chapter_id))
+    return flashcard_page(response, flashcards, limit, chapter_id)
 
 @router.post("/flashcards/{flashcard_id}/assign-chapter")
 def assign_flashcard_to_chapter_endpoint(
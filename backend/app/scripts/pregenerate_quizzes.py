@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Offline bulk pre-generation of the question pool.
+
+Walks every chapter's flashcards and generates question variants ahead of time,
+storing them in the question pool (the same rows live quiz assembly reads), so
+the system can be warmed before a traffic spike instead of generating inside
+request handlers.
+
+- A bounded pool of workers generates concurrently.
+- Request starts are spaced to stay under --rpm, every worker pauses with
+  exponential backoff after provider failures, and no work starts while every
+  provider's circuit breaker is open.
+- Progress is checkpointed to a JSON file; rerunning with the same checkpoint
+  resumes where the previous run stopped.
+
+Run from the backend directory:
+    python -m app.scripts.pregenerate_quizzes --workers 4 --rpm 30
+    python -m app.scripts.pregenerate_quizzes --chapter 3 --force
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.db.database import SessionLocal
+from app.db import models as db_models
+from app.services.ai_providers import close_provider_clients
+from app.services.ai_service import ai_generator
+from app.services.question_pool import question_pool
+from app.utils import config
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT = "pregenerate_checkpoint.json"
+MAX_PAUSE_SECONDS = 300
+
+
+class Checkpoint:
+    """Completed and failed flashcard ids, saved atomically to a JSON file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.completed: Set[int] = set()
+        self.failed: Dict[int, str] = {}
+
+    def load(self) -> bool:
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path) as f:
+            data = json.load(f)
+        self.completed = set(data.get("completed", []))
+        self.failed = {int(card_id): error for card_id, error in data.get("failed", {}).items()}
+        return True
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "completed": sorted(self.completed),
+                "failed": {str(card_id): error for card_id, error in self.failed.items()},
+                "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            }, f)
+        os.replace(tmp_path, self.path)
+
+    def mark_done(self, flashcard_id: int):
+        self.completed.add(flashcard_id)
+        self.failed.pop(flashcard_id, None)
+
+    def mark_failed(self, flashcard_id: int, error: str):
+        self.failed[flashcard_id] = error[:200]
+
+
+class RateGate:
+    """Spaces out request starts to at most `rpm` per minute and pauses all workers after failures"""
+
+    def __init__(self, rpm: float):
+        self.interval = 60.0 / rpm if rpm > 0 else 0.0
+        self.consecutive_failures = 0
+        self._next_start = 0.0
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        # Nothing can succeed while every provider's circuit is open
+        while not ai_generator._ordered_providers():
+            logger.warning("All provider circuits are open; waiting before the next generation")
+            await asyncio.sleep(max(1, config.AI_BREAKER_OPEN_SECONDS / 2))
+
+        async with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start, self._paused_until)
+            self._next_start = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    def success(self):
+        self.consecutive_failures = 0
+
+    def failure(self):
+        self.consecutive_failures += 1
+        pause = min(MAX_PAUSE_SECONDS, 2 ** self.consecutive_failures)
+        self._paused_until = max(self._paused_until, time.monotonic() + pause)
+        logger.warning(f"Generation failed ({self.consecutive_failures} in a row); pausing workers for {pause}s")
+
+
+def load_work(chapter_ids: List[int], force: bool) -> List[Tuple[int, int, str, str]]:
+    """(flashcard id, chapter id, question, answer) in chapter order, skipping cards already at target"""
+    db = SessionLocal()
+    try:
+        query = db.query(db_models.Flashcard).join(db_models.Chapter).order_by(
+            db_models.Chapter.order, db_models.Chapter.id, db_models.Flashcard.id
+        )
+        if chapter_ids:
+            query = query.filter(db_models.Flashcard.chapter_id.in_(chapter_ids))
+        flashcards = query.all()
+
+        full: Set[int] = set()
+        if not force:
+            below_target, stale = question_pool._cards_needing_build()
+            needing = set(below_target) | set(stale)
+            full = {f.id for f in flashcards if f.id not in needing}
+
+        return [(f.id, f.chapter_id, f.question, f.answer) for f in flashcards if f.id not in full]
+    finally:
+        db.close()
+
+
+async def pregenerate(
+    work: List[Tuple[int, int, str, str]],
+    checkpoint: Checkpoint,
+    workers: int,
+    rpm: float,
+    checkpoint_every: int = 10,
+) -> Dict[str, int]:
+    queue: asyncio.Queue = asyncio.Queue()
+    for item in work:
+        queue.put_nowait(item)
+
+    gate = RateGate(rpm)
+    stats = {"generated": 0, "failed": 0}
+    since_save = 0
+    total = len(work)
+
+    async def worker():
+        nonlocal since_save
+        while True:
+            try:
+                flashcard_id, chapter_id, question, answer = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            await gate.wait()
+            try:
+                questions = await question_pool.generate_variants(question, answer)
+            except Exception as e:
+                gate.failure()
+                checkpoint.mark_failed(flashcard_id, str(e))
+                stats["failed"] += 1
+                logger.error(f"Flashcard {flashcard_id} (chapter {chapter_id}) failed: {e}")
+            else:
+                gate.success()
+                # Replace so cards that were partially filled end up at the target size
+                await asyncio.to_thread(question_pool.store_variants, flashcard_id, questions, True)
+                checkpoint.mark_done(flashcard_id)
+                stats["generated"] += 1
+
+            since_save += 1
+            if since_save >= checkpoint_every:
+                since_save = 0
+                checkpoint.save()
+                done = stats["generated"] + stats["failed"]
+                logger.info(f"Progress: {done}/{total} flashcards ({stats['failed']} failed)")
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(max(1, workers))))
+    finally:
+        checkpoint.save()
+        await close_provider_clients()
+    return stats
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Pre-generate question pool variants for every flashcard")
+    parser.add_argument("--chapter", type=int, action="append", default=[], help="Only this chapter id (repeatable)")
+    parser.add_argument("--workers", type=int, default=config.QUESTION_POOL_BUILD_CONCURRENCY, help="Concurrent generations")
+    parser.add_argument("--rpm", type=float, default=30, help="Maximum generation requests started per minute (0 = unlimited)")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="Checkpoint file used to resume interrupted runs")
+    parser.add_argument("--fresh", action="store_true", help="Ignore an existing checkpoint")
+    parser.add_argument("--retry-failed", action="store_true", help="Also retry cards that failed in the checkpointed run")
+    parser.add_argument("--force", action="store_true", help="Regenerate cards that already have a full pool")
+    parser.add_argument("--limit", type=int, help="Stop after this many flashcards")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be generated")
+    args = parser.parse_args(argv)
+
+    checkpoint = Checkpoint(args.checkpoint)
+    if not args.fresh and checkpoint.load():
+        logger.info(
+            f"Resuming from {args.checkpoint}: {len(checkpoint.completed)} done, {len(checkpoint.failed)} failed"
+        )
+
+    work = [
+        item for item in load_work(args.chapter, args.force)
+        if item[0] not in checkpoint.completed and (args.retry_failed or item[0] not in checkpoint.failed)
+    ]
+    if args.limit:
+        work = work[:args.limit]
+
+    logger.info(f"{len(work)} flashcards to generate with {args.workers} workers at <= {args.rpm or 'unlimited'} rpm")
+    if args.dry_run or not work:
+        return 0
+
+    try:
+        stats = asyncio.run(pregenerate(work, checkpoint, args.workers, args.rpm))
+    except KeyboardInterrupt:
+        logger.warning(f"Interrupted; progress saved to {args.checkpoint}")
+        return 130
+
+    logger.info(f"Pre-generation finished: {stats['generated']} generated, {stats['failed']} failed")
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+"""
+Priority admission control in front of AI quiz generation.
+
+At most GENERATION_MAX_ACTIVE generations run at once; the rest wait in a
+bounded queue with one priority class per payment tier (premium, free, guest).
+The highest non-empty class is always served first, and within a class users
+take turns (round robin), so one client firing many requests cannot starve the
+others.
+
+Requests are shed explicitly instead of piling up behind provider latency:
+- 429 when a user already has GENERATION_MAX_PER_USER generations running or queued
+- 503 when the queue is full and nothing of lower priority can be evicted
+- 503 for a waiter evicted to make room for a higher-priority request
+- 503 when a request has waited longer than its class's maximum wait
+"""
+import asyncio
+import logging
+import time
+from collections import Counter, OrderedDict, deque
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from ..utils import config
+from .generation_metrics import generation_metrics
+
+logger = logging.getLogger(__name__)
+
+PREMIUM = 0
+FREE = 1
+GUEST = 2
+TIER_NAMES = {PREMIUM: "premium", FREE: "free", GUEST: "guest"}
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Who a generation is for: a fairness key ("user:12", "ip:1.2.3.4") and a priority class"""
+    key: str
+    priority: int
+
+    @property
+    def tier(self) -> str:
+        return TIER_NAMES[self.priority]
+
+
+class AdmissionRejected(Exception):
+    """Raised when a generation is shed; status_code is 429 or 503"""
+
+    def __init__(self, status_code: int, message: str, retry_after: int):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    def __init__(self, principal: Principal):
+        self.principal = principal
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.enqueued_at = time.monotonic()
+
+
+class Slot:
+    """A granted generation slot; release() is idempotent"""
+
+    def __init__(self, scheduler: Optional["GenerationScheduler"], principal: Optional[Principal]):
+        self._scheduler = scheduler
+        self._principal = principal
+
+    def release(self):
+        if self._scheduler is not None:
+            scheduler, self._scheduler = self._scheduler, None
+            scheduler._release(self._principal)
+
+
+class GenerationScheduler:
+    """Bounded priority queue with per-user round robin in front of generation"""
+
+    def __init__(self, max_active: int, max_queue: int, max_per_user: int, max_wait: Dict[int, float]):
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.max_per_user = max_per_user
+        self.max_wait = max_wait
+        self.active = 0
+        # priority -> user key -> that user's waiters; dict order is the round-robin order
+        self._queues: Dict[int, "OrderedDict[str, deque[_Waiter]]"] = {
+            priority: OrderedDict() for priority in TIER_NAMES
+        }
+        self._queued = 0
+        self._per_user: Counter = Counter()  # running + queued per user
+        self.admitted: Counter = Counter()
+        self.rejected: Counter = Counter()
+
+    async def acquire(self, principal: Optional[Principal]) -> Slot:
+        """Wait for a slot; raises AdmissionRejected when the request is shed"""
+        if principal is None or not config.GENERATION_SCHEDULER_ENABLED:
+            return Slot(None, None)
+
+        if self._per_user[principal.key] >= self.max_per_user:
+            self._reject(principal, "per_user")
+            raise AdmissionRejected(
+                429, f"Too many quiz generations in progress (limit {self.max_per_user})",
+                config.GENERATION_RETRY_AFTER_SECONDS,
+            )
+
+        if self.active < self.max_active and not self._queued:
+            return self._grant_now(principal)
+
+        if self._queued >= self.max_queue and not self._evict_below(principal.priority):
+            self._reject(principal, "queue_full")
+            raise AdmissionRejected(
+                503, "Quiz generation is at capacity, please retry shortly", config.GENERATION_RETRY_AFTER_SECONDS
+            )
+
+        waiter = self._enqueue(principal)
+        try:
+            await asyncio.wait({waiter.future}, timeout=self.max_wait[principal.priority])
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled() and waiter.future.exception() is None:
+                # Granted just as the caller went away
+                self._release(principal)
+            elif not waiter.future.done():
+                self._dequeue(waiter)
+                waiter.future.cancel()
+            raise
+
+        if not waiter.future.done():
+            self._dequeue(waiter)
+            waiter.future.cancel()
+            self._reject(principal, "timeout")
+            raise AdmissionRejected(
+                503, "Quiz generation queue wait exceeded, please retry shortly", config.GENERATION_RETRY_AFTER_SECONDS
+            )
+        # Raises AdmissionRejected if the waiter was evicted for a higher-priority request
+        waiter.future.result()
+        generation_metrics.observe("admission_wait_seconds", time.monotonic() - waiter.enqueued_at, principal.tier)
+        return Slot(self, principal)
+
+    def _grant_now(self, principal: Principal) -> Slot:
+        self.active += 1
+        self._per_user[principal.key] += 1
+        self.admitted[principal.tier] += 1
+        generation_metrics.observe("admission_wait_seconds", 0.0, principal.tier)
+        return Slot(self, principal)
+
+    def _enqueue(self, principal: Principal) -> _Waiter:
+        waiter = _Waiter(principal)
+        self._queues[principal.priority].setdefault(principal.key, deque()).append(waiter)
+        self._queued += 1
+        self._per_user[principal.key] += 1
+        return waiter
+
+    def _dequeue(self, waiter: _Waiter):
+        """Remove a waiter that gave up or was evicted"""
+        users = self._queues[waiter.principal.priority]
+        waiters = users.get(waiter.principal.key)
+        if waiters is None or waiter not in waiters:
+            return
+        waiters.remove(waiter)
+        if not waiters:
+            del users[waiter.principal.key]
+        self._queued -= 1
+        self._forget_user(waiter.principal.key)
+
+    def _evict_below(self, priority: int) -> bool:
+        """Shed the newest waiter of the lowest class below priority; False if there is none"""
+        for victim_priority in sorted(self._queues, reverse=True):
+            if victim_priority <= priority:
+                return False
+            users = self._queues[victim_priority]
+            if users:
+                # The user who joined the round robin last loses their newest request
+                victim = next(reversed(users.values()))[-1]
+                self._dequeue(victim)
+                self._reject(victim.principal, "shed")
+                victim.future.set_exception(AdmissionRejected(
+                    503, "Quiz generation is at capacity, please retry shortly", config.GENERATION_RETRY_AFTER_SECONDS
+                ))
+                return True
+        return False
+
+    def _release(self, principal: Principal):
+        self.active -= 1
+        self._forget_user(principal.key)
+        self._grant_next()
+
+    def _grant_next(self):
+        while self.active < self.max_active and self._queued:
+            priority = min(p for p, users in self._queues.items() if users)
+            users = self._queues[priority]
+            key, waiters = next(iter(users.items()))
+            waiter = waiters.popleft()
+            if waiters:
+                users.move_to_end(key)
+            else:
+                del users[key]
+            self._queued -= 1
+            if waiter.future.done():
+                # Cancelled between its timeout and its own cleanup
+                self._forget_user(key)
+                continue
+            self.active += 1
+            self.admitted[waiter.principal.tier] += 1
+            waiter.future.set_result(None)
+
+    def _forget_user(self, key: str):
+        self._per_user[key] -= 1
+        if self._per_user[key] <= 0:
+            del self._per_user[key]
+
+    def _reject(self, principal: Principal, reason: str):
+        self.rejected[f"{principal.tier}:{reason}"] += 1
+        logger.warning(f"Shed {principal.tier} generation for {principal.key}: {reason}")
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": config.GENERATION_SCHEDULER_ENABLED,
+            "active": self.active,
+            "max_active": self.max_active,
+            "queued": {
+                TIER_NAMES[priority]: sum(len(waiters) for waiters in users.values())
+                for priority, users in self._queues.items()
+            },
+            "max_queue": self.max_queue,
+            "admitted": dict(self.admitted),
+            "rejected": dict(self.rejected),
+        }
+
+
+# Global instance
+generation_scheduler = GenerationScheduler(
+    max_active=config.GENERATION_MAX_ACTIVE,
+    max_queue=config.GENERATION_MAX_QUEUE,
+    max_per_user=config.GENERATION_MAX_PER_USER,
+    max_wait={
+        PREMIUM: config.GENERATION_MAX_WAIT_PREMIUM,
+        FREE: config.GENERATION_MAX_WAIT_FREE,
+        GUEST: config.GENERATION_MAX_WAIT_GUEST,
+    },
+)
@@ -0,0 +1,227 @@
+"""
+Async LLM provider clients with shared keep-alive connection pools.
+
+Both Groq and DeepSeek expose OpenAI-compatible chat completion endpoints, so a
+single httpx-based client covers them. Each provider gets exactly one
+AsyncClient per process (one connection pool) and a semaphore that caps the
+number of concurrent completions sent to it.
+"""
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
+
+from ..utils import config
+from .generation_metrics import generation_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderError(Exception):
+    """Raised when a provider call fails or returns an unusable payload"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@dataclass
+class ChatResult:
+    text: str
+    usage: Dict = field(default_factory=dict)
+    finish_reason: Optional[str] = None
+    # Seconds spent waiting for a concurrency slot before the request was sent
+    queue_time: float = 0.0
+
+
+class AsyncProviderClient:
+    """OpenAI-compatible chat completion client backed by a shared connection pool"""
+
+    def __init__(
+        self,
+        name: str,
+        api_url: str,
+        api_key: Optional[str],
+        model: str,
+        max_tokens_param: str = "max_tokens",
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.name = name
+        self.api_url = api_url
+        self.api_key = api_key
+        self.model = model
+        self.max_tokens_param = max_tokens_param
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @property
+    def is_configured(self) -> bool:
+        return bool(self.api_key) and not self.api_key.startswith("your_")
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Return the pooled client, creating it on first use in the running loop"""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            # A pool is bound to the loop it was created in; scripts that call
+            # asyncio.run() repeatedly get a fresh pool per loop.
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(config.AI_REQUEST_TIMEOUT, connect=config.AI_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=config.AI_MAX_CONNECTIONS,
+                    max_keepalive_connections=config.AI_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=config.AI_KEEPALIVE_EXPIRY,
+                ),
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json",
+                },
+                transport=self.transport,
+            )
+            self._client_loop = loop
+            self._semaphore = asyncio.Semaphore(config.AI_MAX_CONCURRENCY)
+        return self._client
+
+    async def _acquire_slot(self) -> float:
+        """Wait for a concurrency slot; returns the seconds spent queueing"""
+        queued_at = time.monotonic()
+        await self._semaphore.acquire()
+        queue_time = time.monotonic() - queued_at
+        generation_metrics.observe("queue_seconds", queue_time, self.name)
+        return queue_time
+
+    async def chat(
+        self,
+        messages: List[Dict],
+        temperature: float = 0.6,
+        max_tokens: int = 4096,
+        top_p: float = 0.95,
+    ) -> ChatResult:
+        """Send a chat completion request and return the message text"""
+        if not self.is_configured:
+            raise ProviderError(f"{self.name} API key not configured")
+
+        client = self._get_client()
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": temperature,
+            self.max_tokens_param: max_tokens,
+            "top_p": top_p,
+            "stream": False,
+        }
+
+        queue_time = await self._acquire_slot()
+        try:
+            response = await client.post(self.api_url, json=payload)
+        except httpx.HTTPError as e:
+            raise ProviderError(f"{self.name} request failed: {e!r}") from e
+        finally:
+            self._semaphore.release()
+
+        if response.status_code >= 400:
+            raise ProviderError(
+                f"{self.name} returned HTTP {response.status_code}: {response.text[:200]}",
+                status_code=response.status_code,
+            )
+
+        try:
+            data = response.json()
+            choice = data["choices"][0]
+            text = choice["message"]["content"].strip()
+        except (ValueError, KeyError, IndexError, TypeError, AttributeError) as e:
+            raise ProviderError(f"{self.name} returned an unexpected payload: {e!r}") from e
+
+        return ChatResult(
+            text=text,
+            usage=data.get("usage") or {},
+            finish_reason=choice.get("finish_reason"),
+            queue_time=queue_time,
+        )
+
+    async def stream_chat(
+        self,
+        messages: List[Dict],
+        temperature: float = 0.6,
+        max_tokens: int = 4096,
+        top_p: float = 0.95,
+    ) -> AsyncIterator[str]:
+        """Stream a chat completion, yielding content deltas as they arrive"""
+        if not self.is_configured:
+            raise ProviderError(f"{self.name} API key not configured")
+
+        client = self._get_client()
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": temperature,
+            self.max_tokens_param: max_tokens,
+            "top_p": top_p,
+            "stream": True,
+        }
+
+        await self._acquire_slot()
+        try:
+            async with client.stream("POST", self.api_url, json=payload) as response:
+                if response.status_code >= 400:
+                    body = (await response.aread()).decode("utf-8", "replace")
+                    raise ProviderError(
+                        f"{self.name} returned HTTP {response.status_code}: {body[:200]}",
+                        status_code=response.status_code,
+                    )
+
+                # Server-sent events: one JSON chunk per "data:" line
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    try:
+                        delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                    except (ValueError, KeyError, IndexError, TypeError) as e:
+                        raise ProviderError(f"{self.name} sent an unexpected stream chunk: {e!r}") from e
+                    if delta:
+                        yield delta
+        except httpx.HTTPError as e:
+            raise ProviderError(f"{self.name} stream failed: {e!r}") from e
+        finally:
+            self._semaphore.release()
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._client_loop = None
+
+
+# One client (and therefore one connection pool) per provider per process
+provider_clients: Dict[str, AsyncProviderClient] = {
+    "groq": AsyncProviderClient(
+        name="groq",
+        api_url=config.GROQ_API_URL,
+        api_key=config.GROQ_API_KEY,
+        model=config.GROQ_MODEL,
+        max_tokens_param="max_completion_tokens",
+    ),
+    "deepseek": AsyncProviderClient(
+        name="deepseek",
+        api_url=config.DEEPSEEK_API_URL,
+        api_key=config.DEEPSEEK_API_KEY,
+        model=config.DEEPSEEK_MODEL,
+    ),
+}
+
+
+async def close_provider_clients():
+    """Close every provider connection pool (called on application shutdown)"""
+    for client in provider_clients.values():
+        try:
+            await client.aclose()
+        except Exception as e:
+            logger.warning(f"Failed to close {client.name} client: {e}")
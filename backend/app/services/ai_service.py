@@ -2,19 +2,55 @@
 Enhanced AI Service with better error handling, retry logic, and consistency
 """
 import asyncio
+import copy
 import json
+import math
 import random
 import re
-from typing import Dict, List, Optional, Union
-from dataclasses import dataclass
+import time
+from typing import AsyncIterator, Callable, Dict, List, Optional, Sequence, Tuple, Union
+from dataclasses import dataclass, field, replace as dataclass_replace
 from enum import Enum
 import logging
-from groq import Groq
-import requests
 from ..utils import config
+from .ai_providers import provider_clients, AsyncProviderClient, ChatResult
+from .quiz_cache import quiz_cache, make_cache_key
+from .quiz_parser import IncrementalQuizParser, parse_quiz_text
+from .provider_health import provider_latency, provider_breakers, rank_providers
+from .single_flight import SingleFlight
+from .prompt_templates import (
+    QUIZ_TEMPLATE, QUIZ_LEAN_TEMPLATE, COMPACT_TEMPLATE, EXPLANATION_TEMPLATE, DIFFICULTY_INSTRUCTIONS,
+    count_tokens, messages_tokens
+)
+from .generation_metrics import (
+    generation_metrics, CallRecord, OK, PARTIAL, NO_QUESTIONS, PROVIDER_ERROR
+)
 
 logger = logging.getLogger(__name__)
 
+# Part of every generation cache key, so a new template version never serves old quizzes
+PROMPT_VERSION = QUIZ_TEMPLATE.version
+
+# Coalesces concurrent identical generations (keyed like the quiz cache)
+generation_flights = SingleFlight()
+
+_FINGERPRINT_NORMALIZE = re.compile(r"[^a-z0-9]+")
+
+def question_fingerprint(question: Dict) -> str:
+    """
+    Dedup key of a generated question (repair here, cross-chunk merging in
+    document_pipeline): the text with case, punctuation and spacing ignored;
+    compact questions are one per flashcard.
+    """
+    if question.get("flashcard_id") is not None:
+        return f"flashcard:{question['flashcard_id']}"
+    return _FINGERPRINT_NORMALIZE.sub(" ", str(question.get("question", "")).lower()).strip()
+
+QUESTION_TYPES = ("multiple_choice", "true_false", "short_answer")
+
+class AllProvidersFailedError(Exception):
+    """Raised when no configured provider could produce a quiz"""
+
 class AIProvider(Enum):
     GROQ = "groq"
     DEEPSEEK = "deepseek"
@@ -26,6 +62,12 @@ class QuizGenerationRequest:
     question_types: List[str]
     difficulty: str = "medium"
     category: Optional[str] = None
+    # Distractor-only mode (see compact_request): flashcards by id, content holds their prompt lines
+    compact: Optional[Dict[int, Dict]] = None
+    # False asks for no summary and no explanations (fetched later from /api/explanations)
+    explanations: bool = field(default_factory=lambda: not config.AI_LAZY_EXPLANATIONS)
+    # False skips the cache lookup (the fresh result is still cached), e.g. when regenerating pool variants
+    use_cache: bool = True
 
 @dataclass 
 class QuizResponse:
@@ -33,16 +75,75 @@ class QuizResponse:
     summary: str
     provider_used: str
     generation_time: float
+    metadata: Dict = field(default_factory=dict)
 
 class AIQuizGenerator:
     def __init__(self):
-        self.groq_client = None
-        if config.GROQ_API_KEY and config.GROQ_API_KEY != "your_groq_api_key_here":
-            self.groq_client = Groq(api_key=config.GROQ_API_KEY)
+        # Shared async clients; each owns one keep-alive connection pool
+        self.groq_client = provider_clients["groq"]
+        self.deepseek_client = provider_clients["deepseek"]
+        self.hedge_stats = {"eligible": 0, "hedged": 0, "secondary_wins": 0}
+        # Generations in progress, counting each fan-out group from the moment it is planned
+        self.active_generations = 0
     
     async def generate_quiz(self, request: QuizGenerationRequest) -> QuizResponse:
         """Generate quiz with fallback providers and retry logic"""
-        providers = [AIProvider.GROQ, AIProvider.DEEPSEEK]
+        self.active_generations += 1
+        try:
+            return await self._generate_quiz(request)
+        finally:
+            self.active_generations -= 1
+    
+    async def _generate_quiz(self, request: QuizGenerationRequest) -> QuizResponse:
+        start_time = time.time()
+        cache_key = self._cache_key(request)
+        if config.QUIZ_CACHE_ENABLED and request.use_cache:
+            cached = await quiz_cache.get(cache_key)
+            if cached is not None:
+                generation_metrics.increment("cache", "hit")
+                return self._response_from_cache(cached, time.time() - start_time, self._prompt_version(request))
+            generation_metrics.increment("cache", "miss")
+        
+        if not config.AI_SINGLE_FLIGHT_ENABLED:
+            return await self._generate_and_cache(request, cache_key)
+        
+        # Identical requests already in flight share one provider call
+        response, shared = await generation_flights.do(
+            cache_key, lambda: self._generate_and_cache(request, cache_key)
+        )
+        # Every caller gets its own copy so nobody mutates the shared result
+        response = copy.deepcopy(response)
+        if shared:
+            generation_metrics.increment("cache", "coalesced")
+            for question in response.quiz:
+                if question.get("type") == "multiple_choice" and "options" in question:
+                    question["options"] = self._shuffle_options(question["options"])
+            response.generation_time = time.time() - start_time
+            response.metadata["coalesced"] = True
+        return response
+    
+    async def _generate_and_cache(self, request: QuizGenerationRequest, cache_key: str) -> QuizResponse:
+        response = await self._generate_uncached(request)
+        
+        # A quiz that repairs could not fill is served once but never cached, so the next request retries
+        if config.QUIZ_CACHE_ENABLED and len(response.quiz) >= request.question_count:
+            await quiz_cache.set(cache_key, {
+                "quiz": response.quiz,
+                "summary": response.summary,
+                "provider_used": response.provider_used,
+            })
+        elif config.QUIZ_CACHE_ENABLED:
+            logger.info(
+                f"Not caching quiz from {response.provider_used}: {len(response.quiz)}/{request.question_count} questions"
+            )
+        
+        return response
+    
+    async def _generate_uncached(self, request: QuizGenerationRequest) -> QuizResponse:
+        providers = self._ordered_providers()
+        
+        if config.AI_HEDGING_ENABLED and len(providers) >= 2:
+            return await self._generate_hedged(request, providers[0], providers[1])
         
         for provider in providers:
             try:
@@ -51,11 +152,327 @@ class AIQuizGenerator:
                 logger.warning(f"Provider {provider.value} failed: {e}")
                 continue
         
-        raise Exception("All AI providers failed")
+        raise AllProvidersFailedError("All AI providers failed")
+    
+    async def stream_quiz(self, request: QuizGenerationRequest) -> AsyncIterator[Dict]:
+        """
+        Stream a quiz as events: {"event": "question" | "summary" | "done", "data": ...}.
+        
+        Questions are cleaned and shuffled one by one as soon as their JSON object
+        closes in the provider stream. A provider that fails before producing any
+        question falls through to the next one.
+        """
+        self.active_generations += 1
+        try:
+            async for event in self._stream_quiz(request):
+                yield event
+        finally:
+            self.active_generations -= 1
+    
+    async def _stream_quiz(self, request: QuizGenerationRequest) -> AsyncIterator[Dict]:
+        start_time = time.time()
+        cache_key = self._cache_key(request)
+        
+        if config.QUIZ_CACHE_ENABLED and request.use_cache:
+            cached = await quiz_cache.get(cache_key)
+            if cached is not None:
+                generation_metrics.increment("cache", "hit")
+                response = self._response_from_cache(cached, time.time() - start_time, self._prompt_version(request))
+                for question in response.quiz:
+                    yield {"event": "question", "data": question}
+                yield {"event": "summary", "data": response.summary}
+                yield {"event": "done", "data": {"provider_used": response.provider_used, "generation_time": response.generation_time, "cache_hit": True, "prompt_version": self._prompt_version(request)}}
+                return
+            generation_metrics.increment("cache", "miss")
+        
+        messages = self._build_messages(request)
+        prompt_tokens = messages_tokens(messages)
+        
+        for provider in self._ordered_providers():
+            client = self._client_for(provider)
+            breaker = provider_breakers[provider.value]
+            if not breaker.allow_request():
+                continue
+            
+            parser = IncrementalQuizParser()
+            clean = self._question_cleaner(request)
+            questions = []
+            rejected = 0
+            deltas = []
+            stream_start = time.time()
+            try:
+                async for delta in client.stream_chat(
+                    messages=messages,
+                    temperature=0.6,
+                    max_tokens=4096,
+                    top_p=0.95
+                ):
+                    deltas.append(delta)
+                    for question in parser.feed(delta):
+                        try:
+                            question = clean(question, len(questions))
+                        except ValueError as e:
+                            logger.warning(f"Skipping streamed question from {provider.value}: {e}")
+                            rejected += 1
+                            continue
+                        questions.append(question)
+                        yield {"event": "question", "data": question}
+            except (asyncio.CancelledError, GeneratorExit):
+                # Client disconnected mid-stream
+                breaker.release()
+                raise
+            except Exception as e:
+                breaker.record_failure(time.time() - stream_start, str(e))
+                self._record_stream_call(provider, stream_start, prompt_tokens, deltas, questions, request, error=str(e))
+                if questions:
+                    # Already sent questions to the client; switching providers would duplicate them
+                    raise
+                logger.warning(f"Provider {provider.value} stream failed: {e}")
+                continue
+            
+            self._record_stream_call(provider, stream_start, prompt_tokens, deltas, questions, request)
+            if not questions:
+                breaker.record_failure(time.time() - stream_start, "no usable questions")
+                logger.warning(f"Provider {provider.value} streamed no usable questions")
+                continue
+            
+            breaker.record_success(time.time() - stream_start)
+            if parser.errors:
+                logger.warning(f"Dropped {len(parser.errors)} malformed streamed question(s) from {provider.value}")
+            
+            summary = parser.summary or ""
+            yield {"event": "summary", "data": summary}
+            
+            # A short or partly dropped stream is never cached: the non-streamed path would serve it
+            # in place of a full quiz with retries and repair
+            complete = len(questions) >= request.question_count and not parser.errors and not rejected
+            if config.QUIZ_CACHE_ENABLED and complete:
+                await quiz_cache.set(cache_key, {"quiz": questions, "summary": summary, "provider_used": provider.value})
+            elif config.QUIZ_CACHE_ENABLED:
+                logger.info(
+                    f"Not caching streamed quiz from {provider.value}: {len(questions)}/{request.question_count} "
+                    f"questions, {len(parser.errors) + rejected} dropped"
+                )
+            
+            yield {"event": "done", "data": {"provider_used": provider.value, "generation_time": time.time() - start_time, "cache_hit": False, "prompt_version": self._prompt_version(request)}}
+            return
+        
+        raise AllProvidersFailedError("All AI providers failed")
+    
+    def fanout_width(self, question_count: int) -> int:
+        """
+        How many concurrent sub-generations to split a quiz of question_count into.
+        
+        Output-token speed bounds a long completion, so a large quiz splits into
+        groups of about AI_FANOUT_GROUP_SIZE questions, up to AI_FANOUT_MAX_GROUPS.
+        Every group pays the per-call overhead and takes a provider slot, so fan-out
+        only spends spare capacity: at most half of the AI_MAX_CONCURRENCY slots not
+        taken by generations in progress, and none once those are busy (extra groups
+        would only queue behind other users' requests).
+        """
+        if not config.AI_FANOUT_ENABLED or question_count < config.AI_FANOUT_MIN_QUESTIONS:
+            return 1
+        width = min(math.ceil(question_count / max(1, config.AI_FANOUT_GROUP_SIZE)), config.AI_FANOUT_MAX_GROUPS)
+        spare = config.AI_MAX_CONCURRENCY - self.active_generations
+        return max(1, min(width, spare // 2))
+    
+    async def generate_quiz_fanout(self, requests: List[QuizGenerationRequest]) -> QuizResponse:
+        """
+        Generate several sub-quizzes concurrently and concatenate them in request order.
+        
+        Each group is a full generation (cache, single-flight, fallback). A
+        failed group is reported in metadata["failed_groups"] instead of failing the
+        quiz; AllProvidersFailedError is raised only when every group fails.
+        """
+        start_time = time.time()
+        # Counted before the group tasks start, so concurrent fanout_width calls see them at once
+        self.active_generations += len(requests)
+        
+        async def run_group(request: QuizGenerationRequest) -> QuizResponse:
+            try:
+                return await self._generate_quiz(request)
+            finally:
+                self.active_generations -= 1
+        
+        results = await asyncio.gather(*(run_group(request) for request in requests), return_exceptions=True)
+        
+        quiz, summaries, providers, failed_groups = [], [], [], []
+        tokens = {"prompt_tokens": 0, "completion_tokens": 0}
+        for index, result in enumerate(results):
+            if isinstance(result, BaseException):
+                failed_groups.append(index)
+                logger.warning(f"Fan-out group {index + 1}/{len(requests)} failed: {result}")
+                continue
+            quiz.extend(result.quiz[:requests[index].question_count])
+            if result.summary:
+                summaries.append(result.summary)
+            if result.provider_used not in providers:
+                providers.append(result.provider_used)
+            for key in tokens:
+                tokens[key] += result.metadata.get(key) or 0
+        
+        if not quiz:
+            raise AllProvidersFailedError("All AI providers failed")
+        
+        return QuizResponse(
+            quiz=quiz,
+            summary=" ".join(summaries[:3]),
+            provider_used=",".join(providers),
+            generation_time=time.time() - start_time,
+            metadata={
+                "fanout": len(requests),
+                "failed_groups": failed_groups,
+                "prompt_version": self._prompt_version(requests[0]),
+                **tokens,
+            },
+        )
+    
+    async def explain(self, question: str, answer: str, options: Optional[List[str]] = None) -> Tuple[str, str]:
+        """
+        A short explanation of why answer is correct, from the first healthy provider.
+        
+        Returns (explanation, provider name). Explanations are tiny completions, so a
+        failed provider is not retried; the next one is tried instead.
+        """
+        messages = EXPLANATION_TEMPLATE.render(
+            question=question, options="; ".join(options) if options else "-", answer=answer
+        )
+        prompt_estimate = messages_tokens(messages)
+        for provider in self._ordered_providers():
+            client = self._client_for(provider)
+            breaker = provider_breakers[provider.value]
+            if not breaker.allow_request():
+                continue
+            
+            attempt_start = time.time()
+            tokens = {"prompt_tokens": 0, "completion_tokens": 0}
+            result = None
+            try:
+                result = await client.chat(messages=messages, temperature=0.3, max_tokens=200, top_p=0.95)
+                explanation = result.text.strip().strip('"').strip()
+                if not explanation:
+                    raise ValueError("Empty explanation")
+            except asyncio.CancelledError:
+                breaker.release()
+                raise
+            except Exception as e:
+                breaker.record_failure(time.time() - attempt_start, str(e))
+                self._record_call(provider.value, 1, attempt_start, result, prompt_estimate, tokens, error=str(e))
+                logger.warning(f"Provider {provider.value} failed to explain a question: {e}")
+                continue
+            
+            breaker.record_success(time.time() - attempt_start)
+            self._record_call(
+                provider.value, 1, attempt_start, result, prompt_estimate, tokens,
+                parsed={"quiz": [explanation], "rejected": []}, question_count=1,
+            )
+            return explanation, provider.value
+        
+        raise AllProvidersFailedError("All AI providers failed")
+    
+    def _client_for(self, provider: AIProvider) -> AsyncProviderClient:
+        return self.groq_client if provider == AIProvider.GROQ else self.deepseek_client
+    
+    def _ordered_providers(self) -> List[AIProvider]:
+        """Configured providers with a closed (or probing) circuit, healthiest first"""
+        configured = [p.value for p in (AIProvider.GROQ, AIProvider.DEEPSEEK) if self._client_for(p).is_configured]
+        return [AIProvider(name) for name in rank_providers(configured)]
+    
+    def _hedge_delay(self, provider: AIProvider) -> float:
+        """Seconds to wait for the primary before firing the secondary"""
+        window = provider_latency[provider.value]
+        delay = config.AI_HEDGE_DEFAULT_DELAY
+        if len(window) >= config.AI_HEDGE_MIN_SAMPLES:
+            delay = window.percentile(config.AI_HEDGE_PERCENTILE)
+        return min(max(delay, config.AI_HEDGE_MIN_DELAY), config.AI_HEDGE_MAX_DELAY)
+    
+    async def _generate_hedged(self, request: QuizGenerationRequest, primary: AIProvider, secondary: AIProvider) -> QuizResponse:
+        """
+        Start the primary; if it has not answered within its recent p95 latency,
+        start the secondary in parallel and keep whichever valid response lands first.
+        """
+        self.hedge_stats["eligible"] += 1
+        delay = self._hedge_delay(primary)
+        tasks = {asyncio.ensure_future(self._generate_with_provider(primary, request)): primary}
+        hedged = False
+        
+        try:
+            done, pending = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                primary_task = next(iter(done))
+                if primary_task.exception() is None:
+                    return self._with_hedge_metadata(primary_task.result(), hedged=False, delay=delay)
+                # Primary failed outright: plain fallback, nothing to race against
+                logger.warning(f"Provider {primary.value} failed: {primary_task.exception()}")
+            else:
+                hedged = True
+                self.hedge_stats["hedged"] += 1
+                logger.info(f"Hedging: {primary.value} slower than {delay:.1f}s, starting {secondary.value}")
+            
+            secondary_task = asyncio.ensure_future(self._generate_with_provider(secondary, request))
+            tasks[secondary_task] = secondary
+            pending.add(secondary_task)
+            
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is secondary_task:
+                            self.hedge_stats["secondary_wins"] += 1
+                        return self._with_hedge_metadata(task.result(), hedged=hedged, delay=delay)
+                    logger.warning(f"Provider {tasks[task].value} failed: {task.exception()}")
+        finally:
+            # Cancel the loser, or everything if we were cancelled ourselves
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+        
+        raise AllProvidersFailedError("All AI providers failed")
+    
+    def _with_hedge_metadata(self, response: QuizResponse, hedged: bool, delay: float) -> QuizResponse:
+        eligible = self.hedge_stats["eligible"]
+        response.metadata.update({
+            "hedged": hedged,
+            "hedge_delay": round(delay, 3),
+            "hedge_rate": round(self.hedge_stats["hedged"] / eligible, 4) if eligible else 0.0,
+            "winning_provider": response.provider_used
+        })
+        return response
+    
+    def _cache_key(self, request: QuizGenerationRequest) -> str:
+        return make_cache_key(
+            "quiz",
+            content=request.content,
+            question_count=request.question_count,
+            question_types=sorted(request.question_types),
+            difficulty=request.difficulty,
+            prompt_version=self._prompt_version(request),
+        )
+    
+    def _prompt_version(self, request: QuizGenerationRequest) -> str:
+        return self._template(request).version
+    
+    def _template(self, request: QuizGenerationRequest):
+        if request.compact:
+            return COMPACT_TEMPLATE
+        return QUIZ_TEMPLATE if request.explanations else QUIZ_LEAN_TEMPLATE
+    
+    def _response_from_cache(self, cached: Dict, lookup_time: float, prompt_version: str = PROMPT_VERSION) -> QuizResponse:
+        """Build a response from a cached generation, reshuffling options per request"""
+        for question in cached["quiz"]:
+            if question.get("type") == "multiple_choice" and "options" in question:
+                question["options"] = self._shuffle_options(question["options"])
+        
+        return QuizResponse(
+            quiz=cached["quiz"],
+            summary=cached.get("summary", ""),
+            provider_used=cached.get("provider_used", ""),
+            generation_time=lookup_time,
+            metadata={"cache_hit": True, "prompt_version": prompt_version}
+        )
     
     async def _generate_with_provider(self, provider: AIProvider, request: QuizGenerationRequest) -> QuizResponse:
         """Generate quiz with specific provider"""
-        import time
         start_time = time.time()
         
         if provider == AIProvider.GROQ:
@@ -64,200 +481,399 @@ class AIQuizGenerator:
             result = await self._generate_deepseek(request)
         
         generation_time = time.time() - start_time
+        provider_latency[provider.value].record(generation_time)
+        generation_metrics.observe("generation_seconds", generation_time, provider.value)
+        generation_metrics.observe("attempts_per_generation", result["parse_attempts"], provider.value)
         
         return QuizResponse(
             quiz=result["quiz"],
             summary=result.get("summary", ""),
             provider_used=provider.value,
-            generation_time=generation_time
+            generation_time=generation_time,
+            metadata={
+                "prompt_version": self._prompt_version(request),
+                "prompt_tokens_estimate": result["prompt_tokens_estimate"],
+                "prompt_tokens": result["prompt_tokens"],
+                "completion_tokens": result["completion_tokens"],
+                "parse_attempts": result["parse_attempts"],
+                "repair_rounds": result["repair_rounds"],
+                "rejected_questions": len(result["rejected"]),
+            }
         )
     
     async def _generate_groq(self, request: QuizGenerationRequest) -> Dict:
         """Generate using Groq with improved error handling"""
-        if not self.groq_client:
+        if not self.groq_client.is_configured:
             raise Exception("Groq client not initialized")
         
-        prompt = self._build_prompt(request)
+        return await self._complete_with_retry(self.groq_client, request)
+    
+    async def _generate_deepseek(self, request: QuizGenerationRequest) -> Dict:
+        """Generate using DeepSeek with improved error handling"""
+        if not self.deepseek_client.is_configured:
+            raise Exception("DeepSeek API key not configured")
+        
+        return await self._complete_with_retry(self.deepseek_client, request)
+    
+    async def _complete_with_retry(self, client: AsyncProviderClient, request: QuizGenerationRequest) -> Dict:
+        """
+        Await a completion from the provider's pooled client.
         
-        # Retry logic with exponential backoff
+        Failed calls (errors, or nothing usable in the response) are retried with
+        exponential backoff. A response that parses but comes up short, because
+        questions were missing or failed validation, is completed by up to
+        AI_REPAIR_ROUNDS targeted calls that ask only for the missing questions
+        (see _repair); the partial result is returned if repairs do not fill it.
+        """
+        breaker = provider_breakers[client.name]
+        messages = self._build_messages(request)
+        question_count = request.question_count
+        prompt_estimate = messages_tokens(messages)
+        tokens = {"prompt_tokens": 0, "completion_tokens": 0}
+        best = None
         for attempt in range(3):
+            # Stop retrying as soon as the circuit opens instead of paying every backoff
+            if not breaker.allow_request():
+                raise Exception(f"Circuit for {client.name} is {breaker.state}")
+            
+            attempt_start = time.time()
+            result = None
             try:
-                completion = self.groq_client.chat.completions.create(
-                    model="llama-3.3-70b-versatile",
-                    messages=[{"role": "user", "content": prompt}],
+                result = await client.chat(
+                    messages=messages,
                     temperature=0.6,
-                    max_completion_tokens=4096,
-                    top_p=0.95,
-                    stream=False
+                    max_tokens=4096,
+                    top_p=0.95
                 )
-                
-                response_text = completion.choices[0].message.content.strip()
-                return self._parse_response(response_text)
-                
+                parsed = self._parse_response(result.text, request)
+            except asyncio.CancelledError:
+                breaker.release()
+                raise
             except Exception as e:
+                breaker.record_failure(time.time() - attempt_start, str(e))
+                self._record_call(client.name, attempt + 1, attempt_start, result, prompt_estimate, tokens, error=str(e))
                 if attempt == 2:  # Last attempt
                     raise e
+                generation_metrics.observe("backoff_seconds", 2 ** attempt, client.name)
                 await asyncio.sleep(2 ** attempt)  # Exponential backoff
-    
-    async def _generate_deepseek(self, request: QuizGenerationRequest) -> Dict:
-        """Generate using DeepSeek with improved error handling"""
-        if not config.DEEPSEEK_API_KEY:
-            raise Exception("DeepSeek API key not configured")
+                continue
+            
+            breaker.record_success(time.time() - attempt_start)
+            self._record_call(
+                client.name, attempt + 1, attempt_start, result, prompt_estimate, tokens,
+                parsed=parsed, question_count=question_count,
+            )
+            parsed["parse_attempts"] = attempt + 1
+            best = parsed
+            break
         
-        prompt = self._build_prompt(request)
-        headers = {
-            "Authorization": f"Bearer {config.DEEPSEEK_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        payload = {
-            "model": "deepseek-chat",
-            "messages": [{"role": "user", "content": prompt}],
-            "temperature": 0.6,
-            "max_tokens": 4096,
-            "top_p": 0.95
-        }
+        best["repair_rounds"] = 0
+        if len(best["quiz"]) < question_count:
+            logger.warning(
+                f"{client.name} returned {len(best['quiz'])}/{question_count} usable questions "
+                f"({len(best['rejected'])} rejected); repairing"
+            )
+            await self._repair(client, request, best, tokens, best["parse_attempts"])
         
-        # Retry logic
-        for attempt in range(3):
+        best["quiz"] = best["quiz"][:question_count]
+        best["prompt_tokens_estimate"] = prompt_estimate
+        # Totals over every attempt, i.e. what this generation actually cost
+        best.update(tokens)
+        return best
+    
+    async def _repair(
+        self, client: AsyncProviderClient, request: QuizGenerationRequest, best: Dict, tokens: Dict[str, int], attempts: int
+    ):
+        """
+        Regenerate only the questions best is missing, for at most AI_REPAIR_ROUNDS calls.
+        
+        Each round asks for the shortfall alone (in compact mode, just the cards
+        without a question); new questions that duplicate accepted ones are
+        dropped. Stops early on a provider error or an open circuit and leaves
+        best partial.
+        """
+        breaker = provider_breakers[client.name]
+        for round_number in range(1, config.AI_REPAIR_ROUNDS + 1):
+            missing = request.question_count - len(best["quiz"])
+            if missing <= 0 or not breaker.allow_request():
+                return
+            
+            repair_request = self._repair_request(request, best["quiz"])
+            messages = self._build_messages(repair_request)
+            attempt_start = time.time()
+            result = None
             try:
-                response = requests.post(
-                    config.DEEPSEEK_API_URL, 
-                    headers=headers, 
-                    json=payload,
-                    timeout=30
-                )
-                response.raise_for_status()
-                
-                response_text = response.json()["choices"][0]["message"]["content"].strip()
-                return self._parse_response(response_text)
-                
+                result = await client.chat(messages=messages, temperature=0.6, max_tokens=4096, top_p=0.95)
+                parsed = self._parse_response(result.text, repair_request)
+            except asyncio.CancelledError:
+                breaker.release()
+                raise
             except Exception as e:
-                if attempt == 2:
-                    raise e
-                await asyncio.sleep(2 ** attempt)
+                breaker.record_failure(time.time() - attempt_start, str(e))
+                self._record_call(
+                    client.name, attempts + round_number, attempt_start, result, messages_tokens(messages), tokens, error=str(e)
+                )
+                generation_metrics.increment("repair", "failed")
+                logger.warning(f"Repair round {round_number} on {client.name} failed: {e}")
+                return
+            
+            breaker.record_success(time.time() - attempt_start)
+            self._record_call(
+                client.name, attempts + round_number, attempt_start, result, messages_tokens(messages), tokens,
+                parsed=parsed, question_count=missing,
+            )
+            seen = {question_fingerprint(question) for question in best["quiz"]}
+            added = 0
+            for question in parsed["quiz"]:
+                fingerprint = question_fingerprint(question)
+                if added < missing and fingerprint not in seen:
+                    seen.add(fingerprint)
+                    best["quiz"].append(question)
+                    added += 1
+            best["rejected"].extend(parsed["rejected"])
+            best["repair_rounds"] = round_number
+            generation_metrics.increment("repair", "rounds")
+            generation_metrics.increment("repair", "questions", added)
     
-    def _build_prompt(self, request: QuizGenerationRequest) -> str:
-        """Build optimized prompt for better consistency"""
-        types_str = ", ".join(f'"{t}"' for t in request.question_types)
+    def _repair_request(self, request: QuizGenerationRequest, accepted: List[Dict]) -> QuizGenerationRequest:
+        """The same request narrowed to the questions still missing"""
+        if request.compact:
+            done = {question.get("flashcard_id") for question in accepted}
+            cards = {card_id: card for card_id, card in request.compact.items() if card_id not in done}
+            lines = [line for line in request.content.split("\n") if int(line.split("|", 1)[0]) in cards]
+            return dataclass_replace(request, content="\n".join(lines), question_count=len(cards), compact=cards)
         
-        difficulty_instructions = {
-            "easy": "Use simple vocabulary and straightforward concepts.",
-            "medium": "Use moderate complexity with some technical terms.",
-            "hard": "Use advanced concepts and detailed analysis."
-        }
+        missing = request.question_count - len(accepted)
+        asked = "\n".join(f"- {question['question']}" for question in accepted)
+        return dataclass_replace(
+            request,
+            content=f"{request.content}\n\nALREADY ASKED (write {missing} different questions):\n{asked}",
+            question_count=missing,
+        )
+    
+    def _record_call(
+        self,
+        provider: str,
+        attempt: int,
+        attempt_start: float,
+        result: Optional[ChatResult],
+        prompt_estimate: int,
+        tokens: Dict[str, int],
+        parsed: Optional[Dict] = None,
+        question_count: int = 0,
+        error: Optional[str] = None,
+    ):
+        """Record one non-streamed attempt and add its token usage to tokens"""
+        record = CallRecord(provider=provider, attempt=attempt, outcome=PROVIDER_ERROR,
+                            latency=time.time() - attempt_start, error=error[:200] if error else None)
+        if result is not None:
+            usage = result.usage
+            record.queue_time = round(result.queue_time, 4)
+            record.finish_reason = result.finish_reason
+            if usage.get("prompt_tokens") is not None and usage.get("completion_tokens") is not None:
+                record.prompt_tokens = usage["prompt_tokens"]
+                record.completion_tokens = usage["completion_tokens"]
+            else:
+                record.prompt_tokens = prompt_estimate
+                record.completion_tokens = count_tokens(result.text)
+                record.token_source = "estimate"
+            if parsed is None:
+                record.outcome = NO_QUESTIONS
+            else:
+                record.questions = len(parsed["quiz"])
+                record.rejected = len(parsed["rejected"])
+                record.outcome = OK if record.questions >= question_count else PARTIAL
+            tokens["prompt_tokens"] += record.prompt_tokens
+            tokens["completion_tokens"] += record.completion_tokens
+        generation_metrics.record_call(record)
+    
+    def _record_stream_call(
+        self,
+        provider: AIProvider,
+        stream_start: float,
+        prompt_tokens: int,
+        deltas: List[str],
+        questions: List[Dict],
+        request: QuizGenerationRequest,
+        error: Optional[str] = None,
+    ):
+        """Record one streamed attempt; providers send no usage on streams, so tokens are estimated"""
+        if error is not None and not deltas:
+            outcome = PROVIDER_ERROR
+        elif not questions:
+            outcome = NO_QUESTIONS
+        else:
+            outcome = OK if len(questions) >= request.question_count else PARTIAL
+        generation_metrics.record_call(CallRecord(
+            provider=provider.value,
+            attempt=1,
+            outcome=outcome,
+            latency=time.time() - stream_start,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=count_tokens("".join(deltas)),
+            token_source="estimate",
+            questions=len(questions),
+            streamed=True,
+            error=error[:200] if error else None,
+        ))
+    
+    def _build_messages(self, request: QuizGenerationRequest) -> List[Dict]:
+        """Render the compiled quiz template; only the trailing user message varies per request"""
+        if request.compact:
+            return COMPACT_TEMPLATE.render(content=request.content)
+        return self._template(request).render(
+            question_count=request.question_count,
+            question_types=", ".join(f'"{t}"' for t in request.question_types),
+            difficulty=request.difficulty,
+            difficulty_instructions=DIFFICULTY_INSTRUCTIONS.get(request.difficulty, ""),
+            content=request.content,
+        )
+    
+    def _parse_response(self, response_text: str, request: Optional[QuizGenerationRequest] = None) -> Dict:
+        """
+        Parse a completion, keeping every valid question.
         
-        prompt = f"""You are an expert Canadian Citizenship Test Quiz Generator.
-
-TASK: Create a quiz from the provided content with exactly {request.question_count} questions.
-
-REQUIREMENTS:
-1. Question types: [{types_str}]
-2. Difficulty level: {request.difficulty} - {difficulty_instructions.get(request.difficulty, "")}
-3. Focus on Canadian citizenship test topics: history, geography, government, rights, responsibilities
-4. Ensure questions are factual and test comprehension
-5. Provide clear, unambiguous answers
-
-CRITICAL FORMATTING RULES:
-❌ NEVER include letter prefixes (A), B), C), D)) in the option text
-❌ NEVER include numbers (1., 2., 3., 4.) in the option text
-✅ ALWAYS provide only the plain text of each option
-✅ The UI will automatically add the A/B/C/D labels
-
-CORRECT EXAMPLE:
-{{
-  "question": "What is the capital of Canada?",
-  "type": "multiple_choice",
-  "options": [
-    "Ottawa",
-    "Toronto", 
-    "Montreal",
-    "Vancouver"
-  ],
-  "answer": "Ottawa"
-}}
-
-WRONG EXAMPLE (DO NOT DO THIS):
-{{
-  "question": "What is the capital of Canada?",
-  "options": [
-    "A) Ottawa",           ❌ Wrong - has letter prefix
-    "B) Toronto",          ❌ Wrong - has letter prefix
-    "C) Montreal",         ❌ Wrong - has letter prefix
-    "D) Vancouver"         ❌ Wrong - has letter prefix
-  ]
-}}
-
-OUTPUT FORMAT (STRICT JSON):
-{{
-  "summary": "Brief 2-3 sentence summary of the content",
-  "quiz": [
-    {{
-      "question": "Clear, specific question text (no prefixes)",
-      "type": "multiple_choice|true_false|short_answer",
-      "options": ["Plain text option 1", "Plain text option 2", "Plain text option 3", "Plain text option 4"],
-      "answer": "Plain text of the correct answer (must exactly match one option)",
-      "explanation": "Brief explanation of why this is correct"
-    }}
-  ]
-}}
-
-CONTENT TO ANALYZE:
-{request.content}
-
-Generate exactly {request.question_count} questions. Respond with ONLY the JSON, no additional text."""
-
-        return prompt
+        Returns {"quiz", "summary", "rejected"} where rejected lists why each
+        dropped question was unusable. Raises ValueError only when nothing usable
+        is left.
+        """
+        parsed = parse_quiz_text(response_text)
+        clean = self._question_cleaner(request)
+        
+        quiz, rejected = [], []
+        for i, question in enumerate(parsed.questions):
+            try:
+                quiz.append(clean(question, i))
+            except ValueError as e:
+                rejected.append(str(e))
+        rejected.extend(f"Malformed question JSON: {raw[:80]}" for raw in parsed.errors)
+        
+        if rejected:
+            logger.warning(f"Dropped {len(rejected)} unusable question(s): {rejected[:3]}")
+        if not quiz:
+            raise ValueError(f"No usable questions in AI response ({len(rejected)} rejected)")
+        
+        return {"quiz": quiz, "summary": parsed.summary, "rejected": rejected}
     
-    def _parse_response(self, response_text: str) -> Dict:
-        """Enhanced response parsing with better error handling"""
-        # Try to find JSON in the response
-        json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-        if not json_match:
-            raise ValueError("No JSON found in AI response")
+    def _question_cleaner(self, request: Optional[QuizGenerationRequest]) -> Callable[[Dict, int], Dict]:
+        """Validates one parsed question; compact items are expanded into full questions"""
+        if request is None or not request.compact:
+            return self._clean_question
         
-        json_text = json_match.group(0)
+        cards = request.compact
+        seen = set()
         
-        try:
-            result = json.loads(json_text)
-        except json.JSONDecodeError as e:
-            # Try to fix common JSON issues
-            json_text = self._fix_json_issues(json_text)
+        def expand(item: Dict, index: int) -> Dict:
+            if not isinstance(item, dict):
+                raise ValueError(f"Item {index} is not a valid object")
             try:
-                result = json.loads(json_text)
-            except json.JSONDecodeError:
-                raise ValueError(f"Invalid JSON in AI response: {e}")
+                card = cards[int(item.get("id"))]
+            except (TypeError, ValueError, KeyError):
+                raise ValueError(f"Item {index} has an unknown flashcard id: {item.get('id')!r}")
+            if card["id"] in seen:
+                raise ValueError(f"Item {index} repeats flashcard {card['id']}")
+            question = self._expand_compact_item(card, item, index)
+            seen.add(card["id"])
+            return question
         
-        # Validate structure
-        if not isinstance(result, dict):
-            raise ValueError("Response is not a JSON object")
+        return expand
+    
+    def _expand_compact_item(self, card: Dict, item: Dict, index: int) -> Dict:
+        """A full question from the known flashcard plus the model's distractors or statement"""
+        if card["kind"] == "mc":
+            answer = card["answer"]
+            distractors, seen = [], {answer.lower()}
+            for text in item.get("d") or []:
+                text = self._clean_option_text(text)
+                if isinstance(text, str) and text and text.lower() not in seen:
+                    seen.add(text.lower())
+                    distractors.append(text)
+            if len(distractors) < 2:
+                raise ValueError(f"Item {index} has {len(distractors)} usable distractor(s)")
+            return {
+                "question": card["question"],
+                "type": "multiple_choice",
+                "options": self._shuffle_options([answer] + distractors[:3]),
+                "answer": answer,
+                "flashcard_id": card["id"],
+            }
         
-        if "quiz" not in result or not isinstance(result["quiz"], list):
-            raise ValueError("Invalid quiz format in AI response")
+        statement = item.get("s")
+        if not isinstance(statement, str) or not statement.strip():
+            raise ValueError(f"Item {index} is missing its statement")
+        return {
+            "question": f"True or false: {statement.strip()}",
+            "type": "true_false",
+            "options": ["True", "False"],
+            "answer": "True" if card["kind"] == "t" else "False",
+            "flashcard_id": card["id"],
+        }
+    
+    def _clean_question(self, question: Dict, index: int) -> Dict:
+        """Validate a single question, strip option prefixes and shuffle its options"""
+        if not isinstance(question, dict):
+            raise ValueError(f"Question {index} is not a valid object")
         
-        # Validate and clean each question
-        for i, question in enumerate(result["quiz"]):
-            if not isinstance(question, dict):
-                raise ValueError(f"Question {i} is not a valid object")
-            
-            required_fields = ["question", "type", "answer"]
-            for field in required_fields:
-                if field not in question:
-                    raise ValueError(f"Question {i} missing required field: {field}")
-            
-            # Clean up options if they have letter/number prefixes
-            if "options" in question and isinstance(question["options"], list):
-                question["options"] = [self._clean_option_text(opt) for opt in question["options"]]
-            
-            # Also clean the answer if it has a prefix
-            if "answer" in question:
-                question["answer"] = self._clean_option_text(question["answer"])
-            
-            # CRITICAL: Shuffle options for multiple choice to prevent pattern recognition
-            # The AI often puts the correct answer first, so we need to randomize
-            if question["type"] == "multiple_choice" and "options" in question:
-                question["options"] = self._shuffle_options(question["options"])
+        required_fields = ["question", "type", "answer"]
+        for field_name in required_fields:
+            if field_name not in question:
+                raise ValueError(f"Question {index} missing required field: {field_name}")
+        
+        # Clean up options if they have letter/number prefixes
+        if "options" in question and isinstance(question["options"], list):
+            question["options"] = [self._clean_option_text(opt) for opt in question["options"]]
+        
+        # Also clean the answer if it has a prefix
+        if "answer" in question:
+            question["answer"] = self._clean_option_text(question["answer"])
+        
+        self._validate_question(question, index)
         
-        return result
+        # CRITICAL: Shuffle options for multiple choice to prevent pattern recognition
+        # The AI often puts the correct answer first, so we need to randomize
+        if question["type"] == "multiple_choice" and "options" in question:
+            question["options"] = self._shuffle_options(question["options"])
+        
+        return question
+    
+    def _validate_question(self, question: Dict, index: int):
+        """
+        Reject questions that cannot be answered as asked, e.g. an answer that
+        matches no option; fixes up answers that only differ in case or spacing.
+        """
+        if isinstance(question["answer"], bool):
+            question["answer"] = "True" if question["answer"] else "False"
+        if not isinstance(question["question"], str) or not question["question"].strip():
+            raise ValueError(f"Question {index} has no question text")
+        if not isinstance(question["answer"], str) or not question["answer"].strip():
+            raise ValueError(f"Question {index} has no answer")
+        
+        question_type = str(question["type"]).strip().lower().replace("-", "_").replace(" ", "_")
+        if question_type not in QUESTION_TYPES:
+            raise ValueError(f"Question {index} has unknown type {question['type']!r}")
+        question["type"] = question_type
+        
+        if question_type == "true_false":
+            answer = question["answer"].strip().capitalize()
+            if answer not in ("True", "False"):
+                raise ValueError(f"Question {index} is true/false but answers {question['answer']!r}")
+            question["answer"] = answer
+            question["options"] = ["True", "False"]
+        elif question_type == "multiple_choice":
+            options, seen = [], set()
+            for option in question.get("options") or []:
+                key = " ".join(option.lower().split()) if isinstance(option, str) else ""
+                if key and key not in seen:
+                    seen.add(key)
+                    options.append(option.strip())
+            if len(options) < 2:
+                raise ValueError(f"Question {index} has {len(options)} distinct option(s)")
+            answer_key = " ".join(question["answer"].lower().split())
+            matching = [option for option in options if " ".join(option.lower().split()) == answer_key]
+            if not matching:
+                raise ValueError(f"Question {index} answer {question['answer'][:40]!r} matches no option")
+            question["options"] = options
+            question["answer"] = matching[0]
     
     def _clean_option_text(self, text: str) -> str:
         """Remove letter/number prefixes from option text"""
@@ -278,16 +894,6 @@ Generate exactly {request.question_count} questions. Respond with ONLY the JSON,
         shuffled = options.copy()  # Don't modify the original
         random.shuffle(shuffled)
         return shuffled
-    
-    def _fix_json_issues(self, json_text: str) -> str:
-        """Attempt to fix common JSON formatting issues"""
-        # Remove trailing commas
-        json_text = re.sub(r',(\s*[}\]])', r'\1', json_text)
-        
-        # Fix unescaped quotes in strings
-        json_text = re.sub(r'(?<!\\)"(?=[^,}\]]*[,}\]])', r'\\"', json_text)
-        
-        return json_text
 
 # Global instance
 ai_generator = AIQuizGenerator()
@@ -308,6 +914,57 @@ async def generate_quiz(content: str, question_count: int, question_types: List[
         "summary": response.summary,
         "metadata": {
             "provider_used": response.provider_used,
-            "generation_time": response.generation_time
+            "generation_time": response.generation_time,
+            "cache_hit": False,
+            **response.metadata
+        }
+    }
+
+def compact_request(
+    flashcards: Sequence[Tuple[int, str, str]], question_types: List[str], rng: Optional[random.Random] = None
+) -> QuizGenerationRequest:
+    """
+    Distractor-only request for known (flashcard_id, question, answer) cards.
+    
+    Each card is assigned a kind up front: "mc" (the model writes 3 distractors)
+    or, for true/false, "t"/"f" (the model writes one true or false statement).
+    The question, answer and flashcard_id come from the card, so the completion
+    is a fraction of the full quiz JSON.
+    """
+    rng = rng or random.Random()
+    wants_mc = "multiple_choice" in question_types
+    wants_tf = "true_false" in question_types
+    cards, lines = {}, []
+    for flashcard_id, question, answer in flashcards:
+        # Same mix as the local distractor engine: about one true/false question per four
+        if wants_tf and (not wants_mc or rng.random() < 0.25):
+            kind = rng.choice(["t", "f"])
+        else:
+            kind = "mc"
+        cards[flashcard_id] = {"id": flashcard_id, "question": question, "answer": (answer or "").strip(), "kind": kind}
+        fields = [str(flashcard_id), kind, question, answer or ""]
+        lines.append("|".join(" ".join(field.replace("|", "/").split()) for field in fields))
+    return QuizGenerationRequest(
+        content="\n".join(lines),
+        question_count=len(cards),
+        question_types=question_types,
+        compact=cards,
+    )
+
+async def generate_quiz_requests(requests: List[QuizGenerationRequest]) -> dict:
+    """generate_quiz for prepared requests; several are generated concurrently and merged (AIQuizGenerator.generate_quiz_fanout)"""
+    if len(requests) == 1:
+        response = await ai_generator.generate_quiz(requests[0])
+    else:
+        response = await ai_generator.generate_quiz_fanout(requests)
+    
+    return {
+        "quiz": response.quiz,
+        "summary": response.summary,
+        "metadata": {
+            "provider_used": response.provider_used,
+            "generation_time": response.generation_time,
+            "cache_hit": False,
+            **response.metadata
         }
-    }
\ No newline at end of file
+    }
@@ -0,0 +1,235 @@
+"""
+Read-only in-memory snapshot of the chapter and flashcard catalog.
+
+Chapters and flashcards change a few times a month but are read on every page
+load, so the public catalog endpoints (/chapters/, /chapters/{id},
+/chapters/{id}/flashcards, /chapters/stats, /flashcards/ and
+/flashcards/{id}) are served from an immutable snapshot instead of the
+database.
+
+A snapshot is built with two queries: chapters, then flashcard columns ordered
+by id. It holds compact __slots__ records, tuples, and lookups precomputed per
+chapter, category and tag. The flashcard and chapter write paths call
+service.catalog_changed(), whose bump() increments the catalog version. The
+next read builds a new snapshot and swaps it in with a single reference
+assignment. Readers that already hold the old snapshot keep a consistent view
+until they finish. Snapshots are also rebuilt after CATALOG_TTL_SECONDS, so
+writes made by other worker processes show up.
+
+Each snapshot carries an etag, a hash of its content rather than of the
+per-process version, so every worker hands out the same ETag for the same
+data and conditional GETs revalidate correctly behind a load balancer.
+Listings page by keyset: id order, or (chapter_id, id) within a chapter, with
+bisect on the precomputed tuples instead of an offset scan.
+"""
+import hashlib
+import logging
+import threading
+import time
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from ..db import models as db_models
+from ..utils import config
+
+logger = logging.getLogger(__name__)
+
+
+class ChapterRecord:
+    """A chapter as the API returns it (schemas.Chapter reads these attributes)"""
+
+    __slots__ = ("id", "title", "description", "order", "created_at", "updated_at")
+
+    def __init__(
+        self, id: int, title: str, description: Optional[str], order: Optional[int],
+        created_at: Optional[datetime], updated_at: Optional[datetime],
+    ):
+        self.id = id
+        self.title = title
+        self.description = description
+        self.order = order
+        self.created_at = created_at
+        self.updated_at = updated_at
+
+
+class FlashcardRecord:
+    """A flashcard as the API returns it (schemas.Flashcard), sharing its chapter's record"""
+
+    __slots__ = ("id", "question", "answer", "tags", "category", "chapter_id", "weight", "chapter")
+
+    def __init__(
+        self, id: int, question: str, answer: str, tags: Optional[Tuple[str, ...]], category: Optional[str],
+        chapter_id: Optional[int], weight: float, chapter: Optional[ChapterRecord],
+    ):
+        self.id = id
+        self.question = question
+        self.answer = answer
+        self.tags = tags
+        self.category = category
+        self.chapter_id = chapter_id
+        self.weight = weight
+        self.chapter = chapter
+
+
+class CatalogSnapshot:
+    """One immutable version of the catalog; every collection is a tuple"""
+
+    __slots__ = (
+        "version", "etag", "loaded_at", "chapters", "chapter_by_id", "flashcards", "flashcard_by_id",
+        "by_chapter", "by_category", "by_tag",
+    )
+
+    def __init__(self, version: int, etag: str, chapters: List[ChapterRecord], flashcards: List[FlashcardRecord]):
+        self.version = version
+        self.etag = etag
+        self.loaded_at = time.monotonic()
+        self.chapters = tuple(chapters)
+        self.chapter_by_id = {chapter.id: chapter for chapter in chapters}
+        self.flashcards = tuple(flashcards)
+        self.flashcard_by_id = {flashcard.id: flashcard for flashcard in flashcards}
+
+        by_chapter: Dict[Optional[int], List[FlashcardRecord]] = defaultdict(list)
+        by_category: Dict[str, List[FlashcardRecord]] = defaultdict(list)
+        by_tag: Dict[str, List[FlashcardRecord]] = defaultdict(list)
+        for flashcard in flashcards:
+            by_chapter[flashcard.chapter_id].append(flashcard)
+            if flashcard.category:
+                by_category[flashcard.category].append(flashcard)
+            for tag in flashcard.tags or ():
+                by_tag[tag].append(flashcard)
+        self.by_chapter = {chapter_id: tuple(cards) for chapter_id, cards in by_chapter.items()}
+        self.by_category = {category: tuple(cards) for category, cards in by_category.items()}
+        self.by_tag = {tag: tuple(cards) for tag, cards in by_tag.items()}
+
+    def list_flashcards(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        category: Optional[str] = None,
+        tag: Optional[str] = None,
+        chapter_id: Optional[int] = None,
+        after: Optional[Tuple[int, ...]] = None,
+    ) -> Tuple[FlashcardRecord, ...]:
+        """
+        Flashcards filtered by chapter, category and tag: the page after the
+        sort key after (see flashcard_sort_key), then skip and limit.
+        """
+        filters = [
+            self.by_chapter.get(chapter_id, ()) if chapter_id is not None else None,
+            self.by_category.get(category, ()) if category else None,
+            self.by_tag.get(tag, ()) if tag else None,
+        ]
+        filters = sorted((f for f in filters if f is not None), key=len)
+        if not filters:
+            flashcards = self.flashcards
+        elif len(filters) == 1:
+            flashcards = filters[0]
+        else:
+            # Walk the smallest list; the others only need membership checks
+            others = [{flashcard.id for flashcard in f} for f in filters[1:]]
+            flashcards = tuple(f for f in filters[0] if all(f.id in ids for ids in others))
+        start = 0
+        if after is not None:
+            start = bisect_right(flashcards, after, key=lambda f: flashcard_sort_key(f, chapter_id))
+        return flashcards[start + skip:start + skip + limit]
+
+    def chapter_flashcards(
+        self, chapter_id: int, limit: int = 100, after: Optional[Tuple[int, ...]] = None
+    ) -> Tuple[FlashcardRecord, ...]:
+        return self.list_flashcards(limit=limit, chapter_id=chapter_id, after=after)
+
+    def stats(self) -> Dict:
+        """Same shape as chapter_service.get_chapter_stats"""
+        return {
+            "total_chapters": len(self.chapters),
+            "chapters": [
+                {
+                    "id": chapter.id,
+                    "title": chapter.title,
+                    "order": chapter.order,
+                    "flashcard_count": len(self.by_chapter.get(chapter.id, ())),
+                }
+                for chapter in self.chapters
+            ],
+        }
+
+
+def flashcard_sort_key(flashcard, chapter_id: Optional[int] = None) -> Tuple[int, ...]:
+    """Keyset sort key of a listing: (id), or (chapter_id, id) for a chapter's cards"""
+    return (flashcard.chapter_id, flashcard.id) if chapter_id is not None else (flashcard.id,)
+
+
+class Catalog:
+    """Holds the current CatalogSnapshot and rebuilds it when the version moves"""
+
+    def __init__(self):
+        self._version = 0
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def bump(self):
+        """Record a catalog write; the next read builds a fresh snapshot"""
+        self._version += 1
+
+    def get(self, db: Session) -> CatalogSnapshot:
+        """The current snapshot; only touches db when it has to be (re)built"""
+        snapshot = self._snapshot
+        if self._is_current(snapshot):
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if not self._is_current(snapshot):
+                snapshot = self.load(db)
+        return snapshot
+
+    def _is_current(self, snapshot: Optional[CatalogSnapshot]) -> bool:
+        return (
+            snapshot is not None
+            and snapshot.version == self._version
+            and time.monotonic() - snapshot.loaded_at < config.CATALOG_TTL_SECONDS
+        )
+
+    def load(self, db: Session) -> CatalogSnapshot:
+        """Build a snapshot from the database and swap it in"""
+        # Read the version first: a write landing during the load leaves the snapshot behind it
+        version = self._version
+        chapters = [
+            ChapterRecord(c.id, c.title, c.description, c.order, c.created_at, c.updated_at)
+            for c in db.query(db_models.Chapter).order_by(db_models.Chapter.order).all()
+        ]
+        chapter_by_id = {chapter.id: chapter for chapter in chapters}
+        rows = db.query(
+            db_models.Flashcard.id,
+            db_models.Flashcard.question,
+            db_models.Flashcard.answer,
+            db_models.Flashcard.tags,
+            db_models.Flashcard.category,
+            db_models.Flashcard.chapter_id,
+            db_models.Flashcard.weight,
+        ).order_by(db_models.Flashcard.id).all()
+        flashcards = [
+            FlashcardRecord(
+                id, question, answer, tuple(tags) if tags is not None else None, category,
+                chapter_id, weight, chapter_by_id.get(chapter_id),
+            )
+            for id, question, answer, tags, category, chapter_id, weight in rows
+        ]
+        content = hashlib.blake2b(digest_size=12)
+        for chapter in chapters:
+            content.update(repr((chapter.id, chapter.title, chapter.description, chapter.order)).encode())
+        for row in rows:
+            content.update(repr(tuple(row)).encode())
+        snapshot = CatalogSnapshot(version, content.hexdigest(), chapters, flashcards)
+        self._snapshot = snapshot
+        self.loads += 1
+        logger.info(f"Catalog snapshot v{version} loaded: {len(chapters)} chapters, {len(flashcards)} flashcards")
+        return snapshot
+
+
+# Global instance
+catalog = Catalog()
@@ -8,6 +8,7 @@ from sqlalchemy.exc import IntegrityError
 
 from ..db import models as db_models
 from ..utils.constants import CANADIAN_CHAPTERS, CHAPTER_MAPPING
+from .service import catalog_changed
 
 logger = logging.getLogger(__name__)
 
@@ -48,6 +49,7 @@ def initialize_chapters(db: Session) -> Dict[str, int]:
                 db.add(new_chapter)
                 db.commit()
                 db.refresh(new_chapter)
+                catalog_changed()
                 
                 chapter_mapping[chapter_data["title"]] = new_chapter.id
                 logger.info(f"Created chapter '{chapter_data['title']}' with ID {new_chapter.id}")
@@ -126,6 +128,7 @@ def assign_flashcard_to_chapter(db: Session, flashcard_id: int, chapter_title: s
         
         flashcard.chapter_id = chapter.id
         db.commit()
+        catalog_changed()
         
         logger.info(f"Assigned flashcard {flashcard_id} to chapter '{chapter_title}'")
         return True
@@ -0,0 +1,302 @@
+"""
+LLM-free quiz questions built directly from flashcards.
+
+Every flashcard already carries its correct answer, so a multiple-choice
+question only needs plausible wrong options. The engine keeps a per-chapter
+index of flashcard answers grouped by answer type (date, number, place, name,
+text) and draws distractors of the same type, preferring the same chapter and,
+for dates and numbers, values close to the correct one.
+
+The index is built with one query on first use and rebuilt lazily after any
+flashcard write calls invalidate(), and at least every
+DISTRACTOR_INDEX_TTL_SECONDS so writes from other workers and scripts show up.
+"""
+import logging
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from ..db import models as db_models
+from ..utils import config
+
+logger = logging.getLogger(__name__)
+
+DATE = "date"
+NUMBER = "number"
+PLACE = "place"
+NAME = "name"
+TEXT = "text"
+
+_MONTHS = (
+    "january|february|march|april|may|june|july|august|september|october|november|december"
+)
+_YEAR = re.compile(r"^(?:in\s+)?(1[0-9]{3}|20[0-9]{2})\.?$", re.IGNORECASE)
+_DATE = re.compile(
+    rf"^(?:on\s+)?(?:\d{{1,2}}(?:st|nd|rd|th)?\s+)?(?:{_MONTHS})(?:\s+\d{{1,2}}(?:st|nd|rd|th)?)?(?:,?\s+\d{{4}})?\.?$"
+    r"|^\d{1,2}/\d{1,2}/\d{2,4}$",
+    re.IGNORECASE,
+)
+_NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8,
+    "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "thirteen": 13, "fourteen": 14,
+    "fifteen": 15, "twenty": 20, "thirty": 30, "forty": 40, "fifty": 50, "hundred": 100,
+}
+_FIRST_NUMBER = re.compile(r"\d[\d,]*(?:\.\d+)?")
+_YEAR_IN_TEXT = re.compile(r"\b(?:1[0-9]{3}|20[0-9]{2})\b")
+_NAME_PARTICLES = {"de", "of", "la", "le", "du", "van", "von", "sir", "st.", "mc"}
+
+# Places that come up in the Discover Canada material; anything else capitalised is treated as a name
+PLACES = {
+    "alberta", "british columbia", "manitoba", "new brunswick", "newfoundland and labrador",
+    "newfoundland", "nova scotia", "ontario", "prince edward island", "quebec", "saskatchewan",
+    "northwest territories", "nunavut", "yukon",
+    "ottawa", "toronto", "montreal", "vancouver", "calgary", "edmonton", "winnipeg", "regina",
+    "saskatoon", "halifax", "fredericton", "charlottetown", "st. john's", "victoria", "whitehorse",
+    "yellowknife", "iqaluit", "quebec city", "hamilton", "kingston", "london", "paris",
+    "canada", "united states", "united kingdom", "england", "scotland", "ireland", "wales",
+    "france", "britain", "great britain",
+    "atlantic ocean", "pacific ocean", "arctic ocean", "hudson bay", "great lakes",
+    "st. lawrence river", "niagara falls", "rocky mountains", "canadian shield",
+    "atlantic provinces", "prairie provinces", "the prairies", "central canada", "west coast",
+    "the north", "lower canada", "upper canada", "new france", "acadia",
+}
+
+
+def _normalize(answer: str) -> str:
+    return re.sub(r"\s+", " ", answer.strip().rstrip(".")).lower()
+
+
+def classify_answer(answer: str) -> str:
+    """Answer type used to keep distractors comparable to the correct answer"""
+    text = answer.strip()
+    normalized = _normalize(text)
+    if _YEAR.match(text) or _DATE.match(text):
+        return DATE
+    words = normalized.split()
+    if len(words) <= 4 and (_FIRST_NUMBER.search(normalized) or (words and words[0] in _NUMBER_WORDS)):
+        return NUMBER
+    if normalized in PLACES or normalized.removeprefix("the ") in PLACES:
+        return PLACE
+    raw_words = text.rstrip(".").split()
+    if 2 <= len(raw_words) <= 5 and all(
+        word[0].isupper() or word.lower() in _NAME_PARTICLES for word in raw_words
+    ) and not any(char.isdigit() for char in text):
+        return NAME
+    return TEXT
+
+
+def _number_match(answer: str) -> Optional[re.Match]:
+    """The year in a date ("July 1, 1867"), otherwise the first number"""
+    return _YEAR_IN_TEXT.search(answer) or _FIRST_NUMBER.search(answer)
+
+
+def numeric_value(answer: str) -> Optional[float]:
+    match = _number_match(answer)
+    if match:
+        try:
+            return float(match.group(0).replace(",", ""))
+        except ValueError:
+            return None
+    first = _normalize(answer).split(" ", 1)[0]
+    return float(_NUMBER_WORDS[first]) if first in _NUMBER_WORDS else None
+
+
+class DistractorEngine:
+    """Builds multiple-choice and true/false questions from flashcards without an LLM"""
+
+    def __init__(self):
+        # chapter id (None for unassigned cards) -> answer type -> distinct answers
+        self._by_chapter: Dict[Optional[int], Dict[str, List[str]]] = {}
+        self._by_type: Dict[str, List[str]] = {}
+        self._stale = True
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+        self.questions_built = 0
+
+    #
+    # Index
+    #
+
+    def invalidate(self):
+        """Mark the answer index stale; it is rebuilt on next use"""
+        self._stale = True
+
+    def ensure_index(self, db: Session):
+        if not self._stale and time.monotonic() - self._built_at < config.DISTRACTOR_INDEX_TTL_SECONDS:
+            return
+        with self._lock:
+            if self._stale or time.monotonic() - self._built_at >= config.DISTRACTOR_INDEX_TTL_SECONDS:
+                # Clear the flag first so a write racing with the rebuild marks it stale again
+                self._stale = False
+                self._built_at = time.monotonic()
+                self._build(db.query(db_models.Flashcard.chapter_id, db_models.Flashcard.answer).all())
+
+    def _build(self, rows: Sequence[Tuple[Optional[int], str]]):
+        by_chapter: Dict[Optional[int], Dict[str, Dict[str, str]]] = defaultdict(lambda: defaultdict(dict))
+        by_type: Dict[str, Dict[str, str]] = defaultdict(dict)
+        for chapter_id, answer in rows:
+            if not answer or not answer.strip():
+                continue
+            answer = answer.strip()
+            answer_type = classify_answer(answer)
+            key = _normalize(answer)
+            by_chapter[chapter_id][answer_type].setdefault(key, answer)
+            by_type[answer_type].setdefault(key, answer)
+
+        self._by_chapter = {
+            chapter_id: {answer_type: list(answers.values()) for answer_type, answers in types.items()}
+            for chapter_id, types in by_chapter.items()
+        }
+        self._by_type = {answer_type: list(answers.values()) for answer_type, answers in by_type.items()}
+        logger.info(f"Distractor index built from {len(rows)} flashcards across {len(self._by_chapter)} chapters")
+
+    #
+    # Distractors
+    #
+
+    def distractors_for(
+        self, answer: str, chapter_id: Optional[int], count: int = 3, rng: Optional[random.Random] = None
+    ) -> List[str]:
+        """Up to count wrong options of the same type as answer, same chapter first"""
+        rng = rng or random
+        answer_type = classify_answer(answer)
+        exclude = {_normalize(answer)}
+        chosen: List[str] = []
+
+        def take(candidates: List[str], limit: int):
+            candidates = [c for c in candidates if _normalize(c) not in exclude]
+            if answer_type in (DATE, NUMBER):
+                candidates = self._closest(answer, candidates, limit * 2)
+            else:
+                candidates = self._similar_length(answer, candidates, limit * 3)
+            for candidate in rng.sample(candidates, min(limit, len(candidates))):
+                chosen.append(candidate)
+                exclude.add(_normalize(candidate))
+
+        take(self._by_chapter.get(chapter_id, {}).get(answer_type, []), count)
+        if len(chosen) < count:
+            take(self._by_type.get(answer_type, []), count - len(chosen))
+        if len(chosen) < count and answer_type in (DATE, NUMBER):
+            for candidate in self._synthesize_numbers(answer, answer_type, rng):
+                if len(chosen) >= count:
+                    break
+                if _normalize(candidate) not in exclude:
+                    chosen.append(candidate)
+                    exclude.add(_normalize(candidate))
+        if len(chosen) < count:
+            # Last resort: other answers from the same chapter regardless of type
+            same_chapter = [a for answers in self._by_chapter.get(chapter_id, {}).values() for a in answers]
+            take(same_chapter, count - len(chosen))
+        return chosen
+
+    def _closest(self, answer: str, candidates: List[str], limit: int) -> List[str]:
+        value = numeric_value(answer)
+        if value is None:
+            return candidates
+        scored = [(abs((numeric_value(c) or 0) - value), c) for c in candidates if numeric_value(c) is not None]
+        return [c for _, c in sorted(scored)[:limit]]
+
+    def _similar_length(self, answer: str, candidates: List[str], limit: int) -> List[str]:
+        words = len(answer.split())
+        return sorted(candidates, key=lambda c: abs(len(c.split()) - words))[:limit]
+
+    def _synthesize_numbers(self, answer: str, answer_type: str, rng) -> List[str]:
+        """Nearby values formatted like the answer, for chapters without enough dates/numbers"""
+        match = _number_match(answer)
+        if not match:
+            return []
+        value = float(match.group(0).replace(",", ""))
+        if answer_type == DATE:
+            offsets = rng.sample([-30, -20, -10, -5, -3, -2, -1, 1, 2, 3, 5, 10, 20, 30], 6)
+            values = [value + offset for offset in offsets]
+        elif value.is_integer() and value <= 20:
+            values = [value + offset for offset in rng.sample([-3, -2, -1, 1, 2, 3, 4], 6) if value + offset > 0]
+        else:
+            values = [value * factor for factor in rng.sample([0.25, 0.5, 0.75, 1.5, 2, 3], 6)]
+        formatted = []
+        for candidate in values:
+            number = str(int(candidate)) if candidate.is_integer() else f"{candidate:.1f}"
+            if "," in match.group(0):
+                number = f"{int(candidate):,}"
+            formatted.append(answer[:match.start()] + number + answer[match.end():])
+        return formatted
+
+    #
+    # Questions
+    #
+
+    def build_quiz(
+        self,
+        db: Session,
+        flashcards: List[db_models.Flashcard],
+        question_types: List[str],
+        rng: Optional[random.Random] = None,
+    ) -> List[Dict]:
+        """One question per flashcard in the requested types, without calling an LLM"""
+        self.ensure_index(db)
+        rng = rng or random.Random()
+        questions = []
+        for flashcard in flashcards:
+            question = self.build_question(flashcard, question_types, rng)
+            if question is not None:
+                questions.append(question)
+        self.questions_built += len(questions)
+        return questions
+
+    def build_question(self, flashcard: db_models.Flashcard, question_types: List[str], rng) -> Optional[Dict]:
+        answer = (flashcard.answer or "").strip()
+        if not answer:
+            return None
+
+        wants_mc = "multiple_choice" in question_types
+        wants_tf = "true_false" in question_types
+        # Mix in roughly one true/false question per four when both are requested
+        if wants_mc and (not wants_tf or rng.random() >= 0.25):
+            distractors = self.distractors_for(answer, flashcard.chapter_id, 3, rng)
+            if distractors:
+                options = [answer] + distractors
+                rng.shuffle(options)
+                return {
+                    "question": flashcard.question,
+                    "type": "multiple_choice",
+                    "options": options,
+                    "answer": answer,
+                    "flashcard_id": flashcard.id,
+                }
+        if wants_tf or wants_mc:
+            shown = answer
+            if rng.random() < 0.5:
+                distractors = self.distractors_for(answer, flashcard.chapter_id, 1, rng)
+                shown = distractors[0] if distractors else answer
+            return {
+                "question": f"True or false: {flashcard.question.rstrip()} Answer: {shown}",
+                "type": "true_false",
+                "options": ["True", "False"],
+                "answer": "True" if shown == answer else "False",
+                "flashcard_id": flashcard.id,
+            }
+        if "short_answer" in question_types:
+            return {
+                "question": flashcard.question,
+                "type": "short_answer",
+                "answer": answer,
+                "flashcard_id": flashcard.id,
+            }
+        return None
+
+    def stats(self) -> Dict:
+        return {
+            "chapters_indexed": len(self._by_chapter),
+            "answers_by_type": {answer_type: len(answers) for answer_type, answers in self._by_type.items()},
+            "questions_built": self.questions_built,
+            "stale": self._stale,
+        }
+
+
+# Global instance
+distractor_engine = DistractorEngine()
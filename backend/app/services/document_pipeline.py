@@ -0,0 +1,271 @@
+"""
+Map-reduce quiz generation for large uploaded documents.
+
+1. Estimate the document size up front and reject empty documents, and reject
+   or downsize oversized requests, before any provider call.
+2. Split the extracted text into token-budgeted chunks on paragraph/sentence
+   boundaries.
+3. Generate each chunk concurrently under a bounded semaphore.
+4. Merge: allocate the requested question count across chunks by weight, then
+   dedupe questions across chunks.
+"""
+import asyncio
+import logging
+import re
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List
+
+from ..utils import config
+from .ai_service import (
+    ai_generator, AllProvidersFailedError, QuizGenerationRequest, generate_quiz, question_fingerprint
+)
+from .prompt_templates import count_tokens
+
+logger = logging.getLogger(__name__)
+
+_PARAGRAPH_SPLIT = re.compile(r"\n\s*\n")
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+
+
+class DocumentTooLargeError(Exception):
+    """Raised when a document exceeds AI_MAX_DOCUMENT_TOKENS and the policy is reject"""
+
+
+class EmptyDocumentError(ValueError):
+    """Raised when the extracted text has nothing to generate questions from"""
+
+
+@dataclass
+class DocumentPlan:
+    chunks: List[str]
+    allocations: List[int]
+    question_count: int
+    estimated_tokens: int
+    downsized: bool = False
+    dropped_chunks: int = 0
+
+
+def split_text(text: str, max_tokens: int) -> List[str]:
+    """Pack paragraphs into chunks of at most max_tokens, splitting oversized paragraphs by sentence"""
+    pieces = []
+    for paragraph in _PARAGRAPH_SPLIT.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if count_tokens(paragraph) <= max_tokens:
+            pieces.append(paragraph)
+            continue
+        for sentence in _SENTENCE_SPLIT.split(paragraph):
+            # A single run-on "sentence" (tables, bad OCR) is hard-split at ~4 characters per token
+            step = max_tokens * 4
+            pieces.extend(sentence[i:i + step] for i in range(0, len(sentence), step))
+
+    chunks = []
+    current: List[str] = []
+    current_tokens = 0
+    for piece in pieces:
+        piece_tokens = count_tokens(piece)
+        if current and current_tokens + piece_tokens > max_tokens:
+            chunks.append("\n\n".join(current))
+            current, current_tokens = [], 0
+        current.append(piece)
+        current_tokens += piece_tokens
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def allocate_questions(weights: List[int], total: int, cap: int) -> List[int]:
+    """Largest-remainder allocation of total questions proportional to weights, each at most cap"""
+    allocations = [0] * len(weights)
+    remaining = min(total, cap * len(weights))
+    active = [i for i, weight in enumerate(weights) if weight > 0]
+
+    while remaining > 0 and active:
+        weight_sum = sum(weights[i] for i in active)
+        shares = {i: remaining * weights[i] / weight_sum for i in active}
+        granted = 0
+        for i in active:
+            take = min(int(shares[i]), cap - allocations[i])
+            allocations[i] += take
+            granted += take
+        # Hand out the leftovers by largest fractional remainder
+        for i in sorted(active, key=lambda i: shares[i] - int(shares[i]), reverse=True):
+            if granted >= remaining:
+                break
+            if allocations[i] < cap:
+                allocations[i] += 1
+                granted += 1
+        remaining -= granted
+        active = [i for i in active if allocations[i] < cap]
+        if granted == 0:
+            break
+
+    return allocations
+
+
+def plan_document(text: str, question_count: int) -> DocumentPlan:
+    """Estimate, split and allocate before any provider call"""
+    estimated_tokens = count_tokens(text)
+    chunks = split_text(text, config.AI_CHUNK_TOKENS)
+    if not chunks:
+        raise EmptyDocumentError("The document has no extractable text")
+    downsized = False
+    dropped = 0
+
+    if estimated_tokens > config.AI_MAX_DOCUMENT_TOKENS:
+        if config.AI_OVERSIZE_POLICY == "reject":
+            raise DocumentTooLargeError(
+                f"Document is about {estimated_tokens} tokens; the limit is {config.AI_MAX_DOCUMENT_TOKENS}"
+            )
+        # Keep an evenly spread subset of chunks so the quiz still covers the whole document
+        keep = max(1, config.AI_MAX_DOCUMENT_TOKENS // config.AI_CHUNK_TOKENS)
+        if keep < len(chunks):
+            stride = len(chunks) / keep
+            dropped = len(chunks) - keep
+            chunks = [chunks[int(i * stride)] for i in range(keep)]
+            downsized = True
+
+    capacity = config.AI_MAX_QUESTIONS_PER_CHUNK * len(chunks)
+    if question_count > capacity:
+        question_count = capacity
+        downsized = True
+
+    allocations = allocate_questions(
+        [count_tokens(chunk) for chunk in chunks], question_count, config.AI_MAX_QUESTIONS_PER_CHUNK
+    )
+    return DocumentPlan(
+        chunks=chunks,
+        allocations=allocations,
+        question_count=question_count,
+        estimated_tokens=estimated_tokens,
+        downsized=downsized,
+        dropped_chunks=dropped,
+    )
+
+
+class QuestionDeduper:
+    """Drops questions whose normalized text was already seen"""
+
+    def __init__(self):
+        self._seen = set()
+
+    def accept(self, question: Dict) -> bool:
+        fingerprint = question_fingerprint(question)
+        if not fingerprint or fingerprint in self._seen:
+            return False
+        self._seen.add(fingerprint)
+        return True
+
+
+def _plan_metadata(plan: DocumentPlan) -> Dict:
+    return {
+        "chunks": len(plan.chunks),
+        "estimated_tokens": plan.estimated_tokens,
+        "downsized": plan.downsized,
+        "dropped_chunks": plan.dropped_chunks,
+    }
+
+
+async def _generate_chunk(
+    semaphore: asyncio.Semaphore, chunk: str, count: int, question_types: List[str]
+):
+    async with semaphore:
+        return await ai_generator.generate_quiz(QuizGenerationRequest(
+            content=chunk,
+            question_count=count,
+            question_types=question_types
+        ))
+
+
+async def generate_from_plan(plan: DocumentPlan, question_types: List[str]) -> Dict:
+    """Generate a quiz for a planned document of any size; returns the same shape as ai_service.generate_quiz"""
+    if len(plan.chunks) == 1:
+        result = await generate_quiz(plan.chunks[0], plan.question_count, question_types)
+        result["metadata"].update(_plan_metadata(plan))
+        return result
+
+    start_time = time.time()
+    semaphore = asyncio.Semaphore(config.AI_CHUNK_CONCURRENCY)
+
+    jobs = [
+        (index, _generate_chunk(semaphore, plan.chunks[index], count, question_types))
+        for index, count in enumerate(plan.allocations) if count > 0
+    ]
+    results = await asyncio.gather(*(job for _, job in jobs), return_exceptions=True)
+
+    deduper = QuestionDeduper()
+    quiz, summaries, providers = [], [], set()
+    failures = 0
+    for (index, _), result in zip(jobs, results):
+        if isinstance(result, BaseException):
+            failures += 1
+            logger.warning(f"Chunk {index + 1}/{len(plan.chunks)} failed: {result}")
+            continue
+        kept = [q for q in result.quiz[:plan.allocations[index]] if deduper.accept(q)]
+        quiz.extend(kept)
+        if result.summary:
+            summaries.append(result.summary)
+        providers.add(result.provider_used)
+
+    if not quiz:
+        raise AllProvidersFailedError("All AI providers failed")
+
+    return {
+        "quiz": quiz[:plan.question_count],
+        "summary": " ".join(summaries[:3]),
+        "metadata": {
+            "provider_used": ",".join(sorted(providers)),
+            "generation_time": time.time() - start_time,
+            "failed_chunks": failures,
+            **_plan_metadata(plan)
+        }
+    }
+
+
+async def stream_from_plan(plan: DocumentPlan, question_types: List[str]) -> AsyncIterator[Dict]:
+    """Streaming counterpart of generate_from_plan: emits chunk progress and questions as each chunk finishes"""
+    if len(plan.chunks) == 1:
+        async for event in ai_generator.stream_quiz(QuizGenerationRequest(
+            content=plan.chunks[0], question_count=plan.question_count, question_types=question_types
+        )):
+            yield event
+        return
+
+    semaphore = asyncio.Semaphore(config.AI_CHUNK_CONCURRENCY)
+
+    async def run_chunk(index: int):
+        return index, await _generate_chunk(semaphore, plan.chunks[index], plan.allocations[index], question_types)
+
+    tasks = [
+        asyncio.ensure_future(run_chunk(index))
+        for index, count in enumerate(plan.allocations) if count > 0
+    ]
+    deduper = QuestionDeduper()
+    emitted, done_chunks, summaries = 0, 0, []
+    try:
+        for finished in asyncio.as_completed(tasks):
+            done_chunks += 1
+            try:
+                index, result = await finished
+            except Exception as e:
+                logger.warning(f"Chunk failed: {e}")
+                yield {"event": "chunk", "data": {"done": done_chunks, "total": len(tasks), "failed": True}}
+                continue
+            for question in result.quiz[:plan.allocations[index]]:
+                if emitted < plan.question_count and deduper.accept(question):
+                    emitted += 1
+                    yield {"event": "question", "data": question}
+            if result.summary:
+                summaries.append(result.summary)
+            yield {"event": "chunk", "data": {"done": done_chunks, "total": len(tasks)}}
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    if not emitted:
+        raise AllProvidersFailedError("All AI providers failed")
+
+    yield {"event": "summary", "data": " ".join(summaries[:3])}
+    yield {"event": "done", "data": _plan_metadata(plan)}
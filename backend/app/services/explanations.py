@@ -0,0 +1,102 @@
+"""
+On-demand explanations for quiz questions.
+
+With AI_LAZY_EXPLANATIONS quizzes are generated without a summary or per-question
+explanations, which are most of the completion and rarely read. POST
+/api/explanations asks the provider for one question's explanation the first
+time anybody wants it and caches the result:
+
+- per flashcard, when the question came from one: keyed by the card's own
+  question and answer, so every question variant of the card shares the entry
+  and editing the card starts a new one
+- otherwise per question, correct answer and options, since the explanation
+  may discuss the wrong options
+
+Concurrent requests for the same key share a single provider call.
+"""
+import logging
+import re
+from typing import Dict, List, Optional
+
+from ..utils import config
+from .ai_service import ai_generator
+from .prompt_templates import EXPLANATION_TEMPLATE
+from .quiz_cache import LRUCache, TieredCache, make_cache_key
+from .single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _normalize(text: str) -> str:
+    return _WHITESPACE.sub(" ", (text or "").strip().lower())
+
+
+class ExplanationService:
+    """Generates explanations lazily and caches them per flashcard or question"""
+
+    def __init__(self):
+        self.cache = TieredCache(
+            LRUCache(
+                max_entries=config.EXPLANATION_CACHE_MAX_ENTRIES,
+                max_bytes=config.EXPLANATION_CACHE_MAX_BYTES,
+                ttl_seconds=config.EXPLANATION_CACHE_TTL_SECONDS,
+            ),
+            persistent=config.QUIZ_CACHE_PERSISTENT,
+        )
+        self.flights = SingleFlight()
+        self.generated = 0
+        self.cache_hits = 0
+
+    def cache_key(
+        self, question: str, answer: str, flashcard_id: Optional[int] = None, options: Optional[List[str]] = None
+    ) -> str:
+        fields = {"question": _normalize(question), "answer": _normalize(answer)}
+        if flashcard_id is not None:
+            fields["flashcard_id"] = flashcard_id
+        if options:
+            # Order-insensitive: quizzes shuffle options per serving
+            fields["options"] = sorted(_normalize(option) for option in options)
+        return make_cache_key("explanation", prompt_version=EXPLANATION_TEMPLATE.version, **fields)
+
+    async def lookup(
+        self, question: str, answer: str, options: Optional[List[str]] = None, flashcard_id: Optional[int] = None
+    ) -> Optional[Dict]:
+        """The cached explanation in the same shape as explain(), or None; never calls a provider"""
+        cached = await self.cache.get(self.cache_key(question, answer, flashcard_id, options))
+        if cached is None:
+            return None
+        self.cache_hits += 1
+        return {**cached, "cached": True}
+
+    async def explain(
+        self, question: str, answer: str, options: Optional[List[str]] = None, flashcard_id: Optional[int] = None
+    ) -> Dict:
+        """{"explanation", "provider_used", "cached"}; raises AllProvidersFailedError when nobody answers"""
+        cached = await self.lookup(question, answer, options, flashcard_id)
+        if cached is not None:
+            return cached
+
+        key = self.cache_key(question, answer, flashcard_id, options)
+        entry, shared = await self.flights.do(key, lambda: self._generate_and_cache(key, question, answer, options))
+        return {**entry, "cached": shared}
+
+    async def _generate_and_cache(self, key: str, question: str, answer: str, options: Optional[List[str]]) -> Dict:
+        explanation, provider = await ai_generator.explain(question, answer, options)
+        self.generated += 1
+        entry = {"explanation": explanation, "provider_used": provider}
+        await self.cache.set(key, entry)
+        return entry
+
+    def stats(self) -> Dict:
+        return {
+            "generated": self.generated,
+            "cache_hits": self.cache_hits,
+            "coalesced": self.flights.coalesced,
+            "cache": self.cache.stats(),
+        }
+
+
+# Global instance
+explanation_service = ExplanationService()
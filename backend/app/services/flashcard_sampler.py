@@ -0,0 +1,176 @@
+"""
+Random flashcard selection for quiz assembly without loading the whole bank.
+
+A quiz needs a handful of cards, but picking them used to load every Flashcard
+row of a chapter (or of all chapters) just to random.sample a few. The sampler
+keeps the IDs of chapter-assigned flashcards per chapter in memory, draws IDs
+from that index and fetches only the chosen rows with one IN query, so the
+cost of assembling a quiz does not grow with the size of the bank.
+
+Cards with a weight other than 1 are drawn with weighted sampling without
+replacement (Efraimidis-Spirakis keys), like stratified_sampling does in SQL;
+the index keeps weights only for chapters that have such cards, so uniform
+chapters are still sampled with random.sample.
+
+The index is built with one ID-only query on first use and rebuilt lazily after
+any flashcard write calls invalidate(), or after FLASHCARD_INDEX_TTL_SECONDS so
+writes made by other worker processes are picked up. A draw that hits rows
+deleted since the last build rebuilds the index and draws again.
+"""
+import heapq
+import logging
+import random
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from ..db import models as db_models
+from ..utils import config
+
+logger = logging.getLogger(__name__)
+
+
+class FlashcardSampler:
+    """Samples chapter-assigned flashcards from an in-memory per-chapter ID index"""
+
+    def __init__(self):
+        self._by_chapter: Dict[int, Tuple[int, ...]] = {}
+        self._all: Tuple[int, ...] = ()
+        # Weights aligned with the ID tuples, only where some weight differs from 1
+        self._chapter_weights: Dict[int, Tuple[float, ...]] = {}
+        self._all_weights: Optional[Tuple[float, ...]] = None
+        self._stale = True
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+        self.rebuilds = 0
+
+    #
+    # Index
+    #
+
+    def invalidate(self):
+        """Mark the ID index stale; it is rebuilt on next use"""
+        self._stale = True
+
+    def ensure_index(self, db: Session):
+        if not self._stale and time.monotonic() - self._built_at < config.FLASHCARD_INDEX_TTL_SECONDS:
+            return
+        with self._lock:
+            if self._stale or time.monotonic() - self._built_at >= config.FLASHCARD_INDEX_TTL_SECONDS:
+                # Clear the flag first so a write racing with the rebuild marks it stale again
+                self._stale = False
+                self._built_at = time.monotonic()
+                self._build(
+                    db.query(db_models.Flashcard.id, db_models.Flashcard.chapter_id, db_models.Flashcard.weight)
+                    .filter(db_models.Flashcard.chapter_id.isnot(None))
+                    # A stable order, so a seeded rng draws the same cards on every backend and rebuild
+                    .order_by(db_models.Flashcard.id)
+                    .all()
+                )
+
+    def _build(self, rows: Sequence[Tuple[int, int, float]]):
+        by_chapter: Dict[int, List[int]] = defaultdict(list)
+        weights: Dict[int, List[float]] = defaultdict(list)
+        for flashcard_id, chapter_id, weight in rows:
+            by_chapter[chapter_id].append(flashcard_id)
+            weights[chapter_id].append(weight)
+        self._by_chapter = {chapter_id: tuple(ids) for chapter_id, ids in by_chapter.items()}
+        self._chapter_weights = {
+            chapter_id: tuple(chapter_weights)
+            for chapter_id, chapter_weights in weights.items() if any(w != 1 for w in chapter_weights)
+        }
+        self._all = tuple(flashcard_id for flashcard_id, _, _ in rows)
+        self._all_weights = tuple(weight for _, _, weight in rows) if self._chapter_weights else None
+        self.rebuilds += 1
+        logger.info(f"Flashcard index built with {len(rows)} cards across {len(self._by_chapter)} chapters")
+
+    def stats(self) -> Dict:
+        return {
+            "cards": len(self._all),
+            "chapters": len(self._by_chapter),
+            "rebuilds": self.rebuilds,
+            "stale": self._stale,
+        }
+
+    #
+    # Sampling
+    #
+
+    def sample(
+        self, db: Session, count: int, chapter_id: Optional[int] = None, rng: Optional[random.Random] = None
+    ) -> List[db_models.Flashcard]:
+        """Up to count random cards from chapter_id, or from every chapter when it is None"""
+        rng = rng or random
+
+        def draw() -> List[int]:
+            if chapter_id is not None:
+                return _pick(self._by_chapter.get(chapter_id, ()), self._chapter_weights.get(chapter_id), count, rng)
+            return _pick(self._all, self._all_weights, count, rng)
+
+        return self._draw_and_fetch(db, draw)
+
+    def sample_balanced(
+        self, db: Session, count: int, per_chapter: int, rng: Optional[random.Random] = None
+    ) -> List[db_models.Flashcard]:
+        """
+        per_chapter random cards from every chapter, topped up to count with
+        random cards from any chapter and trimmed to count if there are more
+        chapters than count allows.
+        """
+        rng = rng or random
+
+        def draw() -> List[int]:
+            selected: List[int] = []
+            for chapter_id, ids in self._by_chapter.items():
+                selected.extend(_pick(ids, self._chapter_weights.get(chapter_id), per_chapter, rng))
+
+            needed = count - len(selected)
+            if needed > 0:
+                # Over-draw by the cards already taken, so what is left after dropping them is still uniform
+                chosen = set(selected)
+                candidates = _pick(self._all, self._all_weights, needed + len(selected), rng)
+                selected.extend([flashcard_id for flashcard_id in candidates if flashcard_id not in chosen][:needed])
+            elif needed < 0:
+                selected = rng.sample(selected, count)
+            return selected
+
+        return self._draw_and_fetch(db, draw)
+
+    def _draw_and_fetch(self, db: Session, draw: Callable[[], List[int]]) -> List[db_models.Flashcard]:
+        """Fetch a draw from the index; if some rows are gone, rebuild and draw once more"""
+        self.ensure_index(db)
+        ids = draw()
+        flashcards = self.fetch(db, ids)
+        if len(flashcards) < len(ids):
+            self.ensure_index(db)
+            ids = draw()
+            flashcards = self.fetch(db, ids)
+        return flashcards
+
+    def fetch(self, db: Session, ids: List[int]) -> List[db_models.Flashcard]:
+        """The rows for ids in one IN query, in the order given"""
+        if not ids:
+            return []
+        rows = {
+            flashcard.id: flashcard
+            for flashcard in db.query(db_models.Flashcard).filter(db_models.Flashcard.id.in_(ids)).all()
+        }
+        if len(rows) < len(ids):
+            logger.info(f"{len(ids) - len(rows)} sampled flashcard(s) no longer exist; refreshing the index")
+            self.invalidate()
+        return [rows[flashcard_id] for flashcard_id in ids if flashcard_id in rows]
+
+
+def _pick(ids: Sequence[int], weights: Optional[Sequence[float]], count: int, rng) -> List[int]:
+    """count of ids without replacement, uniformly or in proportion to weights"""
+    if weights is None:
+        return rng.sample(ids, min(len(ids), count))
+    keyed = ((rng.random() ** (1.0 / weight), flashcard_id) for flashcard_id, weight in zip(ids, weights) if weight > 0)
+    return [flashcard_id for _, flashcard_id in heapq.nlargest(count, keyed)]
+
+
+# Global instance
+flashcard_sampler = FlashcardSampler()
@@ -0,0 +1,166 @@
+"""
+Full-text search over flashcard questions and answers.
+
+- Postgres: flashcards.search_vector is a generated tsvector column (question
+  weighted A, answer B), so the database maintains it on every write. It is
+  indexed with GIN (migration a7c8d9e0f1b2). Queries use websearch_to_tsquery
+  and are ranked by ts_rank_cd.
+- SQLite (local and dev runs): the flashcards_fts FTS5 table uses flashcards
+  as its external content. Insert, update and delete triggers keep it in
+  sync. It is created and filled by ensure_index() at startup, and results
+  are ranked by bm25 with the question weighted twice the answer.
+- Anything else, or a Postgres database that has not been migrated yet, falls
+  back to an unindexed case-insensitive LIKE over both fields.
+
+Every backend supports a chapter filter and limit/offset paging, with ties
+broken by id.
+"""
+import logging
+import re
+from typing import List, Optional, Tuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from ..db import models as db_models
+
+logger = logging.getLogger(__name__)
+
+POSTGRES = "postgres"
+FTS5 = "fts5"
+LIKE = "like"
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+_FTS5_SCHEMA = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS flashcards_fts USING fts5(
+        question, answer, content='flashcards', content_rowid='id', tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS flashcards_fts_insert AFTER INSERT ON flashcards BEGIN
+        INSERT INTO flashcards_fts(rowid, question, answer) VALUES (new.id, new.question, new.answer);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS flashcards_fts_delete AFTER DELETE ON flashcards BEGIN
+        INSERT INTO flashcards_fts(flashcards_fts, rowid, question, answer)
+        VALUES ('delete', old.id, old.question, old.answer);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS flashcards_fts_update AFTER UPDATE OF question, answer ON flashcards BEGIN
+        INSERT INTO flashcards_fts(flashcards_fts, rowid, question, answer)
+        VALUES ('delete', old.id, old.question, old.answer);
+        INSERT INTO flashcards_fts(rowid, question, answer) VALUES (new.id, new.question, new.answer);
+    END
+    """,
+]
+
+
+def fts5_query(query: str) -> str:
+    """
+    User input as an FTS5 expression: every word must match, the last one as a
+    prefix so results show up while typing. Words are quoted, so FTS5
+    operators in the input are treated as plain words.
+    """
+    terms = [f'"{word}"' for word in _WORD.findall(query)]
+    if terms:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+class FlashcardSearch:
+    """Picks the search backend for the database and runs ranked queries on it"""
+
+    def __init__(self):
+        self.backend = LIKE
+
+    def ensure_index(self, engine: Engine):
+        """Detect the backend; on SQLite, create and fill the FTS5 table if it is missing"""
+        dialect = engine.dialect.name
+        if dialect == "postgresql":
+            columns = {column["name"] for column in inspect(engine).get_columns("flashcards")}
+            if "search_vector" in columns:
+                self.backend = POSTGRES
+            else:
+                self.backend = LIKE
+                logger.warning("flashcards.search_vector is missing; run migrations to index search")
+        elif dialect == "sqlite":
+            try:
+                with engine.begin() as connection:
+                    exists = connection.execute(
+                        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'flashcards_fts'")
+                    ).first()
+                    for statement in _FTS5_SCHEMA:
+                        connection.execute(text(statement))
+                    if not exists:
+                        connection.execute(text("INSERT INTO flashcards_fts(flashcards_fts) VALUES ('rebuild')"))
+                        logger.info("Built the flashcards_fts search index")
+                self.backend = FTS5
+            except Exception as e:
+                # SQLite builds without FTS5
+                self.backend = LIKE
+                logger.warning(f"FTS5 search index unavailable, searching without an index: {e}")
+        else:
+            self.backend = LIKE
+        logger.info(f"Flashcard search backend: {self.backend}")
+
+    def search(
+        self, db: Session, query: str, chapter_id: Optional[int] = None, limit: int = 20, offset: int = 0
+    ) -> List[Tuple[db_models.Flashcard, float]]:
+        """(flashcard, relevance) pairs, most relevant first; relevance is higher-is-better"""
+        if not query.strip():
+            return []
+        if self.backend == POSTGRES:
+            sql = """
+                SELECT id, ts_rank_cd(search_vector, query) AS relevance
+                FROM flashcards, websearch_to_tsquery('english', :query) AS query
+                WHERE search_vector @@ query {chapter_filter}
+                ORDER BY relevance DESC, id
+                LIMIT :limit OFFSET :offset
+            """
+            params = {"query": query}
+        elif self.backend == FTS5:
+            expression = fts5_query(query)
+            if not expression:
+                return []
+            # bm25() is lower-is-better; negate it so every backend sorts the same way
+            sql = """
+                SELECT flashcards.id, -bm25(flashcards_fts, 2.0, 1.0) AS relevance
+                FROM flashcards_fts JOIN flashcards ON flashcards.id = flashcards_fts.rowid
+                WHERE flashcards_fts MATCH :query {chapter_filter}
+                ORDER BY relevance DESC, flashcards.id
+                LIMIT :limit OFFSET :offset
+            """
+            params = {"query": expression}
+        else:
+            sql = """
+                SELECT id, CASE WHEN lower(question) LIKE :pattern ESCAPE '\\' THEN 2.0 ELSE 1.0 END AS relevance
+                FROM flashcards
+                WHERE (lower(question) LIKE :pattern ESCAPE '\\' OR lower(answer) LIKE :pattern ESCAPE '\\')
+                    {chapter_filter}
+                ORDER BY relevance DESC, id
+                LIMIT :limit OFFSET :offset
+            """
+            escaped = query.strip().lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            params = {"pattern": f"%{escaped}%"}
+
+        chapter_filter = "AND flashcards.chapter_id = :chapter_id" if chapter_id is not None else ""
+        params.update({"chapter_id": chapter_id, "limit": limit, "offset": offset})
+        ranked = db.execute(text(sql.format(chapter_filter=chapter_filter)), params).all()
+        if not ranked:
+            return []
+        flashcards = {
+            flashcard.id: flashcard
+            for flashcard in db.query(db_models.Flashcard).filter(
+                db_models.Flashcard.id.in_([row[0] for row in ranked])
+            ).all()
+        }
+        return [(flashcards[id], float(relevance)) for id, relevance in ranked if id in flashcards]
+
+
+# Global instance
+flashcard_search = FlashcardSearch()
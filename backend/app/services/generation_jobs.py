@@ -0,0 +1,375 @@
+"""
+Asynchronous document-to-quiz generation jobs.
+
+POST /api/jobs/extract-text answers immediately with a job id; an in-process
+pool of GENERATION_JOB_WORKERS workers then runs extraction and generation,
+so no HTTP request is held open through a minute of LLM calls (and proxy
+timeouts). Each job records its progress as a list of stage events:
+
+    uploaded -> extracted -> chunk (n/m generated, repeated) -> done | failed
+
+Clients poll GET /api/jobs/{id}, or subscribe to /api/jobs/{id}/events, which
+replays earlier events and then streams new ones as SSE.
+
+Results live in the documents / quizzes / quiz_questions tables with an
+expires_at GENERATION_JOB_TTL_SECONDS ahead; a sweeper deletes them (and the
+in-memory job) once expired. Job state is per process: a job id is only known
+to the worker that accepted it.
+"""
+import asyncio
+import logging
+import os
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional
+
+from ..db import database
+from ..db import models as db_models
+from ..utils import config, file_utils
+from . import document_pipeline
+from .admission import AdmissionRejected, Principal, generation_scheduler
+from .ai_service import AllProvidersFailedError
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+JOB_QUESTION_COUNT = 10
+JOB_QUESTION_TYPES = ["multiple_choice", "true_false"]
+
+
+class JobQueueFullError(Exception):
+    """Raised when GENERATION_JOB_QUEUE_SIZE jobs are already waiting"""
+
+
+class GenerationJob:
+    def __init__(self, filename: str, data: bytes, principal: Optional[Principal], user_id: Optional[int]):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.principal = principal
+        self.user_id = user_id
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.expires_at = self.created_at + config.GENERATION_JOB_TTL_SECONDS
+        self.events: List[Dict] = []
+        self.document_id: Optional[int] = None
+        self.quiz_id: Optional[int] = None
+        self.error: Optional[str] = None
+        self._data: Optional[bytes] = data
+        self._subscribers: List[asyncio.Queue] = []
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+    def emit(self, event: str, **data):
+        entry = {"event": event, "data": {"job_id": self.id, **data}}
+        self.events.append(entry)
+        for queue in self._subscribers:
+            queue.put_nowait(entry)
+
+    def snapshot(self) -> Dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "stage": self.events[-1]["event"] if self.events else None,
+            "filename": self.filename,
+            "created_at": datetime.utcfromtimestamp(self.created_at).isoformat(),
+            "expires_at": datetime.utcfromtimestamp(self.expires_at).isoformat(),
+            "events": [{"event": entry["event"], **entry["data"]} for entry in self.events],
+            "document_id": self.document_id,
+            "quiz_id": self.quiz_id,
+            "error": self.error,
+        }
+
+
+class GenerationJobs:
+    """Job registry plus the in-process worker pool that runs them"""
+
+    def __init__(self):
+        self._jobs: Dict[str, GenerationJob] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._sweeper: Optional[asyncio.Task] = None
+        self.completed = 0
+        self.failed = 0
+
+    #
+    # Submission and lookup
+    #
+
+    def submit(self, filename: str, data: bytes, principal: Optional[Principal], user_id: Optional[int]) -> GenerationJob:
+        self._ensure_workers()
+        if self._queue.qsize() >= config.GENERATION_JOB_QUEUE_SIZE:
+            raise JobQueueFullError(f"{self._queue.qsize()} generation jobs are already waiting")
+        job = GenerationJob(filename, data, principal, user_id)
+        self._jobs[job.id] = job
+        job.emit("uploaded", filename=filename, bytes=len(data))
+        self._queue.put_nowait(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[GenerationJob]:
+        job = self._jobs.get(job_id)
+        if job is not None and job.expires_at < time.time():
+            return None
+        return job
+
+    async def subscribe(self, job: GenerationJob) -> AsyncIterator[Dict]:
+        """Every event of the job so far, then new ones until it finishes"""
+        queue: asyncio.Queue = asyncio.Queue()
+        for entry in job.events:
+            queue.put_nowait(entry)
+        finished = job.finished
+        job._subscribers.append(queue)
+        try:
+            while True:
+                if finished and queue.empty():
+                    return
+                entry = await queue.get()
+                yield entry
+                if entry["event"] in (DONE, FAILED):
+                    return
+        finally:
+            job._subscribers.remove(queue)
+
+    def load_result(self, job: GenerationJob) -> Optional[Dict]:
+        """The finished job in the /extract-text response shape, read back from the database"""
+        if job.quiz_id is None:
+            return None
+        db = database.SessionLocal()
+        try:
+            document = db.get(db_models.Document, job.document_id)
+            quiz = db.get(db_models.Quiz, job.quiz_id)
+            if document is None or quiz is None:
+                return None
+            rows = db.query(db_models.QuizQuestion).filter(
+                db_models.QuizQuestion.quiz_id == quiz.id
+            ).order_by(db_models.QuizQuestion.id).all()
+            questions = []
+            for row in rows:
+                question = {
+                    "question": row.question_text,
+                    "type": row.question_type,
+                    "options": list(row.options or []),
+                    "answer": row.correct_answer,
+                }
+                if row.explanation:
+                    question["explanation"] = row.explanation
+                questions.append(question)
+            done = job.events[-1]["data"]
+            return {
+                "filename": document.name,
+                "extracted_text": document.content,
+                "quiz": {"quiz": questions, "summary": quiz.description or "", "metadata": done.get("metadata", {})},
+            }
+        finally:
+            db.close()
+
+    #
+    # Workers
+    #
+
+    def _ensure_workers(self):
+        """Start the worker pool and sweeper in the running loop on first use"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # The queue and tasks belong to one loop; scripts calling asyncio.run() repeatedly get fresh ones
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._workers = []
+            self._sweeper = None
+        self._workers = [task for task in self._workers if not task.done()]
+        while len(self._workers) < config.GENERATION_JOB_WORKERS:
+            self._workers.append(loop.create_task(self._worker()))
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = loop.create_task(self._sweep_forever())
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await asyncio.wait_for(self._run(job), timeout=config.GENERATION_JOB_TIMEOUT_SECONDS)
+            except asyncio.CancelledError:
+                if not job.finished:
+                    self._fail(job, "Job was cancelled")
+                raise
+            except asyncio.TimeoutError:
+                self._fail(job, f"Job did not finish within {config.GENERATION_JOB_TIMEOUT_SECONDS:.0f}s")
+            except Exception as e:
+                logger.exception(f"Generation job {job.id} failed")
+                self._fail(job, str(e))
+
+    async def _run(self, job: GenerationJob):
+        job.status = RUNNING
+        data, job._data = job._data, None
+        text, job.document_id = await asyncio.to_thread(self._extract_and_store, job, data)
+        job.emit("extracted", document_id=job.document_id, characters=len(text))
+
+        try:
+            plan = document_pipeline.plan_document(text, JOB_QUESTION_COUNT)
+        except (document_pipeline.DocumentTooLargeError, document_pipeline.EmptyDocumentError) as e:
+            self._fail(job, str(e))
+            return
+
+        slot = await self._admit(job)
+        questions: List[Dict] = []
+        summary, metadata = "", {}
+        chunk_events = 0
+        try:
+            async for event in document_pipeline.stream_from_plan(plan, JOB_QUESTION_TYPES):
+                if event["event"] == "question":
+                    questions.append(event["data"])
+                elif event["event"] == "chunk":
+                    chunk_events += 1
+                    job.emit("chunk", done=event["data"]["done"], total=event["data"]["total"],
+                             failed=event["data"].get("failed", False), questions=len(questions))
+                elif event["event"] == "summary":
+                    summary = event["data"]
+                elif event["event"] == "done":
+                    metadata = event["data"]
+            if not chunk_events:
+                # Single-chunk documents come from one provider call without chunk events
+                job.emit("chunk", done=1, total=1, failed=False, questions=len(questions))
+        except AllProvidersFailedError as e:
+            self._fail(job, str(e))
+            return
+        finally:
+            slot.release()
+
+        job.quiz_id = await asyncio.to_thread(self._store_quiz, job, questions, summary)
+        job.status = DONE
+        self.completed += 1
+        job.emit(DONE, quiz_id=job.quiz_id, document_id=job.document_id, questions=len(questions), metadata=metadata)
+
+    async def _admit(self, job: GenerationJob):
+        """Background jobs wait out admission shedding instead of failing"""
+        while True:
+            try:
+                return await generation_scheduler.acquire(job.principal)
+            except AdmissionRejected as e:
+                job.emit("waiting", reason=str(e), retry_after=e.retry_after)
+                await asyncio.sleep(e.retry_after)
+
+    def _fail(self, job: GenerationJob, error: str):
+        job.status = FAILED
+        job.error = error
+        self.failed += 1
+        job.emit(FAILED, error=error)
+
+    def _expires_at(self, job: GenerationJob) -> datetime:
+        return datetime.utcfromtimestamp(job.expires_at)
+
+    def _extract_and_store(self, job: GenerationJob, data: bytes):
+        """Extract text and save the Document (runs in a worker thread)"""
+        file_ext = job.filename.split(".")[-1].lower()
+        file_path = os.path.join(tempfile.gettempdir(), f"job_{job.id}.{file_ext}")
+        file_utils.save_file(data, file_path)
+        try:
+            text = file_utils.extract_text(file_path, file_ext)
+        finally:
+            file_utils.remove_temp_file(file_path)
+
+        db = database.SessionLocal()
+        try:
+            document = db_models.Document(name=job.filename, content=text, expires_at=self._expires_at(job))
+            db.add(document)
+            db.commit()
+            return text, document.id
+        finally:
+            db.close()
+
+    def _store_quiz(self, job: GenerationJob, questions: List[Dict], summary: str) -> int:
+        """Save the generated quiz (runs in a worker thread)"""
+        db = database.SessionLocal()
+        try:
+            quiz = db_models.Quiz(
+                title=f"Generated from {job.filename}"[:255],
+                description=summary,
+                user_id=job.user_id,
+                expires_at=self._expires_at(job),
+            )
+            db.add(quiz)
+            db.flush()
+            for question in questions:
+                db.add(db_models.QuizQuestion(
+                    quiz_id=quiz.id,
+                    question_text=question["question"],
+                    question_type=question["type"],
+                    options=question.get("options"),
+                    correct_answer=question["answer"],
+                    explanation=question.get("explanation"),
+                ))
+            db.commit()
+            return quiz.id
+        finally:
+            db.close()
+
+    #
+    # Expiry
+    #
+
+    async def _sweep_forever(self):
+        while True:
+            await asyncio.sleep(config.GENERATION_JOB_SWEEP_SECONDS)
+            try:
+                await asyncio.to_thread(self.sweep_expired)
+            except Exception as e:
+                logger.warning(f"Generation job sweep failed: {e}")
+
+    def sweep_expired(self) -> int:
+        """Drop expired jobs and delete expired generated documents and quizzes; returns rows deleted"""
+        now = time.time()
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.expires_at < now and job.finished]:
+            del self._jobs[job_id]
+
+        cutoff = datetime.utcnow()
+        db = database.SessionLocal()
+        try:
+            quiz_ids = [quiz_id for (quiz_id,) in db.query(db_models.Quiz.id).filter(
+                db_models.Quiz.expires_at < cutoff
+            ).all()]
+            deleted = 0
+            if quiz_ids:
+                db.query(db_models.QuizQuestion).filter(
+                    db_models.QuizQuestion.quiz_id.in_(quiz_ids)
+                ).delete(synchronize_session=False)
+                deleted += db.query(db_models.Quiz).filter(
+                    db_models.Quiz.id.in_(quiz_ids)
+                ).delete(synchronize_session=False)
+            deleted += db.query(db_models.Document).filter(
+                db_models.Document.expires_at < cutoff
+            ).delete(synchronize_session=False)
+            db.commit()
+            if deleted:
+                logger.info(f"Deleted {deleted} expired generated documents/quizzes")
+            return deleted
+        finally:
+            db.close()
+
+    async def stop(self):
+        for task in self._workers + ([self._sweeper] if self._sweeper else []):
+            task.cancel()
+        self._workers = []
+        self._sweeper = None
+
+    def stats(self) -> Dict:
+        statuses: Dict[str, int] = {}
+        for job in self._jobs.values():
+            statuses[job.status] = statuses.get(job.status, 0) + 1
+        return {
+            "workers": len([task for task in self._workers if not task.done()]),
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "jobs": statuses,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+
+# Global instance
+generation_jobs = GenerationJobs()
@@ -0,0 +1,187 @@
+"""
+Per-call instrumentation for quiz generation.
+
+Every provider attempt made by AIQuizGenerator is recorded as a CallRecord
+(provider, attempt number, queueing time, latency, prompt/completion tokens,
+finish reason and parse outcome). Records are folded into fixed-bucket
+histograms per provider plus outcome counters, so max_completion_tokens and the
+retry policy can be tuned from /api/admin/metrics instead of guesswork.
+"""
+import bisect
+import logging
+import threading
+from collections import Counter, deque
+from dataclasses import asdict, dataclass
+from typing import Dict, Optional, Sequence, Tuple
+
+from ..utils import config
+
+logger = logging.getLogger(__name__)
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 3072, 4096, 6144, 8192, 16384, 32768)
+COUNT_BUCKETS = (1, 2, 3, 5, 10, 15, 20, 30, 50, 100)
+
+# Parse outcomes of one attempt
+OK = "ok"                        # at least the requested number of usable questions
+PARTIAL = "partial"              # some usable questions, fewer than requested
+NO_QUESTIONS = "no_questions"    # the completion parsed to nothing usable
+PROVIDER_ERROR = "provider_error"  # HTTP / transport failure, nothing to parse
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus style) with interpolated percentiles"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.min = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.count == 1 else min(self.min, value)
+        self.max = max(self.max, value)
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """Estimate by linear interpolation inside the bucket holding the rank, clamped to the observed range"""
+        if not self.count:
+            return None
+        rank = percent / 100 * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                estimate = lower + (upper - lower) * (rank - seen) / bucket_count
+                return round(min(self.max, max(self.min, estimate)), 4)
+            seen += bucket_count
+        return self.max
+
+    def snapshot(self) -> Dict:
+        cumulative, buckets = 0, {}
+        for bound, bucket_count in zip(self.buckets, self.counts):
+            cumulative += bucket_count
+            buckets[str(bound)] = cumulative
+        buckets["+Inf"] = self.count
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 4),
+            "mean": round(self.sum / self.count, 4) if self.count else None,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "min": round(self.min, 4),
+            "max": round(self.max, 4),
+            "buckets": buckets,
+        }
+
+
+@dataclass
+class CallRecord:
+    """One provider attempt"""
+    provider: str
+    attempt: int
+    outcome: str
+    latency: float
+    queue_time: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    # "usage" when the provider reported token counts, "estimate" when counted locally
+    token_source: str = "usage"
+    finish_reason: Optional[str] = None
+    questions: int = 0
+    rejected: int = 0
+    streamed: bool = False
+    error: Optional[str] = None
+
+
+_HISTOGRAM_BUCKETS = {
+    "latency_seconds": SECONDS_BUCKETS,
+    "queue_seconds": SECONDS_BUCKETS,
+    "backoff_seconds": SECONDS_BUCKETS,
+    "generation_seconds": SECONDS_BUCKETS,
+    "prompt_tokens": TOKEN_BUCKETS,
+    "completion_tokens": TOKEN_BUCKETS,
+    "questions_per_call": COUNT_BUCKETS,
+    "attempts_per_generation": COUNT_BUCKETS,
+    # Labelled by payment tier rather than provider
+    "admission_wait_seconds": SECONDS_BUCKETS,
+}
+
+
+def _token_prices(provider: str) -> Tuple[float, float]:
+    """USD per million (prompt, completion) tokens"""
+    return config.AI_TOKEN_PRICES.get(provider, (0.0, 0.0))
+
+
+class GenerationMetrics:
+    """Process-wide histograms and counters for provider calls"""
+
+    def __init__(self, recent_calls: int = 50):
+        self._histograms: Dict[Tuple[str, str], Histogram] = {}
+        self._counters: Dict[str, Counter] = {}
+        self._cost: Counter = Counter()
+        self._recent = deque(maxlen=recent_calls)
+        # Records arrive from the event loop and from worker threads (pool builder, scripts)
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, value: float, label: str):
+        """Add value to the histogram for (name, label); the label is usually the provider"""
+        with self._lock:
+            key = (name, label)
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(_HISTOGRAM_BUCKETS[name])
+            histogram.observe(value)
+
+    def increment(self, name: str, label: str, amount: int = 1):
+        with self._lock:
+            self._counters.setdefault(name, Counter())[label] += amount
+
+    def record_call(self, record: CallRecord):
+        provider = record.provider
+        # queue_seconds is observed by the provider client itself, which also sees streamed calls
+        self.observe("latency_seconds", record.latency, provider)
+        if record.outcome != PROVIDER_ERROR:
+            self.observe("prompt_tokens", record.prompt_tokens, provider)
+            self.observe("completion_tokens", record.completion_tokens, provider)
+            self.observe("questions_per_call", record.questions, provider)
+            prompt_price, completion_price = _token_prices(provider)
+            cost = (record.prompt_tokens * prompt_price + record.completion_tokens * completion_price) / 1_000_000
+            with self._lock:
+                self._cost[provider] += cost
+        self.increment("outcome", f"{provider}:{record.outcome}")
+        self.increment("attempt", f"{provider}:{record.attempt}")
+        if record.finish_reason:
+            self.increment("finish_reason", f"{provider}:{record.finish_reason}")
+        with self._lock:
+            self._recent.append(record)
+        logger.debug(f"Provider call {asdict(record)}")
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            histograms: Dict[str, Dict[str, Dict]] = {}
+            for (name, label), histogram in sorted(self._histograms.items()):
+                histograms.setdefault(name, {})[label] = histogram.snapshot()
+            return {
+                "histograms": histograms,
+                "counters": {name: dict(counter) for name, counter in self._counters.items()},
+                "estimated_cost_usd": {provider: round(cost, 6) for provider, cost in self._cost.items()},
+                "recent_calls": [asdict(record) for record in self._recent],
+            }
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._cost.clear()
+            self._recent.clear()
+
+
+# Global instance
+generation_metrics = GenerationMetrics()
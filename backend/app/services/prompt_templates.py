@@ -0,0 +1,199 @@
+"""
+Versioned prompt templates.
+
+Each template is split into a static prefix (instructions and examples, sent as
+the system message) and a short dynamic suffix holding the request settings and
+the content, sent last as the user message. The prefix is byte-identical across
+requests so provider-side prefix caching can reuse it, and templates are
+compiled once at import time instead of rebuilding an f-string per call.
+
+Changing a template's text requires a new version string: the version is part of
+generation cache keys, so old cached quizzes are not served for the new prompt.
+"""
+import re
+from string import Formatter
+from typing import Dict, List, Tuple
+
+# Words, up to 3 digits, or a single symbol: close to how BPE tokenizers split English text
+_TOKEN_PATTERN = re.compile(r"[^\W\d_]+|\d{1,3}|\S")
+
+
+def count_tokens(text: str) -> int:
+    """Local token estimate (no tokenizer download); long words count as several tokens"""
+    return sum(1 + len(piece) // 8 for piece in _TOKEN_PATTERN.findall(text))
+
+
+class PromptTemplate:
+    """A static system prefix plus a pre-parsed suffix format"""
+
+    def __init__(self, name: str, version: str, prefix: str, suffix: str):
+        self.name = name
+        self.version = version
+        self.prefix = prefix.strip()
+        self.prefix_tokens = count_tokens(self.prefix)
+        self._suffix_parts: List[Tuple[str, str]] = [
+            (literal, field_name or "") for literal, field_name, _, _ in Formatter().parse(suffix.strip())
+        ]
+
+    def render(self, **fields) -> List[Dict]:
+        """Chat messages for this template: the static prefix first, the dynamic suffix last"""
+        suffix = "".join(
+            literal + (str(fields[field_name]) if field_name else "")
+            for literal, field_name in self._suffix_parts
+        )
+        return [
+            {"role": "system", "content": self.prefix},
+            {"role": "user", "content": suffix},
+        ]
+
+
+def messages_tokens(messages: List[Dict]) -> int:
+    return sum(count_tokens(message["content"]) for message in messages)
+
+
+DIFFICULTY_INSTRUCTIONS = {
+    "easy": "Use simple vocabulary and straightforward concepts.",
+    "medium": "Use moderate complexity with some technical terms.",
+    "hard": "Use advanced concepts and detailed analysis.",
+}
+
+_QUIZ_INSTRUCTIONS = """
+You are an expert Canadian Citizenship Test Quiz Generator.
+
+TASK: Create a quiz from the content provided at the end of the user message, using the settings given there.
+
+REQUIREMENTS:
+1. Use only the requested question types and difficulty level
+2. Focus on Canadian citizenship test topics: history, geography, government, rights, responsibilities
+3. Ensure questions are factual and test comprehension
+4. Provide clear, unambiguous answers
+
+CRITICAL FORMATTING RULES:
+❌ NEVER include letter prefixes (A), B), C), D)) in the option text
+❌ NEVER include numbers (1., 2., 3., 4.) in the option text
+✅ ALWAYS provide only the plain text of each option
+✅ The UI will automatically add the A/B/C/D labels
+
+CORRECT EXAMPLE:
+{
+  "question": "What is the capital of Canada?",
+  "type": "multiple_choice",
+  "options": [
+    "Ottawa",
+    "Toronto",
+    "Montreal",
+    "Vancouver"
+  ],
+  "answer": "Ottawa"
+}
+
+WRONG EXAMPLE (DO NOT DO THIS):
+{
+  "question": "What is the capital of Canada?",
+  "options": [
+    "A) Ottawa",           ❌ Wrong - has letter prefix
+    "B) Toronto",          ❌ Wrong - has letter prefix
+    "C) Montreal",         ❌ Wrong - has letter prefix
+    "D) Vancouver"         ❌ Wrong - has letter prefix
+  ]
+}
+"""
+
+_QUIZ_OUTPUT = """
+OUTPUT FORMAT (STRICT JSON):
+{
+  "summary": "Brief 2-3 sentence summary of the content",
+  "quiz": [
+    {
+      "question": "Clear, specific question text (no prefixes)",
+      "type": "multiple_choice|true_false|short_answer",
+      "options": ["Plain text option 1", "Plain text option 2", "Plain text option 3", "Plain text option 4"],
+      "answer": "Plain text of the correct answer (must exactly match one option)",
+      "explanation": "Brief explanation of why this is correct"
+    }
+  ]
+}
+
+Respond with ONLY the JSON, no additional text.
+"""
+
+# Same quiz without summary or explanations; explanations are generated on demand
+_QUIZ_LEAN_OUTPUT = """
+OUTPUT FORMAT (STRICT JSON):
+{
+  "quiz": [
+    {
+      "question": "Clear, specific question text (no prefixes)",
+      "type": "multiple_choice|true_false|short_answer",
+      "options": ["Plain text option 1", "Plain text option 2", "Plain text option 3", "Plain text option 4"],
+      "answer": "Plain text of the correct answer (must exactly match one option)"
+    }
+  ]
+}
+
+Do not include a summary or explanations. Respond with ONLY the JSON, no additional text.
+"""
+
+_QUIZ_PREFIX = _QUIZ_INSTRUCTIONS + _QUIZ_OUTPUT
+_QUIZ_LEAN_PREFIX = _QUIZ_INSTRUCTIONS + _QUIZ_LEAN_OUTPUT
+
+_QUIZ_SUFFIX = """
+SETTINGS:
+- Number of questions: exactly {question_count}
+- Question types: [{question_types}]
+- Difficulty level: {difficulty} - {difficulty_instructions}
+
+CONTENT TO ANALYZE:
+{content}
+"""
+
+# Distractor-only mode: the flashcard question and answer are already known, so the
+# model only writes wrong options or a true/false statement, in a terse schema
+_COMPACT_PREFIX = """
+You write quiz material for Canadian Citizenship Test flashcards whose correct answers are already known.
+
+Each input line is: id|kind|question|correct answer
+- kind mc: write 3 distractors, plausible but clearly wrong, in the same form and length as the correct answer
+- kind t: restate the question and its correct answer as one true sentence
+- kind f: restate the question as one false sentence by swapping in a plausible wrong answer
+
+OUTPUT FORMAT (STRICT JSON, one item per input line, in input order):
+{"quiz":[{"id":7,"d":["wrong 1","wrong 2","wrong 3"]},{"id":9,"s":"One sentence."}]}
+
+Use "d" for kind mc and "s" for kinds t and f. No other keys, no explanations, no text outside the JSON.
+"""
+
+_COMPACT_SUFFIX = """
+CARDS:
+{content}
+"""
+
+# On-demand explanation for one question; plain text out
+_EXPLANATION_PREFIX = """
+You are a Canadian Citizenship Test tutor.
+
+Explain in at most 2 short sentences why the given answer to the question is correct, using facts a
+study guide would contain. Do not restate the question, do not mention the other options by letter,
+and respond with the explanation text only.
+"""
+
+_EXPLANATION_SUFFIX = """
+QUESTION: {question}
+OPTIONS: {options}
+CORRECT ANSWER: {answer}
+"""
+
+TEMPLATES: Dict[str, PromptTemplate] = {
+    template.version: template
+    for template in (
+        PromptTemplate("quiz", "quiz-v2", _QUIZ_PREFIX, _QUIZ_SUFFIX),
+        PromptTemplate("quiz", "quiz-lean-v1", _QUIZ_LEAN_PREFIX, _QUIZ_SUFFIX),
+        PromptTemplate("distractors", "distractors-v1", _COMPACT_PREFIX, _COMPACT_SUFFIX),
+        PromptTemplate("explanation", "explanation-v1", _EXPLANATION_PREFIX, _EXPLANATION_SUFFIX),
+    )
+}
+
+QUIZ_TEMPLATE = TEMPLATES["quiz-v2"]
+QUIZ_LEAN_TEMPLATE = TEMPLATES["quiz-lean-v1"]
+COMPACT_TEMPLATE = TEMPLATES["distractors-v1"]
+EXPLANATION_TEMPLATE = TEMPLATES["explanation-v1"]
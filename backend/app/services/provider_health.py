@@ -0,0 +1,176 @@
+"""
+Rolling per-provider health shared by the process: latency percentiles for
+hedging and a circuit breaker (closed / open / half-open) driven by the recent
+error rate and slow-call rate.
+"""
+import logging
+import math
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+from ..utils import config
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyWindow:
+    """Keeps the last N successful generation latencies for one provider"""
+
+    def __init__(self, size: int):
+        self._samples = deque(maxlen=size)
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """Nearest-rank percentile of the window, or None when empty"""
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        rank = max(1, math.ceil(percent / 100 * len(ordered)))
+        return ordered[rank - 1]
+
+
+provider_latency: Dict[str, LatencyWindow] = {
+    "groq": LatencyWindow(config.AI_LATENCY_WINDOW),
+    "deepseek": LatencyWindow(config.AI_LATENCY_WINDOW),
+}
+
+
+class CircuitBreaker:
+    """Per-provider circuit breaker over a rolling time window of call outcomes"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = self.CLOSED
+        self.opened_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._outcomes = deque()  # (monotonic timestamp, ok, latency seconds)
+        self._half_open_in_flight = 0
+        self.times_opened = 0
+
+    def _trim(self, now: float):
+        cutoff = now - config.AI_BREAKER_WINDOW_SECONDS
+        while self._outcomes and self._outcomes[0][0] < cutoff:
+            self._outcomes.popleft()
+
+    def _refresh_state(self, now: float):
+        if self.state == self.OPEN and now - self.opened_at >= config.AI_BREAKER_OPEN_SECONDS:
+            self.state = self.HALF_OPEN
+            self._half_open_in_flight = 0
+            logger.info(f"Circuit for {self.name} is half-open; allowing probe requests")
+
+    def is_available(self) -> bool:
+        """Whether a call would currently be allowed (does not claim a probe slot)"""
+        self._refresh_state(time.monotonic())
+        if self.state == self.OPEN:
+            return False
+        if self.state == self.HALF_OPEN:
+            return self._half_open_in_flight < config.AI_BREAKER_HALF_OPEN_PROBES
+        return True
+
+    def allow_request(self) -> bool:
+        """Claim permission for one call; in half-open state this reserves a probe slot"""
+        if not self.is_available():
+            return False
+        if self.state == self.HALF_OPEN:
+            self._half_open_in_flight += 1
+        return True
+
+    def release(self):
+        """Give back a claimed probe slot when a call is abandoned (e.g. cancelled)"""
+        if self.state == self.HALF_OPEN and self._half_open_in_flight > 0:
+            self._half_open_in_flight -= 1
+
+    def record_success(self, latency: float):
+        now = time.monotonic()
+        if self.state == self.HALF_OPEN:
+            self._close(now)
+        self._outcomes.append((now, True, latency))
+        self._evaluate(now)
+
+    def record_failure(self, latency: float, error: Optional[str] = None):
+        now = time.monotonic()
+        self.last_error = error
+        if self.state == self.HALF_OPEN:
+            self._open(now, "probe failed")
+            return
+        self._outcomes.append((now, False, latency))
+        self._evaluate(now)
+
+    def _evaluate(self, now: float):
+        self._trim(now)
+        if self.state != self.CLOSED or len(self._outcomes) < config.AI_BREAKER_MIN_CALLS:
+            return
+        error_rate, slow_rate = self._rates()
+        if error_rate >= config.AI_BREAKER_ERROR_RATE:
+            self._open(now, f"error rate {error_rate:.0%}")
+        elif slow_rate >= config.AI_BREAKER_SLOW_RATE:
+            self._open(now, f"slow call rate {slow_rate:.0%}")
+
+    def _open(self, now: float, reason: str):
+        self.state = self.OPEN
+        self.opened_at = now
+        self.times_opened += 1
+        self._half_open_in_flight = 0
+        logger.warning(f"Circuit for {self.name} opened: {reason}")
+
+    def _close(self, now: float):
+        self.state = self.CLOSED
+        self.opened_at = None
+        self._half_open_in_flight = 0
+        self._outcomes.clear()
+        logger.info(f"Circuit for {self.name} closed")
+
+    def _rates(self):
+        total = len(self._outcomes)
+        if not total:
+            return 0.0, 0.0
+        errors = sum(1 for _, ok, _ in self._outcomes if not ok)
+        slow = sum(1 for _, _, latency in self._outcomes if latency >= config.AI_BREAKER_SLOW_CALL_SECONDS)
+        return errors / total, slow / total
+
+    def health_score(self) -> float:
+        """1.0 is perfectly healthy; penalised by recent errors and slow calls"""
+        self._trim(time.monotonic())
+        error_rate, slow_rate = self._rates()
+        return round(max(0.0, 1.0 - error_rate - 0.5 * slow_rate), 4)
+
+    def snapshot(self) -> Dict:
+        now = time.monotonic()
+        self._refresh_state(now)
+        self._trim(now)
+        error_rate, slow_rate = self._rates()
+        latency = provider_latency.get(self.name)
+        return {
+            "state": self.state,
+            "health_score": self.health_score(),
+            "calls_in_window": len(self._outcomes),
+            "error_rate": round(error_rate, 4),
+            "slow_call_rate": round(slow_rate, 4),
+            "p50_latency": latency.percentile(50) if latency else None,
+            "p95_latency": latency.percentile(95) if latency else None,
+            "open_for_seconds": round(now - self.opened_at, 1) if self.opened_at else None,
+            "times_opened": self.times_opened,
+            "last_error": self.last_error,
+        }
+
+
+provider_breakers: Dict[str, CircuitBreaker] = {
+    "groq": CircuitBreaker("groq"),
+    "deepseek": CircuitBreaker("deepseek"),
+}
+
+
+def rank_providers(names: List[str]) -> List[str]:
+    """Drop providers whose circuit is open and order the rest by recent health (stable)"""
+    available = [name for name in names if provider_breakers[name].is_available()]
+    return sorted(available, key=lambda name: -provider_breakers[name].health_score())
@@ -0,0 +1,347 @@
+"""
+Pre-generated question pool per flashcard.
+
+A background builder asks the AI service for several question variants per
+Flashcard and stores them as QuizQuestion rows under a single "Question Pool"
+Quiz. Quiz assembly then reads variants for the selected flashcards in one
+query and only falls back to live generation for cards whose pool is empty.
+"""
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from ..db import database
+from ..db import models as db_models
+from ..utils import config
+from ..utils.constants import QUESTION_POOL_QUIZ_TITLE
+from .ai_service import ai_generator, QuizGenerationRequest
+
+logger = logging.getLogger(__name__)
+
+POOL_QUESTION_TYPES = ["multiple_choice", "true_false"]
+
+
+class QuestionPool:
+    """Stores and serves pre-generated question variants per flashcard"""
+
+    def __init__(self):
+        self._pool_quiz_id: Optional[int] = None
+        # Serializes the lookup-or-create of the pool quiz (called from worker threads and requests)
+        self._pool_quiz_lock = threading.Lock()
+        self._pending_refill: Set[int] = set()
+        self._refilling: Set[int] = set()
+        self._refill_task: Optional[asyncio.Task] = None
+        self._build_task: Optional[asyncio.Task] = None
+        self._refill_window_start = 0.0
+        self._refill_window_count = 0
+        self.refills_deferred = 0
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+
+    #
+    # Assembly
+    #
+
+    def get_pool_quiz_id(self, db: Session) -> int:
+        """Return the id of the Quiz row that owns pooled questions, creating it if needed"""
+        if self._pool_quiz_id is not None:
+            return self._pool_quiz_id
+        with self._pool_quiz_lock:
+            if self._pool_quiz_id is None:
+                pool_quiz = self._find_pool_quiz(db)
+                if not pool_quiz:
+                    pool_quiz = db_models.Quiz(
+                        title=QUESTION_POOL_QUIZ_TITLE,
+                        description="Pre-generated question variants per flashcard"
+                    )
+                    db.add(pool_quiz)
+                    db.commit()
+                    db.refresh(pool_quiz)
+                self._pool_quiz_id = pool_quiz.id
+        return self._pool_quiz_id
+
+    def _find_pool_quiz(self, db: Session) -> Optional[db_models.Quiz]:
+        return db.query(db_models.Quiz).filter(
+            db_models.Quiz.title == QUESTION_POOL_QUIZ_TITLE,
+            db_models.Quiz.user_id.is_(None)
+        ).order_by(db_models.Quiz.id).first()
+
+    def assemble(
+        self,
+        db: Session,
+        flashcards: List[db_models.Flashcard],
+        question_types: List[str]
+    ) -> Tuple[List[Dict], List[db_models.Flashcard]]:
+        """
+        Pick one pooled variant per flashcard with a single query.
+
+        Returns:
+            (questions served from the pool, flashcards with no usable variant)
+        """
+        if not flashcards:
+            return [], []
+
+        pool_quiz_id = self.get_pool_quiz_id(db)
+        rows = db.query(db_models.QuizQuestion).filter(
+            db_models.QuizQuestion.quiz_id == pool_quiz_id,
+            db_models.QuizQuestion.flashcard_id.in_([f.id for f in flashcards]),
+            db_models.QuizQuestion.question_type.in_(question_types)
+        ).all()
+
+        variants: Dict[int, List[db_models.QuizQuestion]] = defaultdict(list)
+        for row in rows:
+            variants[row.flashcard_id].append(row)
+
+        questions = []
+        missing = []
+        low = []
+        for flashcard in flashcards:
+            card_variants = variants.get(flashcard.id)
+            if not card_variants:
+                missing.append(flashcard)
+                low.append(flashcard.id)
+                continue
+            if len(card_variants) < config.QUESTION_POOL_REFILL_BELOW:
+                low.append(flashcard.id)
+            questions.append(self._to_question(random.choice(card_variants)))
+
+        self.hits += len(questions)
+        self.misses += len(missing)
+        if low:
+            self.schedule_refill(low)
+
+        return questions, missing
+
+    def _to_question(self, row: db_models.QuizQuestion) -> Dict:
+        options = list(row.options or [])
+        if row.question_type == "multiple_choice":
+            options = ai_generator._shuffle_options(options)
+        question = {
+            "question": row.question_text,
+            "type": row.question_type,
+            "options": options,
+            "answer": row.correct_answer,
+            "flashcard_id": row.flashcard_id
+        }
+        if row.explanation:
+            question["explanation"] = row.explanation
+        return question
+
+    #
+    # Building and refilling
+    #
+
+    async def build_for_flashcards(self, flashcard_ids: Iterable[int], replace: bool = False) -> int:
+        """Generate variants for the given flashcards; returns the number of cards filled"""
+        flashcards = await asyncio.to_thread(self._load_flashcards, list(flashcard_ids))
+        semaphore = asyncio.Semaphore(config.QUESTION_POOL_BUILD_CONCURRENCY)
+
+        async def build_one(flashcard_id: int, question: str, answer: str) -> bool:
+            async with semaphore:
+                try:
+                    # A replacing build wants new variants, not the cached ones it is replacing
+                    questions = await self.generate_variants(question, answer, fresh=replace)
+                except Exception as e:
+                    logger.warning(f"Question pool generation failed for flashcard {flashcard_id}: {e}")
+                    return False
+            await asyncio.to_thread(self.store_variants, flashcard_id, questions, replace)
+            return True
+
+        results = await asyncio.gather(*(build_one(*card) for card in flashcards))
+        return sum(1 for filled in results if filled)
+
+    async def generate_variants(self, question: str, answer: str, fresh: bool = False) -> List[Dict]:
+        """Ask the AI service for pool variants of a single flashcard; fresh skips the quiz cache"""
+        response = await ai_generator.generate_quiz(QuizGenerationRequest(
+            content=f"Q: {question}\nA: {answer}",
+            question_count=config.QUESTION_POOL_VARIANTS_PER_CARD,
+            question_types=POOL_QUESTION_TYPES,
+            use_cache=not fresh
+        ))
+        return response.quiz
+
+    def store_variants(self, flashcard_id: int, questions: List[Dict], replace: bool = False):
+        """Persist generated variants for a flashcard (runs in a worker thread)"""
+        db = database.SessionLocal()
+        try:
+            pool_quiz_id = self.get_pool_quiz_id(db)
+            if replace:
+                self._delete_variants(db, pool_quiz_id, flashcard_id)
+            for question in questions:
+                if question.get("type") not in POOL_QUESTION_TYPES:
+                    continue
+                db.add(db_models.QuizQuestion(
+                    quiz_id=pool_quiz_id,
+                    flashcard_id=flashcard_id,
+                    question_text=question["question"],
+                    question_type=question["type"],
+                    options=question.get("options"),
+                    correct_answer=question["answer"],
+                    explanation=question.get("explanation")
+                ))
+            db.commit()
+            self.generated += len(questions)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to store question pool variants for flashcard {flashcard_id}: {e}")
+        finally:
+            db.close()
+
+    def schedule_refill(self, flashcard_ids: Iterable[int]):
+        """
+        Queue flashcards for background refill; a single task drains the queue.
+
+        At most QUESTION_POOL_REFILL_PER_MINUTE cards are accepted per minute so
+        live quiz traffic on a thin pool cannot turn into a generation per card;
+        deferred cards are picked up by the next build.
+        """
+        now = time.monotonic()
+        if now - self._refill_window_start >= 60:
+            self._refill_window_start = now
+            self._refill_window_count = 0
+        candidates = [
+            card_id for card_id in flashcard_ids
+            if card_id not in self._refilling and card_id not in self._pending_refill
+        ]
+        budget = max(0, config.QUESTION_POOL_REFILL_PER_MINUTE - self._refill_window_count)
+        accepted = candidates[:budget]
+        self.refills_deferred += len(candidates) - len(accepted)
+        if not accepted:
+            return
+        self._refill_window_count += len(accepted)
+        self._pending_refill.update(accepted)
+        if self._refill_task is None or self._refill_task.done():
+            try:
+                self._refill_task = asyncio.get_running_loop().create_task(self._drain_refills())
+            except RuntimeError:
+                pass  # No running loop (e.g. called from a script); refill on next build
+
+    async def _drain_refills(self):
+        while self._pending_refill:
+            batch = list(self._pending_refill)[:config.QUESTION_POOL_BUILD_CONCURRENCY * 5]
+            self._pending_refill.difference_update(batch)
+            self._refilling.update(batch)
+            try:
+                # Replace rather than append so refilled cards end up at the target size
+                await self.build_for_flashcards(batch, replace=True)
+            finally:
+                self._refilling.difference_update(batch)
+
+    async def build_all(self) -> int:
+        """Fill every flashcard that is below target or has stale variants"""
+        flashcard_ids, stale_ids = await asyncio.to_thread(self._cards_needing_build)
+        filled = 0
+        if flashcard_ids:
+            filled += await self.build_for_flashcards(flashcard_ids)
+        if stale_ids:
+            filled += await self.build_for_flashcards(stale_ids, replace=True)
+        logger.info(f"Question pool build finished: {filled} flashcards filled")
+        return filled
+
+    def start_background_build(self) -> bool:
+        """Start build_all in the background unless a build is already running"""
+        if self._build_task is not None and not self._build_task.done():
+            return False
+        self._build_task = asyncio.get_running_loop().create_task(self.build_all())
+        return True
+
+    async def stop(self):
+        for task in (self._build_task, self._refill_task):
+            if task is not None and not task.done():
+                task.cancel()
+
+    def _cards_needing_build(self) -> Tuple[List[int], List[int]]:
+        """Return (cards below the target variant count, cards whose variants are stale)"""
+        db = database.SessionLocal()
+        try:
+            pool_quiz_id = self.get_pool_quiz_id(db)
+            counts = dict(
+                db.query(db_models.QuizQuestion.flashcard_id, func.count(db_models.QuizQuestion.id))
+                .filter(db_models.QuizQuestion.quiz_id == pool_quiz_id)
+                .group_by(db_models.QuizQuestion.flashcard_id)
+                .all()
+            )
+            cutoff = datetime.now(timezone.utc) - timedelta(days=config.QUESTION_POOL_MAX_AGE_DAYS)
+            stale = {
+                flashcard_id for (flashcard_id,) in
+                db.query(db_models.QuizQuestion.flashcard_id)
+                .filter(
+                    db_models.QuizQuestion.quiz_id == pool_quiz_id,
+                    db_models.QuizQuestion.created_at < cutoff
+                )
+                .distinct()
+                .all()
+            }
+            card_ids = [
+                card_id for (card_id,) in
+                db.query(db_models.Flashcard.id).filter(db_models.Flashcard.chapter_id.isnot(None)).all()
+            ]
+            below_target = [
+                card_id for card_id in card_ids
+                if card_id not in stale and counts.get(card_id, 0) < config.QUESTION_POOL_VARIANTS_PER_CARD
+            ]
+            return below_target, [card_id for card_id in card_ids if card_id in stale]
+        finally:
+            db.close()
+
+    def _load_flashcards(self, flashcard_ids: List[int]) -> List[Tuple[int, str, str]]:
+        db = database.SessionLocal()
+        try:
+            return [
+                (f.id, f.question, f.answer) for f in
+                db.query(db_models.Flashcard).filter(db_models.Flashcard.id.in_(flashcard_ids)).all()
+            ]
+        finally:
+            db.close()
+
+    #
+    # Invalidation
+    #
+
+    def invalidate_flashcard(self, db: Session, flashcard_id: int):
+        """
+        Drop pooled variants of a flashcard that was edited or is about to be deleted.
+
+        The delete joins the caller's transaction; nothing is created or committed
+        here, and there is nothing to drop while the pool is off or not built yet.
+        """
+        if not config.QUESTION_POOL_ENABLED:
+            return
+        pool_quiz_id = self._pool_quiz_id
+        if pool_quiz_id is None:
+            pool_quiz = self._find_pool_quiz(db)
+            if pool_quiz is None:
+                return
+            pool_quiz_id = pool_quiz.id
+        self._delete_variants(db, pool_quiz_id, flashcard_id)
+
+    def _delete_variants(self, db: Session, pool_quiz_id: int, flashcard_id: int):
+        db.query(db_models.QuizQuestion).filter(
+            db_models.QuizQuestion.quiz_id == pool_quiz_id,
+            db_models.QuizQuestion.flashcard_id == flashcard_id
+        ).delete(synchronize_session=False)
+
+    def stats(self) -> Dict:
+        served = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / served, 4) if served else None,
+            "variants_generated": self.generated,
+            "pending_refill": len(self._pending_refill),
+            "refills_deferred": self.refills_deferred,
+            "build_running": self._build_task is not None and not self._build_task.done()
+        }
+
+
+# Global instance
+question_pool = QuestionPool()
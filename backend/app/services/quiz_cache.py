@@ -0,0 +1,172 @@
+"""
+Content-addressed cache for AI generation results.
+
+Entries are keyed by a sha256 of everything that influences the completion
+(content, question count, question types, difficulty, prompt version). There is
+an in-process LRU tier bounded by TTL, entry count and total size, plus an
+optional persistent tier in the generated_quiz_cache table that survives
+restarts and is shared between workers.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from ..db import database
+from ..db import models as db_models
+from ..utils import config
+
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(namespace: str, **fields) -> str:
+    """Hash the namespace and request fields into a stable 64-char key"""
+    payload = json.dumps({"namespace": namespace, **fields}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """In-process LRU with per-entry TTL and entry-count / byte-size eviction"""
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        # key -> (expires_at monotonic, serialized value)
+        self._entries: OrderedDict[str, Tuple[float, str]] = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: str):
+        size = len(value)
+        if size > self.max_bytes:
+            return  # Never let a single entry flush the whole cache
+
+        if key in self._entries:
+            self._remove(key)
+
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._bytes += size
+
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def _remove(self, key: str):
+        _, value = self._entries.pop(key)
+        self._bytes -= len(value)
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class TieredCache:
+    """LRU tier in front of an optional database tier; values are JSON-serializable dicts"""
+
+    def __init__(self, memory: LRUCache, persistent: bool = False):
+        self.memory = memory
+        self.persistent = persistent
+        self.persistent_hits = 0
+
+    async def get(self, key: str) -> Optional[Dict]:
+        value = self.memory.get(key)
+        if value is None and self.persistent:
+            value = await asyncio.to_thread(self._db_get, key)
+            if value is not None:
+                self.persistent_hits += 1
+                self.memory.set(key, value)
+
+        # Always hand out a fresh copy so callers can mutate (e.g. reshuffle) freely
+        return json.loads(value) if value is not None else None
+
+    async def set(self, key: str, data: Dict):
+        value = json.dumps(data, ensure_ascii=False)
+        self.memory.set(key, value)
+        if self.persistent:
+            await asyncio.to_thread(self._db_set, key, value)
+
+    def _db_get(self, key: str) -> Optional[str]:
+        db = database.SessionLocal()
+        try:
+            row = db.query(db_models.GeneratedQuizCache).filter(
+                db_models.GeneratedQuizCache.cache_key == key
+            ).first()
+            if row is None:
+                return None
+            if row.expires_at <= datetime.utcnow():
+                db.delete(row)
+                db.commit()
+                return None
+            return row.payload
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Persistent quiz cache read failed: {e}")
+            return None
+        finally:
+            db.close()
+
+    def _db_set(self, key: str, value: str):
+        db = database.SessionLocal()
+        try:
+            expires_at = datetime.utcnow() + timedelta(seconds=self.memory.ttl_seconds)
+            row = db.query(db_models.GeneratedQuizCache).filter(
+                db_models.GeneratedQuizCache.cache_key == key
+            ).first()
+            if row:
+                row.payload = value
+                row.expires_at = expires_at
+            else:
+                db.add(db_models.GeneratedQuizCache(cache_key=key, payload=value, expires_at=expires_at))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Persistent quiz cache write failed: {e}")
+        finally:
+            db.close()
+
+    def stats(self) -> Dict:
+        return {**self.memory.stats(), "persistent": self.persistent, "persistent_hits": self.persistent_hits}
+
+
+# Global instance used by AIQuizGenerator
+quiz_cache = TieredCache(
+    LRUCache(
+        max_entries=config.QUIZ_CACHE_MAX_ENTRIES,
+        max_bytes=config.QUIZ_CACHE_MAX_BYTES,
+        ttl_seconds=config.QUIZ_CACHE_TTL_SECONDS,
+    ),
+    persistent=config.QUIZ_CACHE_PERSISTENT,
+)
@@ -0,0 +1,219 @@
+"""
+Tolerant incremental parser for quiz JSON produced by the LLM.
+
+Text can be fed in arbitrary chunks (e.g. streaming deltas). The parser tracks
+string/escape state and container depth in a single pass and hands back each
+question object of the "quiz" array as soon as its closing brace arrives, so a
+caller can forward questions to the user before the completion has finished.
+
+Common LLM mistakes are repaired per question while scanning instead of with a
+second regex pass over the whole document:
+- trailing commas before "}" or "]" are dropped
+- a quote inside a string that is not followed by ":", ",", "}" or "]" is
+  treated as literal text and escaped
+- raw newlines/tabs inside strings are accepted
+
+A question that still fails to decode is recorded in `errors` and skipped; the
+remaining questions are kept.
+"""
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+_STRING_SPECIAL = re.compile(r'["\\]')
+_STRUCTURAL = re.compile(r'["{}\[\]:,]')
+_NON_WS = re.compile(r"\S")
+
+
+class IncrementalQuizParser:
+    """Single-pass scanner that emits quiz questions as their JSON objects close"""
+
+    def __init__(self):
+        self.buffer = ""
+        self.summary: Optional[str] = None
+        self.errors: List[str] = []  # Raw text of question objects that failed to decode
+        self.repairs = 0  # Trailing commas dropped and stray quotes escaped
+        self.quiz_complete = False
+
+        self._pos = 0
+        self._stack: List[List] = []  # [container char, expecting_key]
+        self._in_string = False
+        self._string_start = 0
+        self._comma_at: Optional[int] = None
+        self._edits: Dict[int, str] = {}  # buffer index -> replacement text
+        self._top_level_key: Optional[str] = None
+        self._quiz_depth: Optional[int] = None
+        self._question_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Dict]:
+        """Consume more text and return the questions completed by it"""
+        self.buffer += chunk
+        completed = []
+        buffer = self.buffer
+        stack = self._stack
+        pos = self._pos
+
+        while True:
+            if self._in_string:
+                match = _STRING_SPECIAL.search(buffer, pos)
+                if match is None:
+                    pos = len(buffer)
+                    break
+                i = match.start()
+                if buffer[i] == "\\":
+                    if i + 1 >= len(buffer):
+                        pos = i  # Wait for the escaped character
+                        break
+                    pos = i + 2
+                    continue
+                following = buffer[i + 1:i + 2]
+                if not following or following.isspace():
+                    match = _NON_WS.search(buffer, i + 1)
+                    if match is None:
+                        pos = i  # Can't tell yet whether this quote ends the string
+                        break
+                    following = buffer[match.start()]
+                if following in ":,}]":
+                    self._in_string = False
+                    self._on_string(self._string_start, i + 1)
+                else:
+                    # Unescaped quote inside the text, e.g. "the "Great" Lakes"
+                    self._edits[i] = '\\"'
+                    self.repairs += 1
+                pos = i + 1
+                continue
+
+            if not stack:
+                # Ignore prose or code fences around the JSON document
+                match = _STRUCTURAL.search(buffer, pos)
+                if match is None:
+                    pos = len(buffer)
+                    break
+                i = match.start()
+                pos = i + 1
+                if buffer[i] == "{":
+                    stack.append(["{", True])
+                elif buffer[i] == "[" and not self.quiz_complete:
+                    # Bare array of questions instead of {"quiz": [...]}
+                    stack.append(["[", False])
+                    self._quiz_depth = 1
+                continue
+
+            match = _STRUCTURAL.search(buffer, pos)
+            if match is None:
+                pos = len(buffer)
+                break
+            i = match.start()
+            char = buffer[i]
+            pos = i + 1
+
+            if char == ",":
+                if stack[-1][0] == "{":
+                    stack[-1][1] = True
+                self._comma_at = i
+                continue
+
+            if char in "}]" and self._comma_at is not None and not buffer[self._comma_at + 1:i].strip():
+                self._edits[self._comma_at] = ""
+                self.repairs += 1
+            self._comma_at = None
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = i
+            elif char == "{":
+                if self._quiz_depth is not None and len(stack) == self._quiz_depth:
+                    self._question_start = i
+                stack.append(["{", True])
+            elif char == "[":
+                stack.append(["[", False])
+                if len(stack) == 2 and self._top_level_key == "quiz" and self._quiz_depth is None:
+                    self._quiz_depth = 2
+            elif char in "}]":
+                stack.pop()
+                if char == "}" and self._question_start is not None and len(stack) == self._quiz_depth:
+                    question = self._decode_question(self._question_start, i + 1)
+                    if question is not None:
+                        completed.append(question)
+                    self._question_start = None
+                    self._edits.clear()
+                elif char == "]" and self._quiz_depth is not None and len(stack) == self._quiz_depth - 1:
+                    self._quiz_depth = None
+                    self.quiz_complete = True
+            elif char == ":":
+                stack[-1][1] = False
+
+        self._pos = pos
+        return completed
+
+    def _text(self, start: int, end: int) -> str:
+        """Buffer slice with pending repairs applied"""
+        edits = sorted(index for index in self._edits if start <= index < end)
+        if not edits:
+            return self.buffer[start:end]
+        parts = []
+        cursor = start
+        for index in edits:
+            parts.append(self.buffer[cursor:index])
+            parts.append(self._edits[index])
+            cursor = index + 1
+        parts.append(self.buffer[cursor:end])
+        return "".join(parts)
+
+    def _on_string(self, start: int, end: int):
+        if len(self._stack) != 1 or self._stack[0][0] != "{":
+            return
+        try:
+            value = json.loads(self._text(start, end), strict=False)
+        except ValueError:
+            return
+        if self._stack[0][1]:
+            self._top_level_key = value
+        elif self._top_level_key == "summary":
+            self.summary = value
+
+    def _decode_question(self, start: int, end: int) -> Optional[Dict]:
+        raw = self._text(start, end)
+        try:
+            question = json.loads(raw, strict=False)
+        except ValueError:
+            self.errors.append(raw)
+            return None
+        if not isinstance(question, dict):
+            self.errors.append(raw)
+            return None
+        return question
+
+
+@dataclass
+class ParsedQuiz:
+    questions: List[Dict]
+    summary: str = ""
+    errors: List[str] = field(default_factory=list)
+    repairs: int = 0
+
+
+def parse_quiz_text(text: str) -> ParsedQuiz:
+    """
+    Parse a complete LLM response.
+
+    Well-formed responses are decoded directly by json; anything else goes
+    through the tolerant scanner so every intact question is still salvaged.
+    """
+    start = text.find("{")
+    end = text.rfind("}")
+    if start != -1 and end > start:
+        try:
+            result = json.loads(text[start:end + 1], strict=False)
+        except ValueError:
+            result = None
+        if isinstance(result, dict) and isinstance(result.get("quiz"), list):
+            questions = [q for q in result["quiz"] if isinstance(q, dict)]
+            errors = [json.dumps(q) for q in result["quiz"] if not isinstance(q, dict)]
+            summary = result.get("summary")
+            return ParsedQuiz(questions, summary if isinstance(summary, str) else "", errors)
+
+    parser = IncrementalQuizParser()
+    questions = parser.feed(text)
+    return ParsedQuiz(questions, parser.summary or "", parser.errors, parser.repairs)
@@ -2,12 +2,15 @@ import os
 import json
 import re
 import random
+import logging
+import time
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 import jwt
 import stripe
 import requests
 import hmac
 import hashlib
+import ipaddress
 from datetime import datetime, timedelta, timezone
 from typing import List, Optional
 
@@ -25,7 +28,20 @@ from ..utils import config, file_utils
 # Initialize clients
 stripe.api_key = config.STRIPE_SECRET_KEY
 # Initialize AI service
-from .ai_service import ai_generator
+from .ai_service import (
+    ai_generator, AllProvidersFailedError, QuizGenerationRequest, compact_request, generate_quiz_requests
+)
+from .question_pool import question_pool
+from .explanations import explanation_service
+from .distractors import distractor_engine
+from .flashcard_sampler import flashcard_sampler
+from .catalog import catalog
+from .flashcard_search import flashcard_search
+from .stratified_sampling import stratified_sample
+from .admission import generation_scheduler, Principal, AdmissionRejected, PREMIUM, FREE, GUEST
+from . import document_pipeline
+
+logger = logging.getLogger(__name__)
 
 security = HTTPBearer(auto_error=False)
 
@@ -163,13 +179,11 @@ async def get_current_user(
 # Flashcard Services
 #
 
-def get_flashcards(db: Session, skip: int, limit: int, category: Optional[str], tag: Optional[str]) -> List[db_models.Flashcard]:
-    query = db.query(db_models.Flashcard)
-    if category:
-        query = query.filter(db_models.Flashcard.category == category)
-    if tag:
-        query = query.filter(db_models.Flashcard.tags.contains([tag]))
-    return query.offset(skip).limit(limit).all()
+def catalog_changed():
+    """Call after committing any chapter or flashcard write; every index derived from the catalog is rebuilt on next use"""
+    distractor_engine.invalidate()
+    flashcard_sampler.invalidate()
+    catalog.bump()
 
 def get_flashcard(db: Session, flashcard_id: int) -> Optional[db_models.Flashcard]:
     return db.query(db_models.Flashcard).filter(db_models.Flashcard.id == flashcard_id).first()
@@ -179,29 +193,45 @@ def create_flashcard(db: Session, flashcard: schemas.FlashcardCreate) -> db_mode
     db.add(db_flashcard)
     db.commit()
     db.refresh(db_flashcard)
+    catalog_changed()
     return db_flashcard
 
-def update_flashcard(db: Session, flashcard_id: int, flashcard: schemas.FlashcardCreate) -> Optional[db_models.Flashcard]:
+def update_flashcard(db: Session, flashcard_id: int, flashcard: schemas.FlashcardUpdate) -> Optional[db_models.Flashcard]:
     db_flashcard = db.query(db_models.Flashcard).filter(db_models.Flashcard.id == flashcard_id).first()
     if db_flashcard:
-        for key, value in flashcard.dict().items():
+        # Editors that predate weights never send it; keep the card's weight then
+        for key, value in flashcard.dict(exclude={"weight"} if flashcard.weight is None else None).items():
             setattr(db_flashcard, key, value)
+        question_pool.invalidate_flashcard(db, flashcard_id)
         db.commit()
         db.refresh(db_flashcard)
+        catalog_changed()
     return db_flashcard
 
 def delete_flashcard(db: Session, flashcard_id: int) -> bool:
     db_flashcard = db.query(db_models.Flashcard).filter(db_models.Flashcard.id == flashcard_id).first()
     if db_flashcard:
+        question_pool.invalidate_flashcard(db, flashcard_id)
         db.delete(db_flashcard)
         db.commit()
+        catalog_changed()
         return True
     return False
 
+def search_flashcards(
+    db: Session, query: str, chapter_id: Optional[int] = None, limit: int = 20, offset: int = 0
+) -> List[schemas.FlashcardSearchResult]:
+    """Full-text search over questions and answers, most relevant first (see flashcard_search)"""
+    return [
+        schemas.FlashcardSearchResult(**schemas.Flashcard.from_orm(flashcard).dict(), relevance=relevance)
+        for flashcard, relevance in flashcard_search.search(db, query, chapter_id, limit, offset)
+    ]
+
 def import_flashcards_from_json(db: Session, flashcards: List[schemas.FlashcardCreate]):
     db_flashcards = [db_models.Flashcard(**f.dict()) for f in flashcards]
     db.add_all(db_flashcards)
     db.commit()
+    catalog_changed()
     return {"message": f"{len(db_flashcards)} flashcards imported successfully"}
 
 
@@ -228,6 +258,8 @@ async def extract_text_from_file(db: Session, file: UploadFile):
     # Save document to DB and clean up file
     create_document(db, name=file.filename, content=text)
     file_utils.remove_temp_file(file_path)
+    # Hand the connection back before generation, which may wait on admission and the provider
+    db.close()
     
     return {"filename": file.filename, "extracted_text": text}
 
@@ -242,9 +274,90 @@ async def generate_quiz(content: str, question_count: int, question_types: List[
     from .ai_service import generate_quiz as ai_generate_quiz
     return await ai_generate_quiz(content, question_count, question_types, ai_provider)
 
-async def generate_quiz_from_flashcards_service(db: Session, request: schemas.QuizRequest, chapter_id: int = None) -> dict:
+async def generate_quiz_from_document(
+    content: str, question_count: int, question_types: List[str], principal: Optional[Principal] = None
+) -> dict:
+    """Generate a quiz from extracted document text, chunking large documents (map-reduce)"""
+    plan = _plan_document_or_http_error(content, question_count)
+    slot = await acquire_generation_slot(principal)
+    try:
+        return await document_pipeline.generate_from_plan(plan, question_types)
+    finally:
+        slot.release()
+
+async def stream_quiz_from_document(
+    content: str, question_count: int, question_types: List[str], principal: Optional[Principal] = None
+):
+    """Streaming counterpart of generate_quiz_from_document; size and admission checks happen before streaming starts"""
+    plan = _plan_document_or_http_error(content, question_count)
+    slot = await acquire_generation_slot(principal)
+    return _release_when_done(document_pipeline.stream_from_plan(plan, question_types), slot)
+
+def _plan_document_or_http_error(content: str, question_count: int) -> document_pipeline.DocumentPlan:
+    try:
+        return document_pipeline.plan_document(content, question_count)
+    except document_pipeline.DocumentTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except document_pipeline.EmptyDocumentError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+#
+# Generation Admission
+#
+
+def generation_principal(db: Session, user: Optional[db_models.User], request: Optional[Request]) -> Principal:
+    """Admission priority for a generation request: premium (active payment), free (signed in) or guest"""
+    if user is None:
+        return Principal(key=f"ip:{client_host(request)}", priority=GUEST)
+    priority = PREMIUM if get_user_active_payment(db, user.id) else FREE
+    return Principal(key=f"user:{user.id}", priority=priority)
+
+_TRUSTED_PROXIES = [ipaddress.ip_network(proxy, strict=False) for proxy in config.TRUSTED_PROXIES]
+
+def _is_trusted_proxy(host: str) -> bool:
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in _TRUSTED_PROXIES)
+
+def client_host(request: Optional[Request]) -> str:
+    """
+    The address of the client behind any trusted proxies: X-Forwarded-For is
+    walked from the right (each proxy appends the address it received the
+    request from) and the first untrusted entry wins, so entries a client
+    sends itself are never used.
+    """
+    if request is None or not request.client:
+        return "unknown"
+    host = request.client.host
+    if not _is_trusted_proxy(host):
+        return host
+    forwarded = request.headers.get("x-forwarded-for", "")
+    for hop in reversed([h.strip() for h in forwarded.split(",") if h.strip()]):
+        if not _is_trusted_proxy(hop):
+            return hop
+        host = hop
+    return host
+
+async def acquire_generation_slot(principal: Optional[Principal]):
+    """Wait for a generation slot, turning a shed request into a 429/503 with Retry-After"""
+    try:
+        return await generation_scheduler.acquire(principal)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+async def _release_when_done(events, slot):
+    """Pass events through, giving the generation slot back when the stream ends or the client disconnects"""
+    try:
+        async for event in events:
+            yield event
+    finally:
+        slot.release()
+
+def select_flashcards_for_quiz(db: Session, request: schemas.QuizRequest, chapter_id: int = None) -> List[db_models.Flashcard]:
     """
-    Generate quiz from flashcards with smart distribution:
+    Select flashcards for a quiz with smart distribution:
     
     User Tiers:
     - Guest (not logged in): 3 questions
@@ -256,63 +369,25 @@ async def generate_quiz_from_flashcards_service(db: Session, request: schemas.Qu
     - Mixed test (Premium/20Q): 2 questions per chapter, balanced across all 10 chapters
     - Mixed test (Free/Guest): Random selection from all chapters (respecting tier limit)
     """
-    from .chapter_service import get_all_chapters
-    
     requested_count = request.count
     max_questions = min(requested_count, 20)  # Cap at 20 questions max
     is_premium_test = requested_count >= 20  # Premium users request 20 questions
     
     # Case 1: Specific chapter selected (Premium users only)
     if chapter_id:
-        flashcards = db.query(db_models.Flashcard).filter(
-            db_models.Flashcard.chapter_id == chapter_id
-        ).all()
+        # Randomly select up to requested count from this chapter
+        selected_flashcards = sample_flashcards(db, max_questions, chapter_id=chapter_id, seed=request.seed)
         
-        if not flashcards:
+        if not selected_flashcards:
             raise HTTPException(
                 status_code=404, 
                 detail=f"No flashcards found for chapter ID {chapter_id}. This chapter may not have content yet."
             )
-        
-        # Randomly select up to requested count from this chapter
-        selected_flashcards = random.sample(flashcards, min(len(flashcards), max_questions))
     
     # Case 2: Mixed test with premium distribution (20 questions)
     elif is_premium_test:
-        all_chapters = get_all_chapters(db)
-        selected_flashcards = []
-        questions_per_chapter = 2  # Target 2 questions per chapter for premium
-        
-        # First pass: Try to get 2 questions from each chapter
-        for chapter in all_chapters:
-            chapter_flashcards = db.query(db_models.Flashcard).filter(
-                db_models.Flashcard.chapter_id == chapter.id
-            ).all()
-            
-            if chapter_flashcards:
-                # Take up to 2 random questions from this chapter
-                num_to_take = min(len(chapter_flashcards), questions_per_chapter)
-                selected_from_chapter = random.sample(chapter_flashcards, num_to_take)
-                selected_flashcards.extend(selected_from_chapter)
-        
-        # If we have fewer than 20, fill the rest randomly from all flashcards
-        if len(selected_flashcards) < max_questions:
-            # Get all flashcards not already selected
-            selected_ids = {f.id for f in selected_flashcards}
-            remaining_flashcards = db.query(db_models.Flashcard).filter(
-                db_models.Flashcard.chapter_id.isnot(None),
-                ~db_models.Flashcard.id.in_(selected_ids)
-            ).all()
-            
-            if remaining_flashcards:
-                needed = max_questions - len(selected_flashcards)
-                additional = random.sample(remaining_flashcards, min(len(remaining_flashcards), needed))
-                selected_flashcards.extend(additional)
-        
-        # If we have more than 20 (shouldn't happen with 2 per chapter and 10 chapters)
-        # trim down to exactly 20
-        if len(selected_flashcards) > max_questions:
-            selected_flashcards = random.sample(selected_flashcards, max_questions)
+        # Target 2 questions per chapter, filling the rest randomly from all chapters
+        selected_flashcards = sample_flashcards(db, max_questions, per_chapter=2, seed=request.seed)
         
         # Check if we have any flashcards at all
         if not selected_flashcards:
@@ -323,28 +398,221 @@ async def generate_quiz_from_flashcards_service(db: Session, request: schemas.Qu
     
     # Case 3: Mixed test for free/guest users (3 or 5 questions)
     else:
-        # Just get random flashcards from all chapters
-        all_flashcards = db.query(db_models.Flashcard).filter(
-            db_models.Flashcard.chapter_id.isnot(None)
-        ).all()
+        # Randomly select the requested number of questions from all chapters
+        selected_flashcards = sample_flashcards(db, max_questions, seed=request.seed)
         
-        if not all_flashcards:
+        if not selected_flashcards:
             raise HTTPException(
                 status_code=404, 
                 detail="No flashcards found with assigned chapters. Please assign flashcards to chapters first."
             )
-        
-        # Randomly select the requested number of questions
-        selected_flashcards = random.sample(all_flashcards, min(len(all_flashcards), max_questions))
     
     # Shuffle the final selection for randomness
-    random.shuffle(selected_flashcards)
+    (random.Random(request.seed) if request.seed is not None else random).shuffle(selected_flashcards)
+    return selected_flashcards
+
+def sample_flashcards(
+    db: Session, count: int, per_chapter: int = 0, chapter_id: Optional[int] = None, seed: Optional[int] = None
+) -> List[db_models.Flashcard]:
+    """
+    Weighted-random chapter-assigned cards, per_chapter from every chapter first.
     
-    # Combine selected flashcards into a text block for the AI
-    content = "\n\n".join([f"Q: {f.question}\nA: {f.answer}" for f in selected_flashcards])
+    Drawn from flashcard_sampler's in-memory ID index, or with one SQL statement
+    when FLASHCARD_SAMPLING is "sql"; either way only the chosen rows are loaded.
+    """
+    if config.FLASHCARD_SAMPLING == "sql":
+        return stratified_sample(db, count, per_chapter=per_chapter, chapter_id=chapter_id, seed=seed)
+    rng = random.Random(seed) if seed is not None else None
+    if per_chapter:
+        return flashcard_sampler.sample_balanced(db, count, per_chapter, rng=rng)
+    return flashcard_sampler.sample(db, count, chapter_id=chapter_id, rng=rng)
+
+async def generate_quiz_from_flashcards_service(
+    db: Session, request: schemas.QuizRequest, chapter_id: int = None, principal: Optional[Principal] = None
+) -> dict:
+    """Generate a quiz from flashcards selected by select_flashcards_for_quiz"""
+    selected_flashcards = select_flashcards_for_quiz(db, request, chapter_id)
+    
+    if request.mode == "local":
+        return build_local_quiz(db, selected_flashcards, request.question_types)
+    
+    # Serve pre-generated variants first; only cards with an empty pool need the AI
+    pooled_questions = []
+    if config.QUESTION_POOL_ENABLED:
+        pooled_questions, selected_flashcards = question_pool.assemble(db, selected_flashcards, request.question_types)
+        if not selected_flashcards:
+            random.shuffle(pooled_questions)
+            return {
+                "quiz": pooled_questions,
+                "summary": "",
+                "metadata": {"provider_used": "question_pool", "generation_time": 0.0, "pool_hits": len(pooled_questions)}
+            }
+    
+    # The selected rows stay readable; hand the connection back before waiting on admission and the provider
+    db.close()
     
     # Generate exactly the number of questions we have flashcards for
-    return await generate_quiz(content, len(selected_flashcards), request.question_types)
+    slot = await acquire_generation_slot(principal)
+    # Once admitted, large quizzes are split into concurrent sub-generations with the same chapter mix each
+    groups = split_flashcards_for_fanout(selected_flashcards, ai_generator.fanout_width(len(selected_flashcards)))
+    compact = uses_compact_generation(request)
+    try:
+        quiz_result = await generate_quiz_requests([
+            flashcard_generation_request(group, request.question_types, compact) for group in groups
+        ])
+    except AllProvidersFailedError as e:
+        logger.warning(f"{e}; building {len(selected_flashcards)} questions locally")
+        quiz_result = build_local_quiz(db, selected_flashcards, request.question_types)
+        quiz_result["metadata"]["fallback"] = True
+    finally:
+        slot.release()
+    
+    failed_groups = quiz_result["metadata"].get("failed_groups")
+    if failed_groups:
+        # Build the failed groups' cards locally so every selected chapter keeps its questions
+        missing = [flashcard for index in failed_groups for flashcard in groups[index]]
+        quiz_result["quiz"] = quiz_result["quiz"] + build_local_quiz(db, missing, request.question_types)["quiz"]
+        quiz_result["metadata"]["local_fill"] = len(missing)
+    if len(groups) > 1:
+        # Groups are dealt chapter by chapter; do not let that order show
+        random.shuffle(quiz_result["quiz"])
+    
+    if pooled_questions:
+        quiz_result["quiz"] = quiz_result["quiz"] + pooled_questions
+        random.shuffle(quiz_result["quiz"])
+        quiz_result["metadata"]["pool_hits"] = len(pooled_questions)
+    
+    return quiz_result
+
+def flashcards_to_content(flashcards: List[db_models.Flashcard]) -> str:
+    """Flashcards as the "Q: ... / A: ..." text block the AI generates from"""
+    return "\n\n".join([f"Q: {f.question}\nA: {f.answer}" for f in flashcards])
+
+def uses_compact_generation(request: schemas.QuizRequest) -> bool:
+    return request.mode == "compact" or (request.mode == "ai" and config.AI_COMPACT_FLASHCARDS)
+
+def flashcard_generation_request(
+    flashcards: List[db_models.Flashcard], question_types: List[str], compact: bool = False
+) -> QuizGenerationRequest:
+    """
+    Full mode sends the cards as Q/A text and the model writes whole questions;
+    compact mode sends (flashcard_id, question, answer) and the model writes only
+    distractors and true/false statements, so questions keep their flashcard_id.
+    """
+    if compact:
+        return compact_request([(f.id, f.question, f.answer) for f in flashcards], question_types)
+    return QuizGenerationRequest(
+        content=flashcards_to_content(flashcards),
+        question_count=len(flashcards),
+        question_types=question_types
+    )
+
+def split_flashcards_for_fanout(flashcards: List[db_models.Flashcard], groups: int) -> List[List[db_models.Flashcard]]:
+    """
+    Deal flashcards into at most `groups` groups, chapter by chapter, so each group
+    gets a similar chapter mix and the selection's per-chapter counts are unchanged.
+    """
+    if groups <= 1:
+        return [flashcards]
+    dealt = [[] for _ in range(groups)]
+    # sorted() is stable, so the random order within each chapter is kept
+    for index, flashcard in enumerate(sorted(flashcards, key=lambda f: f.chapter_id or 0)):
+        dealt[index % groups].append(flashcard)
+    return [group for group in dealt if group]
+
+def build_local_quiz(db: Session, flashcards: List[db_models.Flashcard], question_types: List[str]) -> dict:
+    """Quiz built from flashcard answers by the distractor engine (no LLM call)"""
+    start_time = time.time()
+    questions = distractor_engine.build_quiz(db, flashcards, question_types)
+    return {
+        "quiz": questions,
+        "summary": "",
+        "metadata": {"provider_used": "local", "generation_time": time.time() - start_time, "cache_hit": False}
+    }
+
+async def stream_quiz_from_flashcards_service(
+    db: Session, request: schemas.QuizRequest, chapter_id: int = None, principal: Optional[Principal] = None
+):
+    """
+    Streaming variant of generate_quiz_from_flashcards_service.
+    
+    Selection and pool lookups happen before this returns; the returned async
+    generator yields pooled questions immediately and then streams live ones.
+    """
+    selected_flashcards = select_flashcards_for_quiz(db, request, chapter_id)
+    
+    pooled_questions = []
+    if request.mode == "local":
+        local_quiz = build_local_quiz(db, selected_flashcards, request.question_types)
+        pooled_questions, selected_flashcards = local_quiz["quiz"], []
+    elif config.QUESTION_POOL_ENABLED:
+        pooled_questions, selected_flashcards = question_pool.assemble(db, selected_flashcards, request.question_types)
+    
+    generation_request = flashcard_generation_request(
+        selected_flashcards, request.question_types, uses_compact_generation(request)
+    )
+    db.close()
+    # Only live generation needs provider capacity; pooled and local questions never queue
+    slot = await acquire_generation_slot(principal if selected_flashcards else None)
+    
+    async def events():
+        for question in pooled_questions:
+            yield {"event": "question", "data": question}
+        
+        if not selected_flashcards:
+            yield {"event": "summary", "data": ""}
+            provider = "local" if request.mode == "local" else "question_pool"
+            yield {"event": "done", "data": {"provider_used": provider, "generation_time": 0.0, "pool_hits": len(pooled_questions)}}
+            return
+        
+        try:
+            async for event in ai_generator.stream_quiz(generation_request):
+                if event["event"] == "done" and pooled_questions:
+                    event["data"]["pool_hits"] = len(pooled_questions)
+                yield event
+        except AllProvidersFailedError as e:
+            # Raised only before any live question was sent, so nothing is duplicated
+            fallback_quiz = build_local_quiz(db, selected_flashcards, request.question_types)
+            logger.warning(f"{e}; streaming {len(fallback_quiz['quiz'])} locally built questions")
+            for question in fallback_quiz["quiz"]:
+                yield {"event": "question", "data": question}
+            yield {"event": "summary", "data": ""}
+            yield {"event": "done", "data": {**fallback_quiz["metadata"], "fallback": True, "pool_hits": len(pooled_questions)}}
+    
+    return _release_when_done(events(), slot)
+
+
+async def explain_question(
+    db: Session, request: schemas.ExplanationRequest, principal: Optional[Principal] = None
+) -> dict:
+    """
+    Explanation for one quiz question, generated on first request and cached.
+    
+    Cached explanations are served at once; only a provider call waits for a
+    generation slot, so a shed request gets the same 429/503 as the quiz routes.
+    """
+    question, answer, options = request.question, request.answer, request.options
+    if request.flashcard_id is not None:
+        flashcard = get_flashcard(db, request.flashcard_id)
+        if flashcard is None:
+            raise HTTPException(status_code=404, detail="Flashcard not found")
+        # True/false and reworded variants all explain the card's own question and answer; the
+        # caller's options belong to one variant, so they are dropped along with its wording
+        question, answer, options = flashcard.question, flashcard.answer, None
+    db.close()
+    
+    cached = await explanation_service.lookup(question, answer, options, request.flashcard_id)
+    if cached is not None:
+        return cached
+    
+    slot = await acquire_generation_slot(principal)
+    try:
+        # Looks the cache up again: another request may have filled it while this one queued
+        return await explanation_service.explain(question, answer, options, request.flashcard_id)
+    except AllProvidersFailedError as e:
+        raise HTTPException(status_code=503, detail=f"Explanation unavailable: {e}")
+    finally:
+        slot.release()
 
 
 #
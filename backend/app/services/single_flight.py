@@ -0,0 +1,82 @@
+"""
+Single-flight coalescing of identical in-flight async calls.
+
+Concurrent callers that use the same key await one shared task instead of each
+starting their own. The shared task is only cancelled when every caller waiting
+on it has been cancelled; errors propagate to all callers.
+"""
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls by key"""
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.abandoned = 0
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """
+        Run factory() once per key among concurrent callers.
+
+        Returns:
+            (result, shared) where shared is True if this caller joined an existing flight
+        """
+        flight = self._flights.get(key)
+        shared = flight is not None
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(factory()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            # shield: one caller being cancelled must not cancel the shared work
+            result = await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            flight.waiters -= 1
+            if flight.task.done() and flight.task.cancelled():
+                # The shared task itself was cancelled, not this caller
+                raise RuntimeError(f"In-flight call for {key[:12]} was cancelled")
+            if flight.waiters == 0 and not flight.task.done():
+                self.abandoned += 1
+                flight.task.cancel()
+            raise
+        except BaseException:
+            flight.waiters -= 1
+            raise
+
+        flight.waiters -= 1
+        return result, shared
+
+    def _forget(self, key: str, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        # Retrieve the error when nobody is left waiting, so asyncio does not log it as unhandled
+        if flight.waiters == 0 and not flight.task.cancelled() and flight.task.exception() is not None:
+            logger.debug(f"Single-flight call for {key[:12]} failed with no waiters: {flight.task.exception()}")
+
+    def stats(self) -> Dict:
+        return {
+            "in_flight": len(self._flights),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "abandoned": self.abandoned,
+        }
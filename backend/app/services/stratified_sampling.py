@@ -0,0 +1,101 @@
+"""
+Stratified flashcard sampling in a single SQL statement.
+
+The alternative to flashcard_sampler's in-memory index
+(FLASHCARD_SAMPLING=sql): every quiz selection is one query that returns the
+chosen Flashcard rows directly, which suits deployments with many workers,
+where per-process indexes would each need rebuilding after writes.
+
+Each card gets a random sort key; ROW_NUMBER() OVER (PARTITION BY chapter_id
+ORDER BY key) ranks the cards within their chapter, and ordering by "rank <=
+per_chapter" first, then by key, puts per_chapter cards of every chapter ahead
+of the random top-up:
+
+    SELECT flashcards.* FROM flashcards JOIN (
+        SELECT id, CASE WHEN chapter_rank <= :per_chapter THEN 0 ELSE 1 END AS stratum, sort_key
+        FROM (
+            SELECT id, sort_key,
+                   row_number() OVER (PARTITION BY chapter_id ORDER BY sort_key) AS chapter_rank
+            FROM (SELECT id, chapter_id, -ln(u) / weight AS sort_key FROM flashcards ...) AS keyed
+        ) AS ranked
+        ORDER BY stratum, sort_key LIMIT :count
+    ) AS chosen ON flashcards.id = chosen.id
+    ORDER BY stratum, sort_key
+
+-ln(u) / weight with u uniform in (0, 1] is an exponential key, so taking the
+smallest keys is weighted sampling without replacement (Efraimidis-Spirakis);
+with equal weights it is a uniform sample. u is random() normally, or a hash of
+the card id and seed, which gives the same selection on every backend for the
+same seed and bank.
+
+Works on Postgres and SQLite (window functions need SQLite 3.25+; SQLite
+builds without math functions get ln() registered in db/database.py).
+"""
+import logging
+from typing import List, Optional
+
+from sqlalchemy import BigInteger, case, cast, func, literal, select
+from sqlalchemy.orm import Session
+
+from ..db import models as db_models
+
+logger = logging.getLogger(__name__)
+
+# Hash of (id, seed) -> [0, _PRIME): a multiplicative step then two squaring
+# rounds mod a 31-bit prime, small enough to never overflow a 64-bit integer
+_PRIME = 2147483647
+_MULTIPLIER = 48271
+
+
+def _uniform(dialect: str, seed: Optional[int]):
+    """SQL expression for a per-row uniform value in (0, 1]"""
+    flashcards = db_models.Flashcard.__table__
+    if seed is not None:
+        offset = literal(seed % _PRIME, BigInteger)
+        mixed = (cast(flashcards.c.id, BigInteger) * _MULTIPLIER + offset) % _PRIME
+        mixed = (mixed * mixed + offset) % _PRIME
+        mixed = (mixed * mixed + _MULTIPLIER) % _PRIME
+        return (mixed + 1) / float(_PRIME)
+    if dialect == "postgresql":
+        return 1.0 - func.random()
+    # SQLite random() is a signed 64-bit integer
+    return (func.abs(func.random() % _PRIME) + 1) / float(_PRIME)
+
+
+def stratified_sample(
+    db: Session, count: int, per_chapter: int = 0, chapter_id: Optional[int] = None, seed: Optional[int] = None
+) -> List[db_models.Flashcard]:
+    """
+    Up to count weighted-random chapter-assigned cards, per_chapter of them from
+    every chapter (when count allows) and the rest from any chapter, in one query.
+
+    per_chapter=0 is a plain weighted sample; chapter_id restricts it to one chapter.
+    """
+    flashcards = db_models.Flashcard.__table__
+    sort_key = -func.ln(_uniform(db.get_bind().dialect.name, seed)) / flashcards.c.weight
+    keyed = select(flashcards.c.id, flashcards.c.chapter_id, sort_key.label("sort_key")).where(
+        flashcards.c.chapter_id.isnot(None)
+    )
+    if chapter_id is not None:
+        keyed = keyed.where(flashcards.c.chapter_id == chapter_id)
+    keyed = keyed.subquery("keyed")
+    ranked = select(
+        keyed.c.id,
+        keyed.c.sort_key,
+        func.row_number().over(partition_by=keyed.c.chapter_id, order_by=keyed.c.sort_key).label("chapter_rank"),
+    ).subquery("ranked")
+
+    # Pick the IDs before joining, so only the chosen rows are read from flashcards
+    stratum = case((ranked.c.chapter_rank <= per_chapter, 0), else_=1).label("stratum")
+    chosen = (
+        select(ranked.c.id, stratum, ranked.c.sort_key)
+        .order_by(stratum, ranked.c.sort_key)
+        .limit(count)
+        .subquery("chosen")
+    )
+    statement = (
+        select(db_models.Flashcard)
+        .join(chosen, db_models.Flashcard.id == chosen.c.id)
+        .order_by(chosen.c.stratum, chosen.c.sort_key)
+    )
+    return list(db.execute(statement).scalars().all())
@@ -16,11 +16,138 @@ STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET")
 GROQ_API_KEY = os.environ.get("GROQ_API_KEY", "")
 DEEPSEEK_API_KEY = os.environ.get("DEEPSEEK_API_KEY")
 
-# AI Service URLs
-DEEPSEEK_API_URL = "https://api.deepseek.com/chat/completions"
+# AI Service URLs and models
+GROQ_API_URL = os.getenv("GROQ_API_URL", "https://api.groq.com/openai/v1/chat/completions")
+GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
+DEEPSEEK_API_URL = os.getenv("DEEPSEEK_API_URL", "https://api.deepseek.com/chat/completions")
+DEEPSEEK_MODEL = os.getenv("DEEPSEEK_MODEL", "deepseek-chat")
+
+# AI HTTP client settings (one keep-alive pool per provider)
+AI_CONNECT_TIMEOUT = float(os.getenv("AI_CONNECT_TIMEOUT", "5"))
+AI_REQUEST_TIMEOUT = float(os.getenv("AI_REQUEST_TIMEOUT", "60"))
+AI_MAX_CONNECTIONS = int(os.getenv("AI_MAX_CONNECTIONS", "20"))
+AI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("AI_MAX_KEEPALIVE_CONNECTIONS", "10"))
+AI_KEEPALIVE_EXPIRY = float(os.getenv("AI_KEEPALIVE_EXPIRY", "30"))
+# Maximum number of in-flight completions per provider
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "8"))
+
+# Token prices for cost estimates on /api/admin/metrics: "prompt,completion" USD per million tokens
+def _prices(name: str, default: str):
+    prompt, completion = os.getenv(name, default).split(",")
+    return float(prompt), float(completion)
+
+AI_TOKEN_PRICES = {
+    "groq": _prices("GROQ_PRICE_PER_MTOK", "0.59,0.79"),
+    "deepseek": _prices("DEEPSEEK_PRICE_PER_MTOK", "0.27,1.10"),
+}
 
 # Clerk Webhook Secret
 CLERK_WEBHOOK_SECRET = os.getenv("CLERK_WEBHOOK_SECRET")
 
 # Frontend URL for redirects
-FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost") 
\ No newline at end of file
+FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost") 
+
+# Quiz generation cache
+QUIZ_CACHE_ENABLED = os.getenv("QUIZ_CACHE_ENABLED", "true").lower() == "true"
+QUIZ_CACHE_TTL_SECONDS = int(os.getenv("QUIZ_CACHE_TTL_SECONDS", "86400"))
+QUIZ_CACHE_MAX_ENTRIES = int(os.getenv("QUIZ_CACHE_MAX_ENTRIES", "512"))
+QUIZ_CACHE_MAX_BYTES = int(os.getenv("QUIZ_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+# Also store generations in the generated_quiz_cache table (shared across workers)
+QUIZ_CACHE_PERSISTENT = os.getenv("QUIZ_CACHE_PERSISTENT", "false").lower() == "true"
+# Share one provider call between concurrent identical generation requests
+AI_SINGLE_FLIGHT_ENABLED = os.getenv("AI_SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+
+# Admission scheduler in front of AI generation: priority by payment tier, explicit 429/503 shedding
+GENERATION_SCHEDULER_ENABLED = os.getenv("GENERATION_SCHEDULER_ENABLED", "true").lower() == "true"
+GENERATION_MAX_ACTIVE = int(os.getenv("GENERATION_MAX_ACTIVE", str(AI_MAX_CONCURRENCY)))
+GENERATION_MAX_QUEUE = int(os.getenv("GENERATION_MAX_QUEUE", "64"))
+# Running plus queued generations allowed per user (guests are keyed by client IP)
+GENERATION_MAX_PER_USER = int(os.getenv("GENERATION_MAX_PER_USER", "2"))
+# Longest a request may wait for a slot before it is answered 503, per tier
+GENERATION_MAX_WAIT_PREMIUM = float(os.getenv("GENERATION_MAX_WAIT_PREMIUM", "30"))
+GENERATION_MAX_WAIT_FREE = float(os.getenv("GENERATION_MAX_WAIT_FREE", "15"))
+GENERATION_MAX_WAIT_GUEST = float(os.getenv("GENERATION_MAX_WAIT_GUEST", "8"))
+GENERATION_RETRY_AFTER_SECONDS = int(os.getenv("GENERATION_RETRY_AFTER_SECONDS", "5"))
+# Proxies (comma-separated addresses or CIDRs) whose X-Forwarded-For names the client that guests are
+# keyed by; Dockerfile.prod trusts the compose network Caddy forwards from
+TRUSTED_PROXIES = [p.strip() for p in os.getenv("TRUSTED_PROXIES", "127.0.0.1,::1").split(",") if p.strip()]
+
+# Asynchronous generation jobs (/api/jobs): in-process worker pool, results kept for a TTL
+GENERATION_JOB_WORKERS = int(os.getenv("GENERATION_JOB_WORKERS", "4"))
+GENERATION_JOB_QUEUE_SIZE = int(os.getenv("GENERATION_JOB_QUEUE_SIZE", "100"))
+GENERATION_JOB_TIMEOUT_SECONDS = float(os.getenv("GENERATION_JOB_TIMEOUT_SECONDS", "600"))
+GENERATION_JOB_TTL_SECONDS = int(os.getenv("GENERATION_JOB_TTL_SECONDS", "86400"))
+GENERATION_JOB_SWEEP_SECONDS = float(os.getenv("GENERATION_JOB_SWEEP_SECONDS", "600"))
+
+# Pre-generated question pool (stored in quizzes / quiz_questions)
+# Off by default: an empty pool would otherwise queue a refill generation for every card a quiz samples.
+# Fill it first with the build job (POST /api/question-pool/build) or app/scripts/pregenerate_quizzes.py
+QUESTION_POOL_ENABLED = os.getenv("QUESTION_POOL_ENABLED", "false").lower() == "true"
+QUESTION_POOL_VARIANTS_PER_CARD = int(os.getenv("QUESTION_POOL_VARIANTS_PER_CARD", "3"))
+# Cards with fewer variants than this are queued for refill when served
+QUESTION_POOL_REFILL_BELOW = int(os.getenv("QUESTION_POOL_REFILL_BELOW", "2"))
+# Most cards per minute that quiz requests may queue for refill; the rest wait for the next build
+QUESTION_POOL_REFILL_PER_MINUTE = int(os.getenv("QUESTION_POOL_REFILL_PER_MINUTE", "20"))
+# Variants older than this are regenerated by the background builder
+QUESTION_POOL_MAX_AGE_DAYS = int(os.getenv("QUESTION_POOL_MAX_AGE_DAYS", "30"))
+QUESTION_POOL_BUILD_CONCURRENCY = int(os.getenv("QUESTION_POOL_BUILD_CONCURRENCY", "2"))
+QUESTION_POOL_BUILD_ON_STARTUP = os.getenv("QUESTION_POOL_BUILD_ON_STARTUP", "false").lower() == "true"
+
+# Quiz assembly samples flashcard IDs from an in-memory index; rebuilt after local writes
+# and at least this often so other workers' writes show up
+FLASHCARD_INDEX_TTL_SECONDS = float(os.getenv("FLASHCARD_INDEX_TTL_SECONDS", "300"))
+# Same for the distractor engine's answer index
+DISTRACTOR_INDEX_TTL_SECONDS = float(os.getenv("DISTRACTOR_INDEX_TTL_SECONDS", "300"))
+# "index" (in-memory ID index) or "sql" (one stratified sampling query per quiz, no per-process state)
+FLASHCARD_SAMPLING = os.getenv("FLASHCARD_SAMPLING", "index")
+# Catalog endpoints read an in-memory snapshot, rebuilt after local writes and at least this often
+CATALOG_TTL_SECONDS = float(os.getenv("CATALOG_TTL_SECONDS", "300"))
+
+# Hedged requests: start the secondary provider if the primary is slower than its recent p95
+AI_HEDGING_ENABLED = os.getenv("AI_HEDGING_ENABLED", "false").lower() == "true"
+AI_HEDGE_PERCENTILE = float(os.getenv("AI_HEDGE_PERCENTILE", "95"))
+# Used until the primary has AI_HEDGE_MIN_SAMPLES latency samples
+AI_HEDGE_DEFAULT_DELAY = float(os.getenv("AI_HEDGE_DEFAULT_DELAY", "8"))
+AI_HEDGE_MIN_SAMPLES = int(os.getenv("AI_HEDGE_MIN_SAMPLES", "20"))
+AI_HEDGE_MIN_DELAY = float(os.getenv("AI_HEDGE_MIN_DELAY", "2"))
+AI_HEDGE_MAX_DELAY = float(os.getenv("AI_HEDGE_MAX_DELAY", "20"))
+# Number of recent latencies kept per provider
+AI_LATENCY_WINDOW = int(os.getenv("AI_LATENCY_WINDOW", "200"))
+
+# Per-provider circuit breaker (rolling window of call outcomes)
+AI_BREAKER_WINDOW_SECONDS = float(os.getenv("AI_BREAKER_WINDOW_SECONDS", "60"))
+AI_BREAKER_MIN_CALLS = int(os.getenv("AI_BREAKER_MIN_CALLS", "5"))
+AI_BREAKER_ERROR_RATE = float(os.getenv("AI_BREAKER_ERROR_RATE", "0.5"))
+AI_BREAKER_SLOW_CALL_SECONDS = float(os.getenv("AI_BREAKER_SLOW_CALL_SECONDS", "25"))
+AI_BREAKER_SLOW_RATE = float(os.getenv("AI_BREAKER_SLOW_RATE", "0.8"))
+AI_BREAKER_OPEN_SECONDS = float(os.getenv("AI_BREAKER_OPEN_SECONDS", "30"))
+AI_BREAKER_HALF_OPEN_PROBES = int(os.getenv("AI_BREAKER_HALF_OPEN_PROBES", "1"))
+
+# Large document (map-reduce) generation for /extract-text
+AI_CHUNK_TOKENS = int(os.getenv("AI_CHUNK_TOKENS", "3000"))
+AI_CHUNK_CONCURRENCY = int(os.getenv("AI_CHUNK_CONCURRENCY", "3"))
+AI_MAX_QUESTIONS_PER_CHUNK = int(os.getenv("AI_MAX_QUESTIONS_PER_CHUNK", "15"))
+AI_MAX_DOCUMENT_TOKENS = int(os.getenv("AI_MAX_DOCUMENT_TOKENS", "60000"))
+# "downsize" keeps an evenly spread subset of chunks; "reject" answers 413
+AI_OVERSIZE_POLICY = os.getenv("AI_OVERSIZE_POLICY", "downsize")
+
+# Targeted follow-up calls that regenerate only missing or invalid questions of a short response
+AI_REPAIR_ROUNDS = int(os.getenv("AI_REPAIR_ROUNDS", "2"))
+
+# Fan-out for large flashcard quizzes: split into concurrent sub-generations of about
+# AI_FANOUT_GROUP_SIZE questions, at most AI_FANOUT_MAX_GROUPS, fewer when provider slots are busy
+AI_FANOUT_ENABLED = os.getenv("AI_FANOUT_ENABLED", "true").lower() == "true"
+AI_FANOUT_MIN_QUESTIONS = int(os.getenv("AI_FANOUT_MIN_QUESTIONS", "10"))
+AI_FANOUT_GROUP_SIZE = int(os.getenv("AI_FANOUT_GROUP_SIZE", "5"))
+AI_FANOUT_MAX_GROUPS = int(os.getenv("AI_FANOUT_MAX_GROUPS", "4"))
+
+# Distractor-only generation for flashcard quizzes (QuizRequest mode "compact"); when true,
+# mode "ai" uses it as well
+AI_COMPACT_FLASHCARDS = os.getenv("AI_COMPACT_FLASHCARDS", "false").lower() == "true"
+
+# Generate quizzes without summary or explanations; /api/explanations fills them in on demand
+# and caches each one per flashcard (or per question and answer when there is no flashcard)
+AI_LAZY_EXPLANATIONS = os.getenv("AI_LAZY_EXPLANATIONS", "false").lower() == "true"
+EXPLANATION_CACHE_TTL_SECONDS = int(os.getenv("EXPLANATION_CACHE_TTL_SECONDS", str(30 * 86400)))
+EXPLANATION_CACHE_MAX_ENTRIES = int(os.getenv("EXPLANATION_CACHE_MAX_ENTRIES", "10000"))
+EXPLANATION_CACHE_MAX_BYTES = int(os.getenv("EXPLANATION_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
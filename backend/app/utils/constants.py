@@ -72,4 +72,7 @@ CHAPTER_CATEGORIES = {
     "economy": "Canadian Economy",
     "geography": "Canadian Regions",
     "regions": "Canadian Regions"
-}
\ No newline at end of file
+}
+
+# Title of the Quiz row that holds pre-generated question variants
+QUESTION_POOL_QUIZ_TITLE = "Question Pool"
@@ -0,0 +1,19 @@
+from typing import Optional
+
+from fastapi import Request, Response
+
+# Conditional GET: clients may keep responses but must revalidate them with If-None-Match
+REVALIDATE_HEADERS = {"Cache-Control": "no-cache"}
+
+def not_modified(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """
+    Set the ETag on response and return a 304 response if the request's
+    If-None-Match already names it; otherwise None and the handler carries on.
+    """
+    headers = {"ETag": etag, **REVALIDATE_HEADERS}
+    response.headers.update(headers)
+    candidates = [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]
+    # Weak comparison (RFC 9110): W/"x" and "x" match
+    if "*" in candidates or etag.removeprefix("W/") in {tag.removeprefix("W/") for tag in candidates}:
+        return Response(status_code=304, headers=headers)
+    return None
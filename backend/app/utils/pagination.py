@@ -0,0 +1,22 @@
+import base64
+import json
+from typing import Optional, Tuple
+
+# Keyset pagination cursors: the sort key of the last row on a page, as opaque
+# URL-safe base64 so clients pass them back without depending on the format
+
+def encode_cursor(key: Tuple) -> str:
+    """Cursor for the page after the row with this sort key"""
+    return base64.urlsafe_b64encode(json.dumps(list(key), separators=(",", ":")).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: Optional[str], size: int) -> Optional[Tuple]:
+    """The sort key in cursor, which must have size integer parts; ValueError if it is not one of ours"""
+    if not cursor:
+        return None
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(key, list) or len(key) != size or not all(isinstance(part, int) for part in key):
+        raise ValueError("Invalid cursor")
+    return tuple(key)
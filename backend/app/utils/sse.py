@@ -0,0 +1,21 @@
+import json
+from typing import AsyncIterator, Dict
+
+# Disable caching and proxy buffering so events reach the browser immediately
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+def format_sse(event: str, data) -> str:
+    """Format a single server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def sse_stream(events: AsyncIterator[Dict]) -> AsyncIterator[str]:
+    """
+    Turn {"event": ..., "data": ...} dicts into an SSE byte stream.
+    Errors raised mid-stream are reported as an "error" event since the HTTP
+    status has already been sent.
+    """
+    try:
+        async for event in events:
+            yield format_sse(event["event"], event["data"])
+    except Exception as e:
+        yield format_sse("error", {"detail": str(e)})
@@ -0,0 +1,4 @@
+"""
+Benchmarks for the AI Quiz Generation backend.
+Run them from the backend directory, e.g. python -m benchmarks.health_latency
+"""
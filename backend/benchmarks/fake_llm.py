@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+Local OpenAI-compatible stand-in for Groq/DeepSeek.
+
+Serves POST /v1/chat/completions (plain and "stream": true) so ai_service can be
+load-tested without spending provider quota.
+
+- replay: answers from a recordings file keyed by the request messages; on a
+  miss it synthesizes a quiz from the "Q:/A:" pairs or sentences in the prompt
+  (--on-miss synthesize), cycles through recordings (cycle) or returns 404 (error)
+- record: forwards each request to --upstream with --api-key and appends the
+  real completion to the recordings file
+- latency: fixed:S, uniform:A,B, normal:MEAN,SD or lognormal:MEDIAN,SIGMA, plus
+  an optional per-question cost and a per-completion-token cost (output speed)
+- faults: --error-rate returns one of --error-statuses; --malformed-rate damages
+  the JSON (trailing commas, stray quotes, truncation, prose wrapping, garbage);
+  --invalid-rate gives individual multiple-choice questions an answer that is
+  not among their options
+
+Run as a server, then point GROQ_API_URL / DEEPSEEK_API_URL at it:
+    python -m benchmarks.fake_llm --port 8100 --latency lognormal:1.5,0.4 --error-rate 0.02
+or mount create_app() in-process with httpx.ASGITransport (see load_generation.py).
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+_QA_PAIR = re.compile(r"Q:\s*(.+?)\s*\nA:\s*(.+?)\s*(?:\n|$)")
+_COUNT = re.compile(r"exactly (\d+)")
+_COMPACT_CARD = re.compile(r"^(\d+)\|(mc|t|f)\|(.+?)\|(.*)$", re.MULTILINE)
+_EXPLAIN = re.compile(r"QUESTION: (.+)\n(?:.*\n)*?CORRECT ANSWER: (.+)")
+_SENTENCE = re.compile(r"[^.!?\n]{25,200}[.!?]")
+
+
+@dataclass
+class FakeLLMConfig:
+    latency: str = "fixed:0.5"
+    per_question_latency: float = 0.0
+    per_token_latency: float = 0.0
+    error_rate: float = 0.0
+    error_statuses: List[int] = field(default_factory=lambda: [429, 500, 503])
+    malformed_rate: float = 0.0
+    invalid_rate: float = 0.0
+    recordings: Optional[str] = None
+    mode: str = "replay"  # replay | record
+    on_miss: str = "synthesize"  # synthesize | cycle | error
+    upstream: Optional[str] = None
+    api_key: Optional[str] = None
+    stream_chunk_chars: int = 40
+    seed: Optional[int] = None
+
+
+def parse_latency(spec: str):
+    """Return a sampler for a latency spec such as "lognormal:1.5,0.4" (seconds)"""
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",") if v]
+    if kind == "fixed":
+        return lambda rng: values[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        mu = math.log(values[0])
+        return lambda rng: rng.lognormvariate(mu, values[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def request_key(body: Dict) -> str:
+    return hashlib.sha256(json.dumps(body.get("messages", []), sort_keys=True).encode()).hexdigest()
+
+
+def synthesize_completion(messages: List[Dict], rng: random.Random) -> str:
+    """A plausible quiz JSON built from the prompt content"""
+    prompt = "\n".join(str(m.get("content", "")) for m in messages)
+    cards = _COMPACT_CARD.findall(prompt)
+    if cards:
+        return synthesize_compact(cards, rng)
+    explain = _EXPLAIN.search(prompt)
+    if explain:
+        question, answer = explain.groups()
+        return f"{answer.strip()} is correct: the study guide states it directly when covering \"{question.strip()}\""
+    # The lean quiz template asks for neither a summary nor explanations
+    lean = "Do not include a summary or explanations" in prompt
+    counts = _COUNT.findall(prompt)
+    count = int(counts[-1]) if counts else 5
+
+    pairs = _QA_PAIR.findall(prompt)
+    # Repair prompts list the questions already asked; skip those like a model would
+    _, _, asked = prompt.partition("ALREADY ASKED")
+    if asked:
+        asked_questions = set(re.findall(r"^- (.+)$", asked, re.MULTILINE))
+        pairs = [pair for pair in pairs if pair[0] not in asked_questions] or pairs
+    if not pairs:
+        content = prompt.rsplit("CONTENT TO ANALYZE:", 1)[-1]
+        pairs = [(f"Which statement appears in the text? ({i + 1})", s.strip())
+                 for i, s in enumerate(_SENTENCE.findall(content))]
+    if not pairs:
+        pairs = [("What is the capital of Canada?", "Ottawa")]
+
+    answers = [answer for _, answer in pairs]
+    quiz = []
+    for i in range(count):
+        question, answer = pairs[i % len(pairs)]
+        if i % 4 == 3:
+            quiz.append({
+                "question": f"True or false: {question} {answer}",
+                "type": "true_false",
+                "options": ["True", "False"],
+                "answer": "True",
+                "explanation": "Stated in the source material.",
+            })
+            if lean:
+                del quiz[-1]["explanation"]
+            continue
+        distractors = [a for a in answers if a != answer]
+        rng.shuffle(distractors)
+        filler = ["None of the above", "All of the above", "Not stated", "Unknown"]
+        options = [answer] + (distractors + filler)[:3]
+        quiz.append({
+            "question": question if i < len(pairs) else f"{question} (variant {i // len(pairs) + 1})",
+            "type": "multiple_choice",
+            "options": options,
+            "answer": answer,
+            "explanation": "Stated in the source material.",
+        })
+        if lean:
+            del quiz[-1]["explanation"]
+    if lean:
+        return json.dumps({"quiz": quiz}, indent=2)
+    return json.dumps({"summary": "Synthetic quiz generated by the local stand-in.", "quiz": quiz}, indent=2)
+
+
+def invalidate_answers(text: str, rate: float, rng: random.Random):
+    """Point some multiple-choice answers at text that is not an option; returns (text, count)"""
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return text, 0
+    invalid = 0
+    for question in data.get("quiz", []) if isinstance(data, dict) else []:
+        if isinstance(question, dict) and question.get("type") == "multiple_choice" and rng.random() < rate:
+            question["answer"] = f"{question.get('answer', '')} (see notes)"
+            invalid += 1
+    return (json.dumps(data, indent=2), invalid) if invalid else (text, 0)
+
+
+def synthesize_compact(cards: List[tuple], rng: random.Random) -> str:
+    """Distractor-only answer for the compact (id|kind|question|answer) prompt"""
+    answers = [answer for _, _, _, answer in cards]
+    items = []
+    for card_id, kind, question, answer in cards:
+        if kind == "mc":
+            distractors = [a for a in answers if a != answer]
+            rng.shuffle(distractors)
+            filler = ["None of the above", "Not stated", "Unknown"]
+            items.append({"id": int(card_id), "d": (distractors + filler)[:3]})
+        else:
+            shown = answer if kind == "t" else next((a for a in answers if a != answer), "Unknown")
+            items.append({"id": int(card_id), "s": f"{question.rstrip('?')}: {shown}."})
+    return json.dumps({"quiz": items}, separators=(",", ":"))
+
+
+def damage(text: str, rng: random.Random) -> str:
+    """Introduce one of the JSON defects LLMs produce"""
+    defect = rng.choice(["trailing_comma", "stray_quote", "truncate", "prose", "garbage"])
+    if defect == "trailing_comma":
+        return text.replace('"\n    }', '",\n    }', 1)
+    if defect == "stray_quote":
+        return text.replace('"question": "', '"question": "The "so-called" ', 1)
+    if defect == "truncate":
+        return text[:int(len(text) * rng.uniform(0.5, 0.95))]
+    if defect == "prose":
+        return f"Sure! Here is your quiz:\n```json\n{text}\n```\nHope this helps."
+    return "I'm sorry, I can't help with that request."
+
+
+class FakeLLM:
+    def __init__(self, config: FakeLLMConfig):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.sample_latency = parse_latency(config.latency)
+        self.recordings: Dict[str, Dict] = {}
+        self._cycle: List[str] = []
+        self.stats = {"requests": 0, "errors_injected": 0, "malformed_injected": 0, "invalid_injected": 0,
+                      "replayed": 0, "synthesized": 0, "recorded": 0}
+        if config.recordings and os.path.exists(config.recordings):
+            with open(config.recordings) as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        self.recordings[record["key"]] = record
+            self._cycle = list(self.recordings)
+
+    async def complete(self, body: Dict) -> Dict:
+        """Return {"status", "text", "usage"} for a chat completion request"""
+        self.stats["requests"] += 1
+        key = request_key(body)
+
+        if self.config.mode == "record":
+            return await self._record(key, body)
+
+        if self.rng.random() < self.config.error_rate:
+            self.stats["errors_injected"] += 1
+            await asyncio.sleep(self.sample_latency(self.rng) * 0.2)
+            return {"status": self.rng.choice(self.config.error_statuses), "text": "Injected failure", "usage": {}}
+
+        record = self.recordings.get(key)
+        if record is not None:
+            self.stats["replayed"] += 1
+            text, usage = record["text"], record.get("usage", {})
+        elif self.config.on_miss == "cycle" and self._cycle:
+            self.stats["replayed"] += 1
+            record = self.recordings[self._cycle[self.stats["requests"] % len(self._cycle)]]
+            text, usage = record["text"], record.get("usage", {})
+        elif self.config.on_miss == "error":
+            return {"status": 404, "text": "No recording for this request", "usage": {}}
+        else:
+            self.stats["synthesized"] += 1
+            text = synthesize_completion(body.get("messages", []), self.rng)
+            prompt_chars = sum(len(str(m.get("content", ""))) for m in body.get("messages", []))
+            usage = {"prompt_tokens": prompt_chars // 4, "completion_tokens": len(text) // 4}
+
+        if self.config.invalid_rate:
+            text, invalid = invalidate_answers(text, self.config.invalid_rate, self.rng)
+            self.stats["invalid_injected"] += invalid
+
+        if self.rng.random() < self.config.malformed_rate:
+            self.stats["malformed_injected"] += 1
+            text = damage(text, self.rng)
+
+        counts = _COUNT.findall(" ".join(str(m.get("content", "")) for m in body.get("messages", [])))
+        question_count = int(counts[-1]) if counts else 0
+        latency = self.sample_latency(self.rng) + self.config.per_question_latency * question_count
+        latency += self.config.per_token_latency * (usage.get("completion_tokens") or len(text) // 4)
+        return {"status": 200, "text": text, "usage": usage, "latency": latency}
+
+    async def _record(self, key: str, body: Dict) -> Dict:
+        started = time.perf_counter()
+        async with httpx.AsyncClient(timeout=120) as client:
+            response = await client.post(
+                self.config.upstream,
+                json={**body, "stream": False},
+                headers={"Authorization": f"Bearer {self.config.api_key}"},
+            )
+        if response.status_code >= 400:
+            return {"status": response.status_code, "text": response.text, "usage": {}}
+        data = response.json()
+        record = {
+            "key": key,
+            "text": data["choices"][0]["message"]["content"],
+            "usage": data.get("usage") or {},
+            "latency": round(time.perf_counter() - started, 3),
+        }
+        self.recordings[key] = record
+        self.stats["recorded"] += 1
+        if self.config.recordings:
+            with open(self.config.recordings, "a") as f:
+                f.write(json.dumps(record) + "\n")
+        return {"status": 200, "text": record["text"], "usage": record["usage"], "latency": 0.0}
+
+
+def create_app(config: FakeLLMConfig) -> FastAPI:
+    fake = FakeLLM(config)
+    app = FastAPI(title="Fake LLM")
+    app.state.fake = fake
+
+    @app.post("/v1/chat/completions")
+    @app.post("/openai/v1/chat/completions")
+    @app.post("/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        result = await fake.complete(body)
+        if result["status"] != 200:
+            return JSONResponse({"error": {"message": result["text"]}}, status_code=result["status"])
+
+        model = body.get("model", "fake")
+        if not body.get("stream"):
+            await asyncio.sleep(result.get("latency", 0.0))
+            return {
+                "id": f"fake-{fake.stats['requests']}",
+                "object": "chat.completion",
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": result["text"]},
+                             "finish_reason": "stop"}],
+                "usage": result["usage"],
+            }
+
+        async def events():
+            text = result["text"]
+            size = max(1, config.stream_chunk_chars)
+            chunks = [text[i:i + size] for i in range(0, len(text), size)] or [""]
+            delay = result.get("latency", 0.0) / len(chunks)
+            for chunk in chunks:
+                await asyncio.sleep(delay)
+                payload = {"object": "chat.completion.chunk", "model": model,
+                           "choices": [{"index": 0, "delta": {"content": chunk}}]}
+                yield f"data: {json.dumps(payload)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    async def stats():
+        return fake.stats
+
+    return app
+
+
+def config_from_args(args) -> FakeLLMConfig:
+    return FakeLLMConfig(
+        latency=args.latency,
+        per_question_latency=args.per_question_latency,
+        per_token_latency=args.per_token_latency,
+        error_rate=args.error_rate,
+        error_statuses=[int(s) for s in args.error_statuses.split(",")],
+        malformed_rate=args.malformed_rate,
+        invalid_rate=args.invalid_rate,
+        recordings=args.recordings,
+        mode=args.mode,
+        on_miss=args.on_miss,
+        upstream=args.upstream,
+        api_key=args.api_key,
+        seed=args.seed,
+    )
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--latency", default="fixed:0.5", help="fixed:S | uniform:A,B | normal:MEAN,SD | lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--per-question-latency", type=float, default=0.0, help="Extra seconds per requested question")
+    parser.add_argument("--per-token-latency", type=float, default=0.0, help="Extra seconds per completion token")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-statuses", default="429,500,503")
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--invalid-rate", type=float, default=0.0, help="Chance per question of an answer matching no option")
+    parser.add_argument("--recordings", help="JSONL file of recorded completions")
+    parser.add_argument("--mode", choices=["replay", "record"], default="replay")
+    parser.add_argument("--on-miss", choices=["synthesize", "cycle", "error"], default="synthesize")
+    parser.add_argument("--upstream", help="Real chat completions URL used in record mode")
+    parser.add_argument("--api-key", default=os.getenv("GROQ_API_KEY"), help="Upstream API key (record mode)")
+    parser.add_argument("--seed", type=int)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    add_arguments(parser)
+    args = parser.parse_args()
+    if args.mode == "record" and not args.upstream:
+        parser.error("--upstream is required in record mode")
+
+    import uvicorn
+    uvicorn.run(create_app(config_from_args(args)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
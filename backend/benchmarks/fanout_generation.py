@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Single-shot vs fan-out latency for large flashcard quizzes.
+
+Sends 20-question mixed tests to /api/generate-quiz-from-flashcards through the
+real FastAPI app with the stand-in LLM mounted in-process. The stand-in charges
+--per-question seconds per generated question on top of --latency, which models
+a completion bound by output-token speed. Each mode is run at every
+--concurrency level (closed loop, like load_generation.py):
+
+- single: AI_FANOUT_ENABLED off, one completion per quiz
+- fanout:N: always N groups (AI_FANOUT_MAX_GROUPS=N, adaptive cap left on)
+- adaptive: the shipped defaults
+
+The quiz cache, question pool and admission scheduler are disabled so every
+request reaches the (fake) provider and none are shed.
+
+Run from the backend directory:
+    python -m benchmarks.fanout_generation
+    python -m benchmarks.fanout_generation --modes single adaptive --concurrency 1 8 --per-question 0.2
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.load_generation import percentile, seed_flashcards
+
+
+def configure_environment():
+    if not os.getenv("DATABASE_URL"):
+        path = os.path.join(tempfile.gettempdir(), "quiz_fanout_benchmark.db")
+        if os.path.exists(path):
+            os.remove(path)
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ["QUIZ_CACHE_ENABLED"] = "false"
+    os.environ["QUESTION_POOL_ENABLED"] = "false"
+    os.environ["GENERATION_SCHEDULER_ENABLED"] = "false"
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+    os.environ.setdefault("DEEPSEEK_API_KEY", "benchmark")
+
+
+def apply_mode(mode: str, defaults: Dict):
+    from app.utils import config
+
+    config.AI_FANOUT_ENABLED = defaults["AI_FANOUT_ENABLED"]
+    config.AI_FANOUT_MAX_GROUPS = defaults["AI_FANOUT_MAX_GROUPS"]
+    config.AI_FANOUT_GROUP_SIZE = defaults["AI_FANOUT_GROUP_SIZE"]
+    if mode == "single":
+        config.AI_FANOUT_ENABLED = False
+    elif mode.startswith("fanout:"):
+        groups = int(mode.split(":", 1)[1])
+        config.AI_FANOUT_ENABLED = True
+        config.AI_FANOUT_MAX_GROUPS = groups
+        config.AI_FANOUT_GROUP_SIZE = 1
+    elif mode != "adaptive":
+        raise ValueError(f"Unknown mode: {mode}")
+
+
+async def run_level(http: httpx.AsyncClient, mode: str, concurrency: int, duration: float) -> Dict:
+    latencies: List[float] = []
+    groups: List[int] = []
+    errors = 0
+    stop_at = time.perf_counter() + duration
+
+    async def user():
+        nonlocal errors
+        while time.perf_counter() < stop_at:
+            started = time.perf_counter()
+            response = await http.post(
+                "/api/generate-quiz-from-flashcards",
+                json={"count": 20, "question_types": ["multiple_choice", "true_false"]},
+            )
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                errors += 1
+                continue
+            groups.append(response.json()["quiz"]["metadata"].get("fanout", 1))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "mean_groups": round(sum(groups) / len(groups), 2) if groups else 0,
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50) or 0, 1),
+        "p95_ms": round(percentile(latencies, 95) or 0, 1),
+    }
+
+
+async def run(args) -> List[Dict]:
+    from app.main import app
+    from app.services.ai_providers import provider_clients
+    from app.utils import config
+    from benchmarks.fake_llm import FakeLLMConfig, create_app
+
+    fake_app = create_app(FakeLLMConfig(latency=args.latency, per_question_latency=args.per_question, seed=args.seed))
+    for client in provider_clients.values():
+        client.api_url = "http://fake-llm/v1/chat/completions"
+        client.transport = httpx.ASGITransport(app=fake_app)
+    seed_flashcards(args.flashcards)
+
+    defaults = {name: getattr(config, name) for name in ("AI_FANOUT_ENABLED", "AI_FANOUT_MAX_GROUPS", "AI_FANOUT_GROUP_SIZE")}
+    results = []
+    # The auth dependency prints debug output for every request; keep it out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=300) as http:
+            for concurrency in args.concurrency:
+                for mode in args.modes:
+                    apply_mode(mode, defaults)
+                    result = await run_level(http, mode, concurrency, args.duration)
+                    results.append(result)
+                    print(f"  {mode} c={concurrency}: {result['requests']} requests, p50 {result['p50_ms']}ms",
+                          file=sys.stderr)
+    return results
+
+
+def print_results(results: List[Dict]):
+    single = {r["concurrency"]: r["p50_ms"] for r in results if r["mode"] == "single"}
+    print(f"{'mode':<10} {'conc':>4} {'reqs':>5} {'err':>4} {'groups':>6} {'rps':>7} {'p50 ms':>9} {'p95 ms':>9} {'vs single':>9}")
+    for r in results:
+        base = single.get(r["concurrency"])
+        speedup = f"{base / r['p50_ms']:.2f}x" if base and r["p50_ms"] else "-"
+        print(f"{r['mode']:<10} {r['concurrency']:>4} {r['requests']:>5} {r['errors']:>4} {r['mean_groups']:>6} "
+              f"{r['throughput_rps']:>7.2f} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {speedup:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=["single", "fanout:2", "fanout:4", "adaptive"])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per mode and concurrency level")
+    parser.add_argument("--latency", default="lognormal:0.4,0.2", help="Stand-in latency before the first token")
+    parser.add_argument("--per-question", type=float, default=0.15, help="Stand-in seconds per generated question")
+    parser.add_argument("--flashcards", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    configure_environment()
+    import logging
+    logging.basicConfig(level=os.getenv("BENCHMARK_LOG_LEVEL", "WARNING"))
+    logging.getLogger().setLevel(os.getenv("BENCHMARK_LOG_LEVEL", "WARNING"))
+
+    results = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_results(results)
+
+
+if __name__ == "__main__":
+    main()
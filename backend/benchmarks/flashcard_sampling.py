@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Premium mixed-test flashcard selection on large synthetic banks.
+
+Draws the 20-question "2 per chapter, then top up" selection repeatedly from
+banks of --sizes cards spread over the 10 chapters and reports per-draw
+latency for:
+
+- legacy: the original selection, one full-chapter load per chapter plus a
+  NOT IN fill-up query, random.sample in Python
+- index: flashcard_sampler with a warm in-memory ID index (the cold build is
+  reported separately as index_build_ms)
+- sql: stratified_sampling, one window-function query per draw
+- sql-seeded: the same with a reproducible seed (hash keys instead of random())
+
+--weighted gives every card a random weight in [0.5, 2]. Uses SQLite in a
+temporary file unless DATABASE_URL points at another database (e.g. Postgres);
+the flashcards table is emptied before each bank size.
+
+Run from the backend directory:
+    python -m benchmarks.flashcard_sampling
+    DATABASE_URL=postgresql://localhost/quiz_bench python -m benchmarks.flashcard_sampling --sizes 100000
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from typing import Dict, List
+
+from benchmarks.load_generation import FACTS, percentile
+
+STRATEGIES = ["legacy", "index", "sql", "sql-seeded"]
+
+
+def configure_environment():
+    if not os.getenv("DATABASE_URL"):
+        path = os.path.join(tempfile.gettempdir(), "quiz_sampling_benchmark.db")
+        if os.path.exists(path):
+            os.remove(path)
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+
+
+def seed_bank(size: int, weighted: bool) -> List[int]:
+    """Replace the flashcards with size synthetic cards; returns the chapter ids"""
+    from sqlalchemy import delete, insert
+
+    from app.db import database, models
+    from app.services.chapter_service import initialize_chapters
+
+    models.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    try:
+        chapter_ids = list(initialize_chapters(db).values())
+        db.execute(delete(models.QuizQuestion))
+        db.execute(delete(models.Flashcard))
+        rng = random.Random(1)
+        batch = []
+        for i in range(size):
+            question, answer = FACTS[i % len(FACTS)]
+            batch.append({
+                "question": f"{question} ({i})",
+                "answer": answer,
+                "chapter_id": rng.choice(chapter_ids),
+                "weight": rng.uniform(0.5, 2.0) if weighted else 1.0,
+            })
+            if len(batch) == 5000:
+                db.execute(insert(models.Flashcard), batch)
+                batch = []
+        if batch:
+            db.execute(insert(models.Flashcard), batch)
+        db.commit()
+        return chapter_ids
+    finally:
+        db.close()
+
+
+def legacy_select(db, count: int = 20, per_chapter: int = 2):
+    """The pre-index selection, kept here as the baseline"""
+    from app.db import models
+    from app.services.chapter_service import get_all_chapters
+
+    selected = []
+    for chapter in get_all_chapters(db):
+        chapter_flashcards = db.query(models.Flashcard).filter(models.Flashcard.chapter_id == chapter.id).all()
+        if chapter_flashcards:
+            selected.extend(random.sample(chapter_flashcards, min(len(chapter_flashcards), per_chapter)))
+    if len(selected) < count:
+        selected_ids = {f.id for f in selected}
+        remaining = db.query(models.Flashcard).filter(
+            models.Flashcard.chapter_id.isnot(None), ~models.Flashcard.id.in_(selected_ids)
+        ).all()
+        selected.extend(random.sample(remaining, min(len(remaining), count - len(selected))))
+    return selected[:count]
+
+
+def run_strategy(strategy: str, draws: int) -> Dict:
+    from app.db import database
+    from app.services.flashcard_sampler import flashcard_sampler
+    from app.services.stratified_sampling import stratified_sample
+
+    latencies: List[float] = []
+    min_per_chapter: List[int] = []
+    result: Dict = {"strategy": strategy}
+    if strategy == "index":
+        db = database.SessionLocal()
+        flashcard_sampler.invalidate()
+        started = time.perf_counter()
+        flashcard_sampler.ensure_index(db)
+        result["index_build_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        db.close()
+
+    for draw in range(draws):
+        # A fresh session per draw, like a request, so no rows come from the identity map
+        db = database.SessionLocal()
+        started = time.perf_counter()
+        if strategy == "legacy":
+            selected = legacy_select(db)
+        elif strategy == "index":
+            selected = flashcard_sampler.sample_balanced(db, 20, per_chapter=2)
+        elif strategy == "sql":
+            selected = stratified_sample(db, 20, per_chapter=2)
+        else:
+            selected = stratified_sample(db, 20, per_chapter=2, seed=draw)
+        latencies.append((time.perf_counter() - started) * 1000)
+        counts: Dict[int, int] = {}
+        for flashcard in selected:
+            counts[flashcard.chapter_id] = counts.get(flashcard.chapter_id, 0) + 1
+        min_per_chapter.append(min(counts.values()) if counts else 0)
+        db.close()
+
+    result.update({
+        "draws": draws,
+        "min_per_chapter": min(min_per_chapter),
+        "p50_ms": round(percentile(latencies, 50) or 0, 2),
+        "p95_ms": round(percentile(latencies, 95) or 0, 2),
+    })
+    return result
+
+
+def print_results(results: List[Dict]):
+    print(f"{'cards':>7} {'strategy':<11} {'draws':>5} {'min/ch':>6} {'p50 ms':>9} {'p95 ms':>9} {'build ms':>9}")
+    for r in results:
+        print(f"{r['cards']:>7} {r['strategy']:<11} {r['draws']:>5} {r['min_per_chapter']:>6} "
+              f"{r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r.get('index_build_ms', '-'):>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--strategies", nargs="+", default=STRATEGIES, choices=STRATEGIES)
+    parser.add_argument("--draws", type=int, default=50, help="Selections per strategy and bank size")
+    parser.add_argument("--legacy-draws", type=int, default=10, help="Fewer draws for the slow baseline")
+    parser.add_argument("--weighted", action="store_true", help="Random per-card weights in [0.5, 2]")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    configure_environment()
+    import logging
+    logging.basicConfig(level=os.getenv("BENCHMARK_LOG_LEVEL", "WARNING"))
+    logging.getLogger().setLevel(os.getenv("BENCHMARK_LOG_LEVEL", "WARNING"))
+
+    results = []
+    for size in args.sizes:
+        seed_bank(size, args.weighted)
+        for strategy in args.strategies:
+            draws = args.legacy_draws if strategy == "legacy" else args.draws
+            results.append({"cards": size, **run_strategy(strategy, draws)})
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_results(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Flashcard search latency on large synthetic banks.
+
+Seeds banks of --sizes cards (see flashcard_sampling.seed_bank) and runs a mix
+of one-word, multi-word and prefix queries through flashcard_search, with and
+without a chapter filter, for:
+
+- index: the indexed backend for the database (FTS5 on SQLite, the tsvector
+  GIN index on a migrated Postgres)
+- like: the unindexed LIKE fallback, roughly what filtering the bank without
+  an index costs
+
+Uses SQLite in a temporary file unless DATABASE_URL points at another database
+(e.g. a migrated Postgres); the flashcards table is emptied before each size.
+
+Run from the backend directory:
+    python -m benchmarks.flashcard_search
+    python -m benchmarks.flashcard_search --sizes 100000 --repeat 20
+"""
+import argparse
+import json
+import os
+import time
+from typing import Dict, List
+
+from benchmarks.flashcard_sampling import configure_environment, seed_bank
+from benchmarks.load_generation import percentile
+
+QUERIES = [
+    "prime minister",
+    "capital",
+    "confederation 1867",
+    "supreme court",
+    "parliament",
+    "provinc",
+    "charter rights",
+    "queen",
+    "no such words here",
+]
+
+
+def run_backend(backend: str, repeat: int, chapter_id: int) -> List[Dict]:
+    from app.db import database
+    from app.services.flashcard_search import LIKE, flashcard_search
+
+    indexed_backend = flashcard_search.backend
+    flashcard_search.backend = indexed_backend if backend == "index" else LIKE
+    results = []
+    try:
+        for filtered in (False, True):
+            latencies: List[float] = []
+            hits = 0
+            for _ in range(repeat):
+                for query in QUERIES:
+                    db = database.SessionLocal()
+                    started = time.perf_counter()
+                    found = flashcard_search.search(db, query, chapter_id if filtered else None, limit=20)
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    hits += len(found)
+                    db.close()
+            results.append({
+                "backend": f"{backend} ({flashcard_search.backend})",
+                "chapter_filter": filtered,
+                "queries": len(latencies),
+                "mean_hits": round(hits / len(latencies), 1),
+                "p50_ms": round(percentile(latencies, 50) or 0, 2),
+                "p95_ms": round(percentile(latencies, 95) or 0, 2),
+            })
+    finally:
+        flashcard_search.backend = indexed_backend
+    return results
+
+
+def print_results(results: List[Dict]):
+    print(f"{'cards':>7} {'backend':<14} {'chapter':>7} {'queries':>7} {'hits':>5} {'p50 ms':>9} {'p95 ms':>9}")
+    for r in results:
+        print(f"{r['cards']:>7} {r['backend']:<14} {str(r['chapter_filter']):>7} {r['queries']:>7} "
+              f"{r['mean_hits']:>5} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--backends", nargs="+", default=["index", "like"], choices=["index", "like"])
+    parser.add_argument("--repeat", type=int, default=5, help="Passes over the query mix per backend")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    configure_environment()
+    import logging
+    logging.basicConfig(level=os.getenv("BENCHMARK_LOG_LEVEL", "WARNING"))
+    logging.getLogger().setLevel(os.getenv("BENCHMARK_LOG_LEVEL", "WARNING"))
+
+    from app.db import database
+    from app.services.flashcard_search import flashcard_search
+
+    results = []
+    for size in args.sizes:
+        chapter_ids = seed_bank(size, weighted=False)
+        # After seeding so a new SQLite file gets its FTS5 table built; on later sizes the triggers kept it current
+        flashcard_search.ensure_index(database.engine)
+        for backend in args.backends:
+            results.extend({"cards": size, **r} for r in run_backend(backend, args.repeat, chapter_ids[0]))
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_results(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Measure /api/health latency while quiz generations are in flight.
+
+Provider calls are served by an in-process mock transport that sleeps for the
+configured LLM latency, so no real Groq/DeepSeek quota is used. With async
+provider clients the health check latency should stay flat no matter how many
+generations are running; --blocking emulates the old synchronous clients for
+comparison.
+
+Run from the backend directory:
+    python -m benchmarks.health_latency --generations 20 --llm-latency 2
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from app.routes import api
+from app.services.ai_service import ai_generator, QuizGenerationRequest
+from app.services.ai_providers import ChatResult
+
+SAMPLE_COMPLETION = {
+    "summary": "Ottawa is the capital of Canada.",
+    "quiz": [
+        {
+            "question": "What is the capital of Canada?",
+            "type": "multiple_choice",
+            "options": ["Ottawa", "Toronto", "Montreal", "Vancouver"],
+            "answer": "Ottawa",
+            "explanation": "Ottawa has been the capital since 1857."
+        }
+    ]
+}
+
+
+def build_mock_transport(llm_latency: float) -> httpx.MockTransport:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(llm_latency)
+        return httpx.Response(200, json={
+            "choices": [{"message": {"content": json.dumps(SAMPLE_COMPLETION)}}],
+            "usage": {"prompt_tokens": 900, "completion_tokens": 120},
+        })
+    return httpx.MockTransport(handler)
+
+
+def install_providers(llm_latency: float, blocking: bool):
+    client = ai_generator.groq_client
+    client.api_key = "benchmark"
+    client.transport = build_mock_transport(llm_latency)
+
+    if blocking:
+        # Emulate the previous synchronous SDK call made from async code
+        async def blocking_chat(*args, **kwargs):
+            time.sleep(llm_latency)
+            return ChatResult(text=json.dumps(SAMPLE_COMPLETION))
+        client.chat = blocking_chat
+
+
+async def probe_health(http: httpx.AsyncClient, duration: float, interval: float):
+    # Latency is measured from when the probe was due, so time spent waiting
+    # for a blocked event loop is counted instead of silently skipped.
+    latencies = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        due = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        response = await http.get("/api/health")
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - due) * 1000)
+    return latencies
+
+
+def summarize(label: str, latencies):
+    ordered = sorted(latencies)
+    p95 = ordered[int(len(ordered) * 0.95) - 1] if len(ordered) >= 20 else ordered[-1]
+    print(f"{label:<32} n={len(ordered):<5} p50={statistics.median(ordered):8.2f}ms "
+          f"p95={p95:8.2f}ms max={ordered[-1]:8.2f}ms")
+
+
+async def run(args):
+    install_providers(args.llm_latency, args.blocking)
+
+    app = FastAPI()
+    app.include_router(api.router, prefix="/api")
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        idle = await probe_health(http, args.probe_seconds, args.interval)
+
+        request = QuizGenerationRequest(
+            content="Q: What is the capital of Canada?\nA: Ottawa",
+            question_count=1,
+            question_types=["multiple_choice"],
+        )
+        started = time.perf_counter()
+        generations = [
+            asyncio.create_task(ai_generator.generate_quiz(request))
+            for _ in range(args.generations)
+        ]
+        loaded = await probe_health(http, args.probe_seconds, args.interval)
+        await asyncio.gather(*generations)
+        elapsed = time.perf_counter() - started
+
+    mode = "blocking" if args.blocking else "async"
+    print(f"Mode: {mode}, {args.generations} generations at {args.llm_latency}s each "
+          f"finished in {elapsed:.2f}s")
+    summarize("health (idle)", idle)
+    summarize("health (generations in flight)", loaded)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--generations", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=2.0)
+    parser.add_argument("--probe-seconds", type=float, default=1.5)
+    parser.add_argument("--interval", type=float, default=0.01)
+    parser.add_argument("--blocking", action="store_true", help="emulate the old synchronous provider clients")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Load benchmark for quiz generation against the local stand-in LLM.
+
+Drives /api/generate-quiz-from-flashcards and /api/extract-text through the
+real FastAPI app at increasing concurrency (closed loop: each virtual user
+sends its next request as soon as the previous one returns). Provider calls go
+to benchmarks.fake_llm, mounted in-process unless --llm-url points at a
+separately started stand-in. The quiz cache and question pool are disabled so
+every request reaches the (fake) provider.
+
+Each virtual user signs in as its own seeded user, and --premium-share of them
+have an active payment, so the admission scheduler sees a realistic tier mix.
+Shed requests (429/503) are counted separately from errors, and premium p95 is
+reported on its own since it is what the scheduler protects.
+
+Reports throughput, p50/p95/p99 latency, error count and event-loop lag per
+level. --save-baseline stores the results; --baseline compares a run with a
+stored one and flags regressions beyond --tolerance.
+
+Run from the backend directory:
+    python -m benchmarks.load_generation --concurrency 1 4 16 64 --duration 10
+    python -m benchmarks.load_generation --baseline benchmarks/baselines/load_generation.json
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "load_generation.json")
+
+FACTS = [
+    ("What is the capital of Canada?", "Ottawa"),
+    ("In what year did Confederation take place?", "1867"),
+    ("Who was the first Prime Minister of Canada?", "Sir John A. Macdonald"),
+    ("How many provinces does Canada have?", "10"),
+    ("Which province is officially bilingual?", "New Brunswick"),
+    ("What is the highest court in Canada?", "The Supreme Court of Canada"),
+    ("Who founded Quebec City?", "Samuel de Champlain"),
+    ("In what year was the Charter of Rights and Freedoms adopted?", "1982"),
+    ("What are the three levels of government?", "Federal, provincial and municipal"),
+    ("What is the largest city in Canada?", "Toronto"),
+]
+
+
+def configure_environment(args):
+    """Point the app at a scratch database and the stand-in before it is imported"""
+    if not os.getenv("DATABASE_URL"):
+        path = os.path.join(tempfile.gettempdir(), "quiz_load_benchmark.db")
+        if os.path.exists(path):
+            os.remove(path)
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ["QUIZ_CACHE_ENABLED"] = "true" if args.cache else "false"
+    os.environ["QUESTION_POOL_ENABLED"] = "false"
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+    os.environ.setdefault("DEEPSEEK_API_KEY", "benchmark")
+    if args.llm_url:
+        os.environ["GROQ_API_URL"] = args.llm_url
+        os.environ["DEEPSEEK_API_URL"] = args.llm_url
+
+
+def seed_flashcards(count: int) -> List[int]:
+    from app.db import database, models
+    from app.services.chapter_service import initialize_chapters
+
+    db = database.SessionLocal()
+    try:
+        chapter_ids = list(initialize_chapters(db).values())
+        existing = db.query(models.Flashcard).count()
+        rng = random.Random(1)
+        for i in range(existing, count):
+            question, answer = FACTS[i % len(FACTS)]
+            db.add(models.Flashcard(
+                question=f"{question} ({i})",
+                answer=answer,
+                chapter_id=rng.choice(chapter_ids),
+            ))
+        db.commit()
+        return chapter_ids
+    finally:
+        db.close()
+
+
+def seed_users(count: int, premium_share: float) -> List[Tuple[str, bool]]:
+    """(bearer token, is premium) per virtual user; the token is the user's clerk id"""
+    from app.db import database, models
+
+    db = database.SessionLocal()
+    try:
+        users = []
+        premium_count = round(count * premium_share)
+        for i in range(count):
+            clerk_id = f"bench-user-{i}"
+            user = db.query(models.User).filter(models.User.clerk_id == clerk_id).first()
+            if user is None:
+                user = models.User(clerk_id=clerk_id, email=f"{clerk_id}@example.com")
+                db.add(user)
+                db.flush()
+                if i < premium_count:
+                    db.add(models.Payment(
+                        user_id=user.id,
+                        stripe_payment_intent_id=f"bench_{i}",
+                        amount=3900,
+                        tier="1month",
+                        status="succeeded",
+                        expires_at=datetime.utcnow() + timedelta(days=30),
+                    ))
+            users.append((clerk_id, i < premium_count))
+        db.commit()
+        return users
+    finally:
+        db.close()
+
+
+def build_documents(count: int, paragraphs: int) -> List[bytes]:
+    """Distinct .docx uploads so concurrent requests are not coalesced"""
+    import docx
+
+    documents = []
+    for n in range(count):
+        document = docx.Document()
+        for p in range(paragraphs):
+            question, answer = FACTS[(n + p) % len(FACTS)]
+            document.add_paragraph(
+                f"Document {n}, section {p}. {question} The answer is {answer}. "
+                "Canadians have rights and responsibilities that come from their history."
+            )
+        buffer = io.BytesIO()
+        document.save(buffer)
+        documents.append(buffer.getvalue())
+    return documents
+
+
+def percentile(values: List[float], percent: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, int(round(percent / 100 * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+async def monitor_loop_lag(stop: asyncio.Event, interval: float = 0.01) -> List[float]:
+    """How late the loop wakes up from a short sleep, in milliseconds"""
+    lags = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, (time.perf_counter() - started - interval) * 1000))
+    return lags
+
+
+async def run_level(http: httpx.AsyncClient, endpoint: str, concurrency: int, duration: float, payloads) -> Dict:
+    latencies: List[float] = []
+    premium_latencies: List[float] = []
+    errors = 0
+    shed = 0
+    stop_at = time.perf_counter() + duration
+    counter = 0
+
+    async def send(token: str, premium: bool):
+        nonlocal counter
+        counter += 1
+        headers = {"Authorization": f"Bearer {token}"}
+        if endpoint == "flashcards":
+            # Premium users take the 20-question test, everyone else the short one
+            return await http.post(
+                "/api/generate-quiz-from-flashcards",
+                params={"chapter_id": random.choice(payloads["chapters"])},
+                json={"count": 20 if premium else 5, "question_types": ["multiple_choice", "true_false"]},
+                headers=headers,
+            )
+        document = payloads["documents"][counter % len(payloads["documents"])]
+        return await http.post(
+            "/api/extract-text",
+            files={"file": (f"bench_{counter}.docx", document,
+                            "application/vnd.openxmlformats-officedocument.wordprocessingml.document")},
+            headers=headers,
+        )
+
+    async def user(token: str, premium: bool):
+        nonlocal errors, shed
+        while time.perf_counter() < stop_at:
+            started = time.perf_counter()
+            try:
+                response = await send(token, premium)
+                status = response.status_code
+            except Exception:
+                status = None
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if status in (429, 503):
+                shed += 1
+                # Honour Retry-After briefly so shed users do not spin
+                await asyncio.sleep(min(1.0, float(response.headers.get("Retry-After", 1))))
+                continue
+            latencies.append(elapsed_ms)
+            if premium:
+                premium_latencies.append(elapsed_ms)
+            if status != 200:
+                errors += 1
+
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(monitor_loop_lag(stop))
+    started = time.perf_counter()
+    users = payloads["users"]
+    await asyncio.gather(*(user(*users[i % len(users)]) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    lags = await lag_task
+
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "shed": shed,
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50) or 0, 1),
+        "p95_ms": round(percentile(latencies, 95) or 0, 1),
+        "p99_ms": round(percentile(latencies, 99) or 0, 1),
+        "premium_p95_ms": round(percentile(premium_latencies, 95) or 0, 1),
+        "loop_lag_p50_ms": round(percentile(lags, 50) or 0, 2),
+        "loop_lag_p99_ms": round(percentile(lags, 99) or 0, 2),
+        "loop_lag_max_ms": round(max(lags) if lags else 0, 2),
+    }
+
+
+def print_results(results: List[Dict]):
+    print(f"{'endpoint':<11} {'conc':>4} {'reqs':>6} {'err':>4} {'shed':>5} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} "
+          f"{'p99 ms':>9} {'prem p95':>9} {'lag p99':>8} {'lag max':>8}")
+    for r in results:
+        print(f"{r['endpoint']:<11} {r['concurrency']:>4} {r['requests']:>6} {r['errors']:>4} {r.get('shed', 0):>5} "
+              f"{r['throughput_rps']:>8.2f} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f} "
+              f"{r.get('premium_p95_ms', 0):>9.1f} {r['loop_lag_p99_ms']:>8.2f} {r['loop_lag_max_ms']:>8.2f}")
+
+
+def compare_with_baseline(results: List[Dict], baseline: Dict, tolerance: float) -> List[str]:
+    """Regressions: p95 or loop lag up, or throughput down, by more than tolerance"""
+    previous = {(r["endpoint"], r["concurrency"]): r for r in baseline["results"]}
+    regressions = []
+    print(f"\nCompared with baseline from {baseline.get('created_at', '?')} (tolerance {tolerance:.0%}):")
+    for r in results:
+        base = previous.get((r["endpoint"], r["concurrency"]))
+        if base is None:
+            continue
+        checks = [
+            ("throughput_rps", r["throughput_rps"] < base["throughput_rps"] * (1 - tolerance)),
+            ("p95_ms", r["p95_ms"] > base["p95_ms"] * (1 + tolerance)),
+            ("p99_ms", r["p99_ms"] > base["p99_ms"] * (1 + tolerance)),
+            ("premium_p95_ms", base.get("premium_p95_ms", 0) > 0
+             and r["premium_p95_ms"] > base["premium_p95_ms"] * (1 + tolerance)),
+            # Lag is a few ms when healthy; allow an absolute 5ms of noise on top of the tolerance
+            ("loop_lag_p99_ms", r["loop_lag_p99_ms"] > base["loop_lag_p99_ms"] * (1 + tolerance) + 5),
+        ]
+        deltas = []
+        for metric, regressed in checks:
+            change = (r[metric] - base[metric]) / base[metric] * 100 if base.get(metric) else 0.0
+            deltas.append(f"{metric} {change:+.0f}%{' REGRESSION' if regressed else ''}")
+            if regressed:
+                regressions.append(f"{r['endpoint']} c={r['concurrency']} {metric}: {base[metric]} -> {r[metric]}")
+        print(f"  {r['endpoint']:<11} c={r['concurrency']:<4} " + ", ".join(deltas))
+    return regressions
+
+
+async def run(args) -> List[Dict]:
+    from app.main import app
+    from app.services.ai_providers import provider_clients
+    from benchmarks.fake_llm import FakeLLMConfig, create_app
+
+    if not args.llm_url:
+        fake_app = create_app(FakeLLMConfig(
+            latency=args.latency,
+            error_rate=args.error_rate,
+            malformed_rate=args.malformed_rate,
+            seed=args.seed,
+        ))
+        for client in provider_clients.values():
+            client.api_url = "http://fake-llm/v1/chat/completions"
+            client.transport = httpx.ASGITransport(app=fake_app)
+
+    random.seed(args.seed)
+    payloads = {
+        "chapters": seed_flashcards(args.flashcards),
+        "users": seed_users(max(args.concurrency), args.premium_share),
+        "documents": build_documents(max(64, max(args.concurrency) * 2), args.paragraphs)
+                     if "extract" in args.endpoints else [],
+    }
+
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    # The auth dependency prints debug output for every request; keep it out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as http:
+            for endpoint in args.endpoints:
+                for concurrency in args.concurrency:
+                    result = await run_level(http, endpoint, concurrency, args.duration, payloads)
+                    results.append(result)
+                    print(f"  {endpoint} c={concurrency}: {result['requests']} requests, {result['shed']} shed, "
+                          f"{result['throughput_rps']} rps, p95 {result['p95_ms']}ms", file=sys.stderr)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", nargs="+", choices=["flashcards", "extract"], default=["flashcards", "extract"])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per concurrency level")
+    parser.add_argument("--latency", default="lognormal:0.5,0.3", help="Stand-in latency distribution")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--llm-url", help="Use a separately started stand-in instead of the in-process one")
+    parser.add_argument("--flashcards", type=int, default=500)
+    parser.add_argument("--premium-share", type=float, default=0.25, help="Fraction of virtual users with an active payment")
+    parser.add_argument("--paragraphs", type=int, default=20, help="Paragraphs per uploaded document")
+    parser.add_argument("--cache", action="store_true", help="Keep the quiz cache enabled")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save-baseline", nargs="?", const=DEFAULT_BASELINE, help="Store results as a baseline")
+    parser.add_argument("--baseline", nargs="?", const=DEFAULT_BASELINE, help="Compare with a stored baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    configure_environment(args)
+    logging_level = os.getenv("BENCHMARK_LOG_LEVEL", "WARNING")
+    import logging
+    logging.basicConfig(level=logging_level)
+    logging.getLogger().setLevel(logging_level)
+
+    results = asyncio.run(run(args))
+    print_results(results)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save_baseline)), exist_ok=True)
+        with open(args.save_baseline, "w") as f:
+            json.dump({
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "settings": {
+                    "duration": args.duration, "latency": args.latency, "error_rate": args.error_rate,
+                    "malformed_rate": args.malformed_rate, "flashcards": args.flashcards,
+                    "paragraphs": args.paragraphs, "cache": args.cache, "seed": args.seed,
+                },
+                "results": results,
+            }, f, indent=2)
+        print(f"\nBaseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print("\nRegressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark of quiz response parsing on large completions.
+
+Compares the previous parser (greedy regex + _fix_json_issues, reproduced
+below) with parse_quiz_text on realistic completions of increasing size, both
+clean and with the defects LLMs commonly produce. Reports the time per parse
+and how many questions each parser recovers.
+
+Run from the backend directory:
+    python -m benchmarks.parser_bench --questions 25 50 100 200
+"""
+import argparse
+import json
+import random
+import re
+import timeit
+
+from app.services.quiz_parser import parse_quiz_text
+
+TOPICS = [
+    ("What is the capital of Canada?", "Ottawa", ["Toronto", "Montreal", "Vancouver"]),
+    ("In what year did Confederation take place?", "1867", ["1812", "1759", "1931"]),
+    ("Who is the head of state of Canada?", "The Sovereign", ["The Prime Minister", "The Governor General", "The Chief Justice"]),
+    ("Which province is the only officially bilingual province?", "New Brunswick", ["Quebec", "Ontario", "Manitoba"]),
+    ("What are the three parts of Parliament?", "The Sovereign, the Senate and the House of Commons",
+     ["The Senate, the Cabinet and the courts", "The House of Commons, the Premiers and the Senate", "The Governor General, the Cabinet and the Senate"]),
+]
+
+
+def legacy_parse(response_text: str) -> dict:
+    """The regex-based parser this benchmark replaced"""
+    json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
+    if not json_match:
+        raise ValueError("No JSON found in AI response")
+    json_text = json_match.group(0)
+    try:
+        return json.loads(json_text)
+    except json.JSONDecodeError as e:
+        json_text = re.sub(r',(\s*[}\]])', r'\1', json_text)
+        json_text = re.sub(r'(?<!\\)"(?=[^,}\]]*[,}\]])', r'\\"', json_text)
+        try:
+            return json.loads(json_text)
+        except json.JSONDecodeError:
+            raise ValueError(f"Invalid JSON in AI response: {e}")
+
+
+def build_questions(count: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    questions = []
+    for i in range(count):
+        text, answer, distractors = TOPICS[i % len(TOPICS)]
+        options = [answer] + distractors
+        rng.shuffle(options)
+        questions.append({
+            "question": f"{text} (variant {i})",
+            "type": "multiple_choice",
+            "options": options,
+            "answer": answer,
+            "explanation": "Canada's system of government is a parliamentary democracy and a "
+                           "constitutional monarchy; this fact appears in Discover Canada.",
+        })
+    return questions
+
+
+def render(questions: list, variant: str) -> str:
+    body = json.dumps({"summary": "Key facts about Canadian history and government.", "quiz": questions}, indent=2)
+    if variant == "clean":
+        return body
+    if variant == "fenced":
+        return f"Here is your quiz:\n```json\n{body}\n```\nLet me know if you need more questions."
+    if variant == "trailing_commas":
+        return body.replace('"\n    }', '",\n    }')
+    if variant == "stray_quotes":
+        # Every tenth question quotes a title without escaping it
+        lines = body.split("\n")
+        hits = 0
+        for index, line in enumerate(lines):
+            if '"question":' in line:
+                if hits % 10 == 0:
+                    lines[index] = line.replace("What is", 'What is "really"')
+                hits += 1
+        return "\n".join(lines)
+    if variant == "truncated":
+        # Completion cut off by the token limit in the middle of the last question
+        return body[:int(len(body) * 0.97)]
+    raise ValueError(variant)
+
+
+def count_legacy(text: str) -> int:
+    try:
+        return len(legacy_parse(text)["quiz"])
+    except ValueError:
+        return 0
+
+
+def bench(fn, text: str, repeat: int) -> float:
+    number = max(1, repeat)
+    return min(timeit.repeat(lambda: fn(text), number=number, repeat=5)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, nargs="+", default=[25, 50, 100, 200])
+    parser.add_argument("--repeat", type=int, default=20, help="Parses per timing sample")
+    args = parser.parse_args()
+
+    variants = ["clean", "fenced", "trailing_commas", "stray_quotes", "truncated"]
+    print(f"{'questions':>9} {'variant':<16} {'bytes':>8} {'legacy ms':>10} {'new ms':>8} {'legacy kept':>12} {'new kept':>9}")
+    for count in args.questions:
+        questions = build_questions(count)
+        for variant in variants:
+            text = render(questions, variant)
+            legacy_ms = bench(count_legacy, text, args.repeat) * 1000
+            new_ms = bench(parse_quiz_text, text, args.repeat) * 1000
+            print(
+                f"{count:>9} {variant:<16} {len(text):>8} {legacy_ms:>10.3f} {new_ms:>8.3f} "
+                f"{count_legacy(text):>12} {len(parse_quiz_text(text).questions):>9}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Shared fixtures. The app reads DATABASE_URL when it is first imported, so the
+test database (a throwaway SQLite file) is set here before any app import.
+"""
+import os
+import random
+import tempfile
+
+import pytest
+
+_DB_PATH = os.path.join(tempfile.mkdtemp(prefix="quiz_tests_"), "test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_DB_PATH}"
+
+from app.db import database, models  # noqa: E402
+from app.services.catalog import catalog  # noqa: E402
+from app.services.distractors import distractor_engine  # noqa: E402
+from app.services.flashcard_sampler import flashcard_sampler  # noqa: E402
+
+models.Base.metadata.create_all(bind=database.engine)
+
+
+@pytest.fixture
+def db():
+    """A session on an empty flashcard bank; the in-memory indexes are reset around each test"""
+    session = database.SessionLocal()
+    session.query(models.QuizQuestion).delete()
+    session.query(models.Flashcard).delete()
+    session.query(models.Chapter).delete()
+    session.commit()
+    flashcard_sampler.invalidate()
+    distractor_engine.invalidate()
+    catalog.bump()
+    try:
+        yield session
+    finally:
+        session.close()
+        flashcard_sampler.invalidate()
+        distractor_engine.invalidate()
+        catalog.bump()
+
+
+@pytest.fixture
+def bank(db):
+    """Three chapters of 30, 20 and 5 cards; returns {chapter_id: [flashcard ids]}"""
+    rng = random.Random(7)
+    cards = {}
+    for order, size in enumerate((30, 20, 5), start=1):
+        chapter = models.Chapter(title=f"Chapter {order}", order=order)
+        db.add(chapter)
+        db.flush()
+        flashcards = [
+            models.Flashcard(
+                question=f"Question {order}.{i}", answer=f"Answer {order}.{i}",
+                chapter_id=chapter.id, weight=rng.choice((0.5, 1.0, 2.0)),
+            )
+            for i in range(size)
+        ]
+        db.add_all(flashcards)
+        db.flush()
+        cards[chapter.id] = [flashcard.id for flashcard in flashcards]
+    db.commit()
+    catalog.bump()
+    return cards
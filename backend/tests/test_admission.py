@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+
+from app.services.admission import FREE, GUEST, PREMIUM, AdmissionRejected, GenerationScheduler, Principal
+
+
+def scheduler(max_active=1, max_queue=4, max_per_user=2, max_wait=1.0):
+    return GenerationScheduler(
+        max_active=max_active, max_queue=max_queue, max_per_user=max_per_user,
+        max_wait={PREMIUM: max_wait, FREE: max_wait, GUEST: max_wait},
+    )
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_per_key_cap_rejects_with_429():
+    async def scenario():
+        s = scheduler(max_active=4, max_per_user=2)
+        alice = Principal("user:1", FREE)
+        await s.acquire(alice)
+        await s.acquire(alice)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await s.acquire(alice)
+        assert rejected.value.status_code == 429
+        assert rejected.value.retry_after > 0
+        # Other keys are unaffected
+        await s.acquire(Principal("user:2", FREE))
+        assert s.active == 3
+        assert s.rejected == {"free:per_user": 1}
+
+    run(scenario())
+
+
+def test_per_key_cap_counts_queued_requests():
+    async def scenario():
+        s = scheduler(max_active=1, max_per_user=2)
+        holder = await s.acquire(Principal("user:9", FREE))
+        guest = Principal("ip:203.0.113.5", GUEST)
+        queued = [asyncio.create_task(s.acquire(guest)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await s.acquire(guest)
+        assert rejected.value.status_code == 429
+        holder.release()
+        (await queued[0]).release()
+        (await queued[1]).release()
+        assert s.active == 0
+
+    run(scenario())
+
+
+def test_queue_full_rejects_with_503():
+    async def scenario():
+        s = scheduler(max_active=1, max_queue=1)
+        holder = await s.acquire(Principal("user:1", FREE))
+        waiting = asyncio.create_task(s.acquire(Principal("user:2", FREE)))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await s.acquire(Principal("user:3", FREE))
+        assert rejected.value.status_code == 503
+        assert s.rejected == {"free:queue_full": 1}
+        holder.release()
+        (await waiting).release()
+
+    run(scenario())
+
+
+def test_full_queue_sheds_lower_priority_waiter():
+    async def scenario():
+        s = scheduler(max_active=1, max_queue=1)
+        holder = await s.acquire(Principal("user:1", FREE))
+        guest = asyncio.create_task(s.acquire(Principal("ip:198.51.100.7", GUEST)))
+        await asyncio.sleep(0)
+        premium = asyncio.create_task(s.acquire(Principal("user:2", PREMIUM)))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await guest
+        assert rejected.value.status_code == 503
+        holder.release()
+        (await premium).release()
+        assert s.rejected == {"guest:shed": 1}
+
+    run(scenario())
+
+
+def test_wait_timeout_rejects_with_503_and_frees_the_key():
+    async def scenario():
+        s = scheduler(max_active=1, max_per_user=1, max_wait=0.05)
+        holder = await s.acquire(Principal("user:1", FREE))
+        late = Principal("user:2", FREE)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await s.acquire(late)
+        assert rejected.value.status_code == 503
+        assert s.stats()["queued"]["free"] == 0
+        holder.release()
+        # The timed-out request no longer counts against its key
+        (await s.acquire(late)).release()
+
+    run(scenario())
+
+
+def test_release_serves_higher_priority_first_then_round_robin():
+    async def scenario():
+        s = scheduler(max_active=1, max_queue=8, max_per_user=4)
+        holder = await s.acquire(Principal("user:0", FREE))
+        order = []
+
+        async def request(key, priority):
+            slot = await s.acquire(Principal(key, priority))
+            order.append(key)
+            slot.release()
+
+        tasks = [
+            asyncio.create_task(request("user:a", FREE)),
+            asyncio.create_task(request("user:a", FREE)),
+            asyncio.create_task(request("user:b", FREE)),
+            asyncio.create_task(request("user:p", PREMIUM)),
+        ]
+        await asyncio.sleep(0)
+        holder.release()
+        await asyncio.gather(*tasks)
+        assert order == ["user:p", "user:a", "user:b", "user:a"]
+
+    run(scenario())
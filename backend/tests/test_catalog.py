@@ -0,0 +1,55 @@
+import asyncio
+
+import httpx
+
+from app.main import app
+from app.models import schemas
+from app.services import service
+
+
+def get(path, **headers):
+    async def request():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get(path, headers=headers)
+
+    return asyncio.run(request())
+
+
+def test_unchanged_catalog_answers_304(bank):
+    first = get("/api/chapters/")
+    etag = first.headers["ETag"]
+    assert first.status_code == 200
+    assert etag.startswith('W/"catalog-')
+
+    again = get("/api/chapters/", **{"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["ETag"] == etag
+
+
+def test_writes_change_the_etag(db, bank):
+    etag = get("/api/flashcards/").headers["ETag"]
+    chapter_id = next(iter(bank))
+    service.create_flashcard(db, schemas.FlashcardCreate(question="New?", answer="Yes", chapter_id=chapter_id))
+
+    response = get("/api/flashcards/", **{"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_unknown_chapter_is_404_even_with_a_matching_etag(bank):
+    etag = get("/api/chapters/").headers["ETag"]
+    missing = max(bank) + 1000
+
+    assert get(f"/api/chapters/{missing}", **{"If-None-Match": etag}).status_code == 404
+    assert get(f"/api/chapters/{missing}/flashcards", **{"If-None-Match": etag}).status_code == 404
+    assert get(f"/api/chapters/{min(bank)}", **{"If-None-Match": etag}).status_code == 304
+
+
+def test_chapter_stats_route_is_not_shadowed(bank):
+    response = get("/api/chapters/stats")
+
+    assert response.status_code == 200
+    counts = {chapter["id"]: chapter["flashcard_count"] for chapter in response.json()["chapters"]}
+    assert counts == {chapter_id: len(ids) for chapter_id, ids in bank.items()}
@@ -0,0 +1,84 @@
+import json
+import random
+
+import pytest
+
+from app.services.ai_service import AIQuizGenerator, compact_request
+
+CARDS = [
+    (1, "Capital of Canada?", "Ottawa"),
+    (2, "Year of Confederation?", "1867"),
+    (3, "Pipes | in text?", "A | B"),
+]
+
+
+@pytest.fixture
+def generator():
+    return AIQuizGenerator()
+
+
+def test_compact_request_lists_one_line_per_card():
+    request = compact_request(CARDS, ["multiple_choice"], random.Random(1))
+
+    assert request.question_count == 3
+    assert request.content.split("\n") == [
+        "1|mc|Capital of Canada?|Ottawa",
+        "2|mc|Year of Confederation?|1867",
+        "3|mc|Pipes / in text?|A / B",
+    ]
+    assert request.compact[3]["answer"] == "A | B"
+
+
+def test_true_false_only_requests_get_statement_kinds():
+    request = compact_request(CARDS, ["true_false"], random.Random(1))
+    assert {card["kind"] for card in request.compact.values()} <= {"t", "f"}
+
+
+def test_items_expand_into_full_questions(generator):
+    request = compact_request(CARDS[:2], ["multiple_choice", "true_false"], random.Random(1))
+    request.compact[1]["kind"] = "mc"
+    request.compact[2]["kind"] = "f"
+    completion = json.dumps({"quiz": [
+        {"id": 1, "d": ["A) Toronto", "Montreal", "ottawa", "Halifax", "Toronto"]},
+        {"id": 2, "s": "Confederation was in 1901."},
+    ]})
+
+    quiz = generator._parse_response(completion, request)["quiz"]
+
+    multiple_choice, true_false = quiz
+    assert multiple_choice["question"] == "Capital of Canada?"
+    assert multiple_choice["answer"] == "Ottawa"
+    assert sorted(multiple_choice["options"]) == ["Halifax", "Montreal", "Ottawa", "Toronto"]
+    assert multiple_choice["flashcard_id"] == 1
+    assert true_false == {
+        "question": "True or false: Confederation was in 1901.",
+        "type": "true_false",
+        "options": ["True", "False"],
+        "answer": "False",
+        "flashcard_id": 2,
+    }
+
+
+def test_unusable_items_are_rejected(generator):
+    request = compact_request(CARDS[:2], ["multiple_choice"], random.Random(1))
+    completion = json.dumps({"quiz": [
+        {"id": 1, "d": ["Toronto", "Montreal", "Halifax"]},
+        {"id": 1, "d": ["Regina", "Victoria"]},  # repeats card 1
+        {"id": 99, "d": ["x", "y"]},  # unknown card
+        {"id": 2, "d": ["1867", "1900"]},  # one usable distractor
+    ]})
+
+    parsed = generator._parse_response(completion, request)
+
+    assert [q["flashcard_id"] for q in parsed["quiz"]] == [1]
+    assert len(parsed["rejected"]) == 3
+
+
+def test_repair_requests_only_the_cards_without_a_question(generator):
+    request = compact_request(CARDS, ["multiple_choice"], random.Random(1))
+    repair = generator._repair_request(request, [{"flashcard_id": 2}])
+
+    assert repair.question_count == 2
+    assert sorted(repair.compact) == [1, 3]
+    assert [line.split("|", 1)[0] for line in repair.content.split("\n")] == ["1", "3"]
+    assert generator._build_messages(repair)[-1]["content"].count("|mc|") == 2
@@ -0,0 +1,128 @@
+import asyncio
+import random
+
+from app.db import models
+from app.models import schemas
+from app.services import distractors, service
+from app.services.ai_service import AllProvidersFailedError
+from app.services.distractors import DATE, NAME, NUMBER, PLACE, TEXT, DistractorEngine, classify_answer
+
+
+def add_cards(db, chapter_title, answers):
+    chapter = models.Chapter(title=chapter_title, order=1)
+    db.add(chapter)
+    db.flush()
+    cards = [models.Flashcard(question=f"Q {answer}?", answer=answer, chapter_id=chapter.id) for answer in answers]
+    db.add_all(cards)
+    db.commit()
+    return chapter, cards
+
+
+def test_answers_are_classified_by_type():
+    assert classify_answer("1867") == DATE
+    assert classify_answer("July 1, 1867") == DATE
+    assert classify_answer("10 provinces") == NUMBER
+    assert classify_answer("Ottawa") == PLACE
+    assert classify_answer("John A. Macdonald") == NAME
+    assert classify_answer("Peace, order and good government") == TEXT
+
+
+def test_distractors_match_the_answer_type_and_prefer_the_chapter(db):
+    chapter, _ = add_cards(db, "History", ["1867", "1759", "1982", "Ottawa", "Toronto"])
+    add_cards(db, "Geography", ["1605", "Halifax", "Regina", "Victoria"])
+    engine = DistractorEngine()
+    engine.ensure_index(db)
+
+    years = engine.distractors_for("1867", chapter.id, 3, random.Random(1))
+    assert sorted(years) == ["1605", "1759", "1982"]
+    places = engine.distractors_for("Ottawa", chapter.id, 3, random.Random(1))
+    assert "Toronto" in places
+    assert all(classify_answer(place) == PLACE for place in places)
+
+
+def test_missing_numbers_are_synthesised_in_the_answer_format(db):
+    chapter, _ = add_cards(db, "Numbers", ["10 provinces"])
+    engine = DistractorEngine()
+    engine.ensure_index(db)
+
+    options = engine.distractors_for("10 provinces", chapter.id, 3, random.Random(3))
+    assert len(options) == 3
+    assert all(option.endswith(" provinces") and option != "10 provinces" for option in options)
+
+
+def test_invalidate_rebuilds_the_index_on_next_use(db):
+    chapter, _ = add_cards(db, "History", ["1867", "1759"])
+    engine = DistractorEngine()
+    engine.ensure_index(db)
+    db.add(models.Flashcard(question="Q?", answer="1982", chapter_id=chapter.id))
+    db.commit()
+
+    engine.ensure_index(db)
+    assert "1982" not in engine.distractors_for("1867", chapter.id, 3, random.Random(0))
+    engine.invalidate()
+    assert engine.stats()["stale"]
+    engine.ensure_index(db)
+    assert "1982" in engine.distractors_for("1867", chapter.id, 3, random.Random(0))
+    assert not engine.stats()["stale"]
+
+
+def test_index_is_rebuilt_after_its_ttl(db, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(distractors.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(distractors.config, "DISTRACTOR_INDEX_TTL_SECONDS", 60)
+    chapter, _ = add_cards(db, "History", ["1867", "1759"])
+    engine = DistractorEngine()
+    engine.ensure_index(db)
+    # Written by another worker: no invalidate() reaches this engine
+    db.add(models.Flashcard(question="Q?", answer="1982", chapter_id=chapter.id))
+    db.commit()
+
+    now[0] += 59
+    engine.ensure_index(db)
+    assert "1982" not in engine.distractors_for("1867", chapter.id, 3, random.Random(0))
+    now[0] += 2
+    engine.ensure_index(db)
+    assert "1982" in engine.distractors_for("1867", chapter.id, 3, random.Random(0))
+
+
+def stream(db, monkeypatch, live_events):
+    monkeypatch.setattr(service.config, "QUESTION_POOL_ENABLED", False)
+    local_builds = []
+    build_local_quiz = service.build_local_quiz
+
+    def counting_build(*args, **kwargs):
+        local_builds.append(args[1])
+        return build_local_quiz(*args, **kwargs)
+
+    monkeypatch.setattr(service, "build_local_quiz", counting_build)
+    monkeypatch.setattr(service.ai_generator, "stream_quiz", lambda request: live_events())
+
+    async def collect():
+        events = await service.stream_quiz_from_flashcards_service(db, schemas.QuizRequest(count=3))
+        return [event async for event in events]
+
+    return asyncio.run(collect()), local_builds
+
+
+def test_stream_fallback_is_only_built_when_providers_fail(db, bank, monkeypatch):
+    async def live():
+        yield {"event": "question", "data": {"question": "Live"}}
+        yield {"event": "summary", "data": ""}
+        yield {"event": "done", "data": {"provider_used": "groq"}}
+
+    events, local_builds = stream(db, monkeypatch, live)
+    assert [event["event"] for event in events] == ["question", "summary", "done"]
+    assert local_builds == []
+
+
+def test_stream_falls_back_to_local_questions(db, bank, monkeypatch):
+    async def failing():
+        raise AllProvidersFailedError("All AI providers failed")
+        yield
+
+    events, local_builds = stream(db, monkeypatch, failing)
+    questions = [event["data"] for event in events if event["event"] == "question"]
+    assert len(questions) == 3
+    assert all(question["flashcard_id"] for question in questions)
+    assert events[-1]["data"]["fallback"] is True
+    assert len(local_builds) == 1
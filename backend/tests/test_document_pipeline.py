@@ -0,0 +1,74 @@
+import pytest
+from fastapi import HTTPException
+
+from app.services import document_pipeline, service
+from app.services.document_pipeline import (
+    DocumentTooLargeError, EmptyDocumentError, allocate_questions, plan_document, split_text
+)
+from app.services.prompt_templates import count_tokens
+
+PARAGRAPH = "The Canadian Shield covers much of the country. It is rich in minerals. " * 5
+
+
+def test_allocation_is_proportional_and_sums_to_total():
+    assert allocate_questions([100, 100, 200], 8, cap=10) == [2, 2, 4]
+    allocations = allocate_questions([3, 3, 3], 10, cap=10)
+    assert sum(allocations) == 10
+    assert sorted(allocations) == [3, 3, 4]
+
+
+def test_allocation_respects_the_cap_and_redistributes():
+    assert allocate_questions([1000, 10, 10], 12, cap=5) == [5, 4, 3]
+    # Never more than the chunks can hold
+    assert allocate_questions([1, 1], 50, cap=5) == [5, 5]
+
+
+def test_allocation_skips_empty_chunks():
+    assert allocate_questions([0, 10], 4, cap=10) == [0, 4]
+    assert allocate_questions([], 4, cap=10) == []
+
+
+def test_split_text_packs_paragraphs_under_the_budget():
+    text = "\n\n".join([PARAGRAPH] * 6)
+    budget = count_tokens(PARAGRAPH) * 2
+    chunks = split_text(text, budget)
+
+    assert len(chunks) == 3
+    assert all(count_tokens(chunk) <= budget for chunk in chunks)
+    assert sum(chunk.count("Canadian Shield") for chunk in chunks) == 30
+
+
+def test_split_text_breaks_oversized_paragraphs():
+    chunks = split_text("x" * 400, 20)
+    assert len(chunks) == 5
+    assert "".join(chunks) == "x" * 400
+
+
+@pytest.mark.parametrize("text", ["", "   \n\n  \t\n"])
+def test_empty_documents_are_rejected_before_generation(text):
+    with pytest.raises(EmptyDocumentError):
+        plan_document(text, 10)
+    with pytest.raises(HTTPException) as error:
+        service._plan_document_or_http_error(text, 10)
+    assert error.value.status_code == 400
+
+
+def test_oversized_documents_are_downsized_or_rejected(monkeypatch):
+    monkeypatch.setattr(document_pipeline.config, "AI_CHUNK_TOKENS", count_tokens(PARAGRAPH))
+    monkeypatch.setattr(document_pipeline.config, "AI_MAX_DOCUMENT_TOKENS", count_tokens(PARAGRAPH) * 2)
+    monkeypatch.setattr(document_pipeline.config, "AI_MAX_QUESTIONS_PER_CHUNK", 3)
+    text = "\n\n".join([PARAGRAPH] * 6)
+
+    monkeypatch.setattr(document_pipeline.config, "AI_OVERSIZE_POLICY", "downsize")
+    plan = plan_document(text, 20)
+    assert len(plan.chunks) == 2
+    assert plan.dropped_chunks == 4
+    assert plan.question_count == 6
+    assert plan.downsized
+
+    monkeypatch.setattr(document_pipeline.config, "AI_OVERSIZE_POLICY", "reject")
+    with pytest.raises(DocumentTooLargeError):
+        plan_document(text, 20)
+    with pytest.raises(HTTPException) as error:
+        service._plan_document_or_http_error(text, 20)
+    assert error.value.status_code == 413
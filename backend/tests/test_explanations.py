@@ -0,0 +1,83 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.main import app
+from app.services import service
+from app.services.admission import FREE, GUEST, PREMIUM, GenerationScheduler
+from app.services.ai_service import ai_generator
+from app.services.explanations import ExplanationService
+
+BODY = {"question": "Capital of Canada?", "answer": "Ottawa", "options": ["Ottawa", "Toronto", "Halifax"]}
+
+
+def post(path, json):
+    async def request():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(path, json=json)
+
+    return asyncio.run(request())
+
+
+@pytest.fixture
+def explanations(monkeypatch):
+    fresh = ExplanationService()
+    monkeypatch.setattr(service, "explanation_service", fresh)
+    calls = []
+
+    async def explain(question, answer, options=None):
+        calls.append(question)
+        return f"Because {answer}.", "groq"
+
+    monkeypatch.setattr(ai_generator, "explain", explain)
+    fresh.calls = calls
+    return fresh
+
+
+def full_scheduler():
+    return GenerationScheduler(
+        max_active=0, max_queue=0, max_per_user=2, max_wait={PREMIUM: 1.0, FREE: 1.0, GUEST: 1.0}
+    )
+
+
+def test_cache_key_ignores_case_spacing_and_option_order():
+    explanations = ExplanationService()
+    key = explanations.cache_key("Capital of  Canada?", "Ottawa", options=["Ottawa", "Toronto"])
+
+    assert key == explanations.cache_key("capital of canada?", " ottawa", options=["toronto", "OTTAWA"])
+    assert key != explanations.cache_key("Capital of Canada?", "Ottawa", options=["Ottawa", "Halifax"])
+    assert key != explanations.cache_key("Capital of Canada?", "Ottawa")
+    assert key != explanations.cache_key("Capital of Canada?", "Ottawa", flashcard_id=1, options=["Ottawa", "Toronto"])
+
+
+def test_explanations_are_generated_once_then_cached(explanations):
+    first = post("/api/explanations", BODY)
+    second = post("/api/explanations", {**BODY, "options": list(reversed(BODY["options"]))})
+
+    assert first.status_code == second.status_code == 200
+    assert first.json() == {"explanation": "Because Ottawa.", "provider_used": "groq", "cached": False}
+    assert second.json()["cached"] is True
+    assert len(explanations.calls) == 1
+
+
+def test_flashcard_explanations_use_the_card(db, bank, explanations):
+    card_id = bank[min(bank)][0]
+    response = post("/api/explanations", {"question": "True or false: ...", "answer": "True", "flashcard_id": card_id})
+
+    assert response.status_code == 200
+    assert explanations.calls == ["Question 1.0"]
+    assert post("/api/explanations", {**BODY, "flashcard_id": 10 ** 9}).status_code == 404
+
+
+def test_generation_is_admitted_through_the_scheduler(explanations, monkeypatch):
+    post("/api/explanations", BODY)
+    monkeypatch.setattr(service, "generation_scheduler", full_scheduler())
+
+    # Cache hits never wait for a slot
+    assert post("/api/explanations", BODY).status_code == 200
+    shed = post("/api/explanations", {**BODY, "question": "Capital of Nunavut?", "answer": "Iqaluit"})
+    assert shed.status_code == 503
+    assert "Retry-After" in shed.headers
+    assert len(explanations.calls) == 1
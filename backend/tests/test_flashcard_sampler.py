@@ -0,0 +1,78 @@
+import random
+from collections import Counter
+
+import pytest
+from sqlalchemy import text
+
+from app.services.flashcard_sampler import flashcard_sampler
+
+
+def ids(flashcards):
+    return [flashcard.id for flashcard in flashcards]
+
+
+def per_chapter(flashcards):
+    return Counter(flashcard.chapter_id for flashcard in flashcards)
+
+
+def balanced(db, count, quota, seed):
+    return flashcard_sampler.sample_balanced(db, count, quota, rng=random.Random(seed))
+
+
+def test_same_seed_same_cards(db, bank):
+    first = ids(balanced(db, 12, 2, seed=42))
+    assert len(first) == len(set(first)) == 12
+    assert ids(balanced(db, 12, 2, seed=42)) == first
+    assert ids(balanced(db, 12, 2, seed=43)) != first
+
+
+def test_seed_survives_a_rebuild(db, bank):
+    first = ids(balanced(db, 12, 2, seed=5))
+    flashcard_sampler.invalidate()
+    assert ids(balanced(db, 12, 2, seed=5)) == first
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_every_chapter_gets_its_quota(db, bank, seed):
+    chosen = balanced(db, 10, 3, seed=seed)
+    counts = per_chapter(chosen)
+    assert len(chosen) == 10
+    assert set(counts) == set(bank)
+    assert all(counts[chapter_id] >= 3 for chapter_id in bank)
+
+
+def test_quota_is_capped_by_chapter_size(db, bank):
+    smallest = min(bank, key=lambda chapter_id: len(bank[chapter_id]))
+    chosen = balanced(db, 30, 8, seed=9)
+    counts = per_chapter(chosen)
+    assert len(chosen) == 30
+    assert counts[smallest] == len(bank[smallest])
+    assert all(counts[chapter_id] >= 8 for chapter_id in bank if chapter_id != smallest)
+
+
+def test_chapter_filter(db, bank):
+    chapter_id = next(iter(bank))
+    chosen = flashcard_sampler.sample(db, 7, chapter_id=chapter_id, rng=random.Random(1))
+    assert len(chosen) == 7
+    assert set(per_chapter(chosen)) == {chapter_id}
+
+
+def test_more_than_the_bank_returns_every_card(db, bank):
+    total = sum(len(cards) for cards in bank.values())
+    assert len(balanced(db, total + 10, 2, seed=1)) == total
+
+
+def test_deleted_rows_trigger_a_rebuild(db, bank):
+    chapter_id = next(iter(bank))
+    flashcard_sampler.ensure_index(db)
+    rebuilds = flashcard_sampler.rebuilds
+    # Deleted behind the index's back, as another worker would
+    db.execute(
+        text("DELETE FROM flashcards WHERE chapter_id = :chapter_id AND id % 2 = 0"), {"chapter_id": chapter_id}
+    )
+    db.commit()
+
+    chosen = flashcard_sampler.sample(db, 15, chapter_id=chapter_id, rng=random.Random(3))
+    assert flashcard_sampler.rebuilds > rebuilds
+    assert len(chosen) == 15
+    assert all(flashcard.id % 2 for flashcard in chosen)
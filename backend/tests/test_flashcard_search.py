@@ -0,0 +1,107 @@
+import pytest
+
+from app.db import database, models
+from app.services.flashcard_search import FTS5, LIKE, flashcard_search, fts5_query
+
+CARDS = [
+    ("Who is the head of state in Canada?", "The Sovereign, Queen or King of Canada"),
+    ("What is the capital of Canada?", "Ottawa"),
+    ("Which province has the most people?", "Ontario, the most populous province"),
+    ("When did Confederation happen?", "1867"),
+    ("What does 100% mean on the test?", "Every answer_is correct"),
+]
+
+
+@pytest.fixture(params=[FTS5, LIKE])
+def search(request, db):
+    """flashcard_search on a small bank, once per backend; returns (search, {question: card})"""
+    flashcard_search.ensure_index(database.engine)
+    assert flashcard_search.backend == FTS5, "these tests need SQLite with FTS5"
+    chapters = [models.Chapter(title="History", order=1), models.Chapter(title="Geography", order=2)]
+    db.add_all(chapters)
+    db.flush()
+    cards = {}
+    for i, (question, answer) in enumerate(CARDS):
+        card = models.Flashcard(question=question, answer=answer, chapter_id=chapters[i % 2].id)
+        db.add(card)
+        cards[question] = card
+    db.commit()
+    flashcard_search.backend = request.param
+    try:
+        yield (lambda query, **kwargs: flashcard_search.search(db, query, **kwargs)), cards
+    finally:
+        flashcard_search.backend = FTS5
+
+
+def questions(results):
+    return [card.question for card, _ in results]
+
+
+def test_fts5_query_quotes_words_and_prefixes_the_last():
+    assert fts5_query("prime minister") == '"prime" "minister"*'
+    assert fts5_query('NOT "capital" OR') == '"NOT" "capital" "OR"*'
+    assert fts5_query("  ?! ") == ""
+
+
+def test_matches_question_and_answer(search):
+    search, _ = search
+    assert questions(search("capital")) == ["What is the capital of Canada?"]
+    assert questions(search("ottawa")) == ["What is the capital of Canada?"]
+
+
+def test_question_matches_rank_above_answer_matches(search):
+    search, _ = search
+    results = search("province")
+    assert questions(results)[0] == "Which province has the most people?"
+    assert [relevance for _, relevance in results] == sorted((r for _, r in results), reverse=True)
+
+
+def test_chapter_filter_and_paging(search):
+    search, cards = search
+    chapter_id = cards["Who is the head of state in Canada?"].chapter_id
+    filtered = search("canada", chapter_id=chapter_id)
+    assert {card.chapter_id for card, _ in filtered} == {chapter_id}
+
+    everything = questions(search("canada", limit=10))
+    assert questions(search("canada", limit=1)) + questions(search("canada", limit=10, offset=1)) == everything
+
+
+def test_blank_query_finds_nothing(search):
+    search, _ = search
+    assert search("   ") == []
+
+
+def test_fts5_prefix_and_operator_safety(search):
+    search, _ = search
+    if flashcard_search.backend != FTS5:
+        pytest.skip("FTS5 only")
+    assert questions(search("confeder")) == ["When did Confederation happen?"]
+    # Porter stemming: "provinces" matches "province"
+    assert "Which province has the most people?" in questions(search("provinces"))
+    # FTS5 syntax in user input is searched as plain words instead of raising
+    assert questions(search('"capital (')) == questions(search("capital"))
+    assert questions(search("capital OR ottawa")) == []
+
+
+def test_like_escapes_wildcards(search):
+    search, _ = search
+    if flashcard_search.backend != LIKE:
+        pytest.skip("LIKE only")
+    assert questions(search("100%")) == ["What does 100% mean on the test?"]
+    assert questions(search("answer_is")) == ["What does 100% mean on the test?"]
+    assert search("answerXis") == []
+    assert questions(search("CONFEDERATION")) == ["When did Confederation happen?"]
+
+
+def test_index_follows_updates_and_deletes(search, db):
+    search, cards = search
+    card = cards["What is the capital of Canada?"]
+    card.answer = "Ottawa, on the Ottawa River"
+    card.question = "Name the national capital"
+    db.commit()
+    assert questions(search("river")) == ["Name the national capital"]
+    assert search("capital of canada") == []
+
+    db.delete(card)
+    db.commit()
+    assert search("river") == []
@@ -0,0 +1,142 @@
+import asyncio
+import time
+from datetime import datetime
+
+import pytest
+
+from app.db import models
+from app.services import generation_jobs as jobs_module
+from app.services.admission import AdmissionRejected, Slot
+from app.services.ai_service import AllProvidersFailedError
+from app.services.generation_jobs import DONE, FAILED, GenerationJobs, JobQueueFullError
+
+TEXT = "The Canadian Shield covers much of the country."
+
+
+def mc(question):
+    return {"question": question, "type": "multiple_choice", "options": ["A", "B"], "answer": "A"}
+
+
+@pytest.fixture
+def jobs(monkeypatch):
+    monkeypatch.setattr(jobs_module.file_utils, "extract_text", lambda path, ext: open(path).read())
+    return GenerationJobs()
+
+
+def stream_events(*events, error=None):
+    async def stream_from_plan(plan, question_types):
+        for event in events:
+            yield event
+        if error:
+            raise error
+
+    return stream_from_plan
+
+
+def run_job(jobs, text=TEXT):
+    """Submit a document, wait for it to finish; returns (job, events seen by a subscriber)"""
+    async def scenario():
+        job = jobs.submit("notes.txt", text.encode(), None, None)
+        seen = [entry async for entry in jobs.subscribe(job)]
+        await jobs.stop()
+        return job, seen
+
+    return asyncio.run(scenario())
+
+
+def test_job_runs_in_the_background_and_stores_its_quiz(jobs, monkeypatch):
+    monkeypatch.setattr(jobs_module.document_pipeline, "stream_from_plan", stream_events(
+        {"event": "question", "data": mc("Q1")},
+        {"event": "chunk", "data": {"done": 1, "total": 2}},
+        {"event": "question", "data": mc("Q2")},
+        {"event": "chunk", "data": {"done": 2, "total": 2}},
+        {"event": "summary", "data": "About the Shield"},
+        {"event": "done", "data": {"chunks": 2}},
+    ))
+    job, seen = run_job(jobs)
+
+    assert job.status == DONE
+    assert [entry["event"] for entry in seen] == ["uploaded", "extracted", "chunk", "chunk", DONE]
+    assert seen[3]["data"]["questions"] == 2
+    result = jobs.load_result(job)
+    assert result["extracted_text"] == TEXT
+    assert [q["question"] for q in result["quiz"]["quiz"]] == ["Q1", "Q2"]
+    assert result["quiz"]["summary"] == "About the Shield"
+    assert result["quiz"]["metadata"] == {"chunks": 2}
+
+
+def test_single_chunk_documents_still_report_progress(jobs, monkeypatch):
+    monkeypatch.setattr(jobs_module.document_pipeline, "stream_from_plan", stream_events(
+        {"event": "question", "data": mc("Q1")},
+    ))
+    job, seen = run_job(jobs)
+
+    assert [entry["event"] for entry in seen] == ["uploaded", "extracted", "chunk", DONE]
+    assert seen[2]["data"] == {"job_id": job.id, "done": 1, "total": 1, "failed": False, "questions": 1}
+
+
+def test_empty_documents_and_provider_failures_fail_the_job(jobs, monkeypatch):
+    job, seen = run_job(jobs, text="   ")
+    assert job.status == FAILED
+    assert seen[-1]["event"] == FAILED
+    assert jobs.load_result(job) is None
+
+    monkeypatch.setattr(jobs_module.document_pipeline, "stream_from_plan", stream_events(
+        error=AllProvidersFailedError("All AI providers failed")
+    ))
+    job, _ = run_job(jobs)
+    assert job.status == FAILED
+    assert job.error == "All AI providers failed"
+    assert jobs.failed == 2
+
+
+def test_shed_jobs_wait_instead_of_failing(jobs, monkeypatch):
+    class SheddingScheduler:
+        attempts = 0
+
+        async def acquire(self, principal):
+            self.attempts += 1
+            if self.attempts == 1:
+                raise AdmissionRejected(503, "at capacity", 0)
+            return Slot(None, None)
+
+    scheduler = SheddingScheduler()
+    monkeypatch.setattr(jobs_module, "generation_scheduler", scheduler)
+    monkeypatch.setattr(jobs_module.document_pipeline, "stream_from_plan", stream_events(
+        {"event": "question", "data": mc("Q1")},
+    ))
+    job, seen = run_job(jobs)
+
+    assert job.status == DONE
+    assert scheduler.attempts == 2
+    assert "waiting" in [entry["event"] for entry in seen]
+
+
+def test_full_queue_rejects_new_jobs(jobs, monkeypatch):
+    monkeypatch.setattr(jobs_module.config, "GENERATION_JOB_QUEUE_SIZE", 0)
+
+    async def scenario():
+        try:
+            with pytest.raises(JobQueueFullError):
+                jobs.submit("notes.txt", b"text", None, None)
+        finally:
+            await jobs.stop()
+
+    asyncio.run(scenario())
+
+
+def test_expired_jobs_and_results_are_swept(db, jobs, monkeypatch):
+    monkeypatch.setattr(jobs_module.document_pipeline, "stream_from_plan", stream_events(
+        {"event": "question", "data": mc("Q1")},
+    ))
+    job, _ = run_job(jobs)
+    job.expires_at = time.time() - 1
+    expired = {"expires_at": datetime(2000, 1, 1)}
+    db.query(models.Quiz).filter(models.Quiz.id == job.quiz_id).update(expired)
+    db.query(models.Document).filter(models.Document.id == job.document_id).update(expired)
+    db.commit()
+
+    assert jobs.sweep_expired() == 2
+    assert jobs.get(job.id) is None
+    assert db.get(models.Quiz, job.quiz_id) is None
+    assert db.query(models.QuizQuestion).filter(models.QuizQuestion.quiz_id == job.quiz_id).count() == 0
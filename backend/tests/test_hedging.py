@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+from app.services import ai_service
+from app.services.ai_service import (
+    AIProvider, AIQuizGenerator, AllProvidersFailedError, QuizGenerationRequest, QuizResponse
+)
+from app.services.provider_health import LatencyWindow, provider_latency
+
+GROQ, DEEPSEEK = AIProvider.GROQ, AIProvider.DEEPSEEK
+REQUEST = QuizGenerationRequest(content="Europe", question_count=1, question_types=["multiple_choice"])
+
+
+def generator_with(monkeypatch, behaviour, delay=0.05):
+    """behaviour: provider -> (seconds, error or None); records started and cancelled providers"""
+    generator = AIQuizGenerator()
+    generator.started, generator.cancelled = [], []
+    monkeypatch.setattr(generator, "_hedge_delay", lambda provider: delay)
+
+    async def generate(provider, request):
+        generator.started.append(provider)
+        seconds, error = behaviour[provider]
+        try:
+            await asyncio.sleep(seconds)
+        except asyncio.CancelledError:
+            generator.cancelled.append(provider)
+            raise
+        if error:
+            raise error
+        return QuizResponse(quiz=[], summary="", provider_used=provider.value, generation_time=seconds)
+
+    monkeypatch.setattr(generator, "_generate_with_provider", generate)
+    return generator
+
+
+def hedged(generator):
+    return asyncio.run(generator._generate_hedged(REQUEST, GROQ, DEEPSEEK))
+
+
+def test_fast_primary_is_not_hedged(monkeypatch):
+    generator = generator_with(monkeypatch, {GROQ: (0.0, None), DEEPSEEK: (0.0, None)})
+    response = hedged(generator)
+
+    assert response.provider_used == "groq"
+    assert response.metadata["hedged"] is False
+    assert generator.started == [GROQ]
+    assert generator.hedge_stats == {"eligible": 1, "hedged": 0, "secondary_wins": 0}
+
+
+def test_slow_primary_is_hedged_and_the_loser_cancelled(monkeypatch):
+    generator = generator_with(monkeypatch, {GROQ: (5.0, None), DEEPSEEK: (0.0, None)})
+    response = hedged(generator)
+
+    assert response.provider_used == "deepseek"
+    assert response.metadata["hedged"] is True
+    assert response.metadata["winning_provider"] == "deepseek"
+    assert generator.cancelled == [GROQ]
+    assert generator.hedge_stats == {"eligible": 1, "hedged": 1, "secondary_wins": 1}
+
+
+def test_hedged_primary_can_still_win(monkeypatch):
+    generator = generator_with(monkeypatch, {GROQ: (0.1, None), DEEPSEEK: (5.0, None)})
+    response = hedged(generator)
+
+    assert response.provider_used == "groq"
+    assert response.metadata["hedged"] is True
+    assert generator.cancelled == [DEEPSEEK]
+
+
+def test_failed_primary_falls_back_without_counting_a_hedge(monkeypatch):
+    generator = generator_with(monkeypatch, {GROQ: (0.0, ValueError("bad json")), DEEPSEEK: (0.0, None)})
+    response = hedged(generator)
+
+    assert response.provider_used == "deepseek"
+    assert response.metadata["hedged"] is False
+    assert generator.hedge_stats["hedged"] == 0
+
+
+def test_both_failing_raises(monkeypatch):
+    generator = generator_with(monkeypatch, {GROQ: (0.1, ValueError("a")), DEEPSEEK: (0.0, ValueError("b"))})
+    with pytest.raises(AllProvidersFailedError):
+        hedged(generator)
+
+
+def test_hedge_delay_follows_the_primarys_percentile_within_bounds(monkeypatch):
+    config = ai_service.config
+    monkeypatch.setattr(config, "AI_HEDGE_MIN_SAMPLES", 3)
+    monkeypatch.setattr(config, "AI_HEDGE_DEFAULT_DELAY", 8)
+    monkeypatch.setattr(config, "AI_HEDGE_PERCENTILE", 95)
+    monkeypatch.setattr(config, "AI_HEDGE_MIN_DELAY", 2)
+    monkeypatch.setattr(config, "AI_HEDGE_MAX_DELAY", 20)
+    monkeypatch.setitem(provider_latency, "groq", LatencyWindow(10))
+    generator = AIQuizGenerator()
+
+    assert generator._hedge_delay(GROQ) == 8
+    for seconds in (3, 4, 5):
+        provider_latency["groq"].record(seconds)
+    assert generator._hedge_delay(GROQ) == 5
+    provider_latency["groq"].record(60)
+    assert generator._hedge_delay(GROQ) == 20
@@ -0,0 +1,73 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.main import app
+from app.utils.pagination import decode_cursor, encode_cursor
+
+
+def get(path, **params):
+    async def request():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get(path, params=params)
+
+    return asyncio.run(request())
+
+
+@pytest.mark.parametrize("key", [(1,), (12, 345), (0, 2 ** 40)])
+def test_cursor_round_trip(key):
+    cursor = encode_cursor(key)
+    assert "=" not in cursor
+    assert decode_cursor(cursor, len(key)) == key
+
+
+def test_no_cursor_is_the_first_page():
+    assert decode_cursor(None, 1) is None
+    assert decode_cursor("", 2) is None
+
+
+@pytest.mark.parametrize("cursor, size", [
+    ("not base64!", 1),
+    (encode_cursor((1, 2)), 1),  # wrong number of parts
+    (encode_cursor((1,)), 2),
+    ("eyJhIjoxfQ", 1),  # {"a":1}
+    (encode_cursor(("1",)), 1),  # parts must be integers
+])
+def test_bad_cursor_is_rejected(cursor, size):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, size)
+
+
+@pytest.mark.parametrize("path", ["/api/flashcards/", "/api/flashcards/search"])
+def test_bad_cursor_answers_400(db, bank, path):
+    response = get(path, cursor="garbage", q="question")
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_chapter_listing_rejects_a_global_cursor(db, bank):
+    chapter_id = next(iter(bank))
+    response = get(f"/api/chapters/{chapter_id}/flashcards", cursor=encode_cursor((5,)))
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("chapter_filter", [False, True])
+def test_cursor_pages_cover_the_listing_once(db, bank, chapter_filter):
+    chapter_id = next(iter(bank))
+    params = {"limit": 7}
+    if chapter_filter:
+        params["chapter_id"] = chapter_id
+    expected = sorted(bank[chapter_id] if chapter_filter else [i for cards in bank.values() for i in cards])
+
+    seen = []
+    cursor = None
+    while True:
+        response = get("/api/flashcards/", **params, **({"cursor": cursor} if cursor else {}))
+        assert response.status_code == 200
+        seen.extend(card["id"] for card in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert seen == expected
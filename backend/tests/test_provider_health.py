@@ -0,0 +1,99 @@
+import pytest
+
+from app.services import provider_health
+from app.services.provider_health import CircuitBreaker, LatencyWindow, provider_breakers, rank_providers
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(provider_health.time, "monotonic", lambda: now[0])
+    config = provider_health.config
+    monkeypatch.setattr(config, "AI_BREAKER_WINDOW_SECONDS", 60)
+    monkeypatch.setattr(config, "AI_BREAKER_MIN_CALLS", 4)
+    monkeypatch.setattr(config, "AI_BREAKER_ERROR_RATE", 0.5)
+    monkeypatch.setattr(config, "AI_BREAKER_SLOW_CALL_SECONDS", 10)
+    monkeypatch.setattr(config, "AI_BREAKER_SLOW_RATE", 0.8)
+    monkeypatch.setattr(config, "AI_BREAKER_OPEN_SECONDS", 30)
+    monkeypatch.setattr(config, "AI_BREAKER_HALF_OPEN_PROBES", 1)
+    return now
+
+
+def test_latency_percentiles_use_the_nearest_rank():
+    window = LatencyWindow(size=5)
+    assert window.percentile(95) is None
+    for seconds in (1, 2, 3, 4, 5, 6):
+        window.record(seconds)
+
+    assert len(window) == 5
+    assert window.percentile(50) == 4
+    assert window.percentile(95) == 6
+
+
+def test_breaker_waits_for_enough_calls_then_opens_on_errors(clock):
+    breaker = CircuitBreaker("groq")
+    for _ in range(3):
+        breaker.record_failure(1.0, "boom")
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.record_success(1.0)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+    assert breaker.snapshot()["last_error"] == "boom"
+
+
+def test_breaker_opens_on_slow_calls(clock):
+    breaker = CircuitBreaker("groq")
+    for _ in range(4):
+        breaker.record_success(12.0)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_old_outcomes_leave_the_window(clock):
+    breaker = CircuitBreaker("groq")
+    for _ in range(3):
+        breaker.record_failure(1.0)
+    clock[0] += 61
+    breaker.record_failure(1.0)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.snapshot()["calls_in_window"] == 1
+
+
+def test_half_open_allows_one_probe_and_closes_on_success(clock):
+    breaker = CircuitBreaker("groq")
+    for _ in range(4):
+        breaker.record_failure(1.0)
+    clock[0] += 30
+
+    assert breaker.allow_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow_request()
+    breaker.record_success(1.0)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow_request()
+
+
+def test_failed_or_abandoned_probes(clock):
+    breaker = CircuitBreaker("groq")
+    for _ in range(4):
+        breaker.record_failure(1.0)
+    clock[0] += 30
+
+    assert breaker.allow_request()
+    breaker.release()
+    assert breaker.allow_request()
+    breaker.record_failure(1.0, "still down")
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.times_opened == 2
+
+
+def test_ranking_drops_open_circuits_and_prefers_healthy_providers(clock, monkeypatch):
+    monkeypatch.setitem(provider_breakers, "groq", CircuitBreaker("groq"))
+    monkeypatch.setitem(provider_breakers, "deepseek", CircuitBreaker("deepseek"))
+    provider_breakers["groq"].record_failure(1.0)
+    provider_breakers["groq"].record_success(1.0)
+    assert rank_providers(["groq", "deepseek"]) == ["deepseek", "groq"]
+
+    for _ in range(4):
+        provider_breakers["deepseek"].record_failure(1.0)
+    assert rank_providers(["groq", "deepseek"]) == ["groq"]
@@ -0,0 +1,127 @@
+import asyncio
+import dataclasses
+
+import pytest
+
+from app.db import models
+from app.models import schemas
+from app.services import ai_service, question_pool as question_pool_module, service
+from app.services.ai_service import AIQuizGenerator, QuizGenerationRequest, QuizResponse
+from app.services.question_pool import QuestionPool
+from app.services.quiz_cache import quiz_cache
+from app.utils.constants import QUESTION_POOL_QUIZ_TITLE
+
+
+@pytest.fixture
+def pool(db, monkeypatch):
+    """A fresh pool (the service module's instance) with no pool quiz in the database"""
+    db.query(models.Quiz).filter(models.Quiz.title == QUESTION_POOL_QUIZ_TITLE).delete()
+    db.commit()
+    fresh = QuestionPool()
+    monkeypatch.setattr(service, "question_pool", fresh)
+    monkeypatch.setattr(question_pool_module.config, "QUESTION_POOL_ENABLED", True)
+    return fresh
+
+
+def pool_quizzes(db):
+    return db.query(models.Quiz).filter(models.Quiz.title == QUESTION_POOL_QUIZ_TITLE).count()
+
+
+def variant(question, answer="A"):
+    return {"question": question, "type": "multiple_choice", "options": [answer, "B", "C"], "answer": answer}
+
+
+def test_assemble_serves_variants_and_reports_missing_cards(db, bank, pool, monkeypatch):
+    monkeypatch.setattr(question_pool_module.config, "QUESTION_POOL_REFILL_BELOW", 2)
+    refills = []
+    monkeypatch.setattr(pool, "schedule_refill", refills.extend)
+    cards = db.query(models.Flashcard).order_by(models.Flashcard.id).limit(3).all()
+    pool.store_variants(cards[0].id, [variant("V1"), variant("V2")])
+    pool.store_variants(cards[1].id, [variant("V3")])
+
+    questions, missing = pool.assemble(db, cards, ["multiple_choice"])
+
+    assert sorted(q["flashcard_id"] for q in questions) == [cards[0].id, cards[1].id]
+    assert missing == [cards[2]]
+    # Empty and thin cards are queued for refill
+    assert sorted(refills) == [cards[1].id, cards[2].id]
+
+
+def test_refills_are_rate_limited_per_minute(pool, monkeypatch):
+    monkeypatch.setattr(question_pool_module.config, "QUESTION_POOL_REFILL_PER_MINUTE", 3)
+    now = [1000.0]
+    monkeypatch.setattr(question_pool_module.time, "monotonic", lambda: now[0])
+
+    pool.schedule_refill([1, 2])
+    pool.schedule_refill([2, 3, 4, 5])
+    assert pool.stats()["pending_refill"] == 3
+    assert pool.refills_deferred == 2
+
+    now[0] += 60
+    pool.schedule_refill([4, 5])
+    assert pool.stats()["pending_refill"] == 5
+
+
+def test_invalidation_neither_creates_the_pool_quiz_nor_commits(db, bank, pool):
+    card_id = bank[next(iter(bank))][0]
+    service.update_flashcard(db, card_id, schemas.FlashcardUpdate(question="Edited", answer="Answer"))
+
+    assert pool_quizzes(db) == 0
+    assert pool._pool_quiz_id is None
+
+    pool.store_variants(card_id, [variant("V1")])
+    pool.invalidate_flashcard(db, card_id)
+    db.rollback()
+    assert db.query(models.QuizQuestion).filter(models.QuizQuestion.flashcard_id == card_id).count() == 1
+
+    service.update_flashcard(db, card_id, schemas.FlashcardUpdate(question="Edited again", answer="Answer"))
+    assert db.query(models.QuizQuestion).filter(models.QuizQuestion.flashcard_id == card_id).count() == 0
+
+
+def test_invalidation_is_skipped_while_the_pool_is_off(db, bank, pool, monkeypatch):
+    card_id = bank[next(iter(bank))][0]
+    pool.store_variants(card_id, [variant("V1")])
+    monkeypatch.setattr(question_pool_module.config, "QUESTION_POOL_ENABLED", False)
+
+    service.update_flashcard(db, card_id, schemas.FlashcardUpdate(question="Edited", answer="Answer"))
+    assert db.query(models.QuizQuestion).filter(models.QuizQuestion.flashcard_id == card_id).count() == 1
+
+
+def test_replacing_build_bypasses_the_quiz_cache(db, bank, pool, monkeypatch):
+    requests = []
+
+    async def generate_quiz(request):
+        requests.append(request)
+        return QuizResponse(quiz=[variant(f"V{len(requests)}")], summary="", provider_used="groq", generation_time=0.0)
+
+    monkeypatch.setattr(question_pool_module.ai_generator, "generate_quiz", generate_quiz)
+    card_id = bank[next(iter(bank))][0]
+
+    asyncio.run(pool.build_for_flashcards([card_id]))
+    asyncio.run(pool.build_for_flashcards([card_id], replace=True))
+
+    assert [request.use_cache for request in requests] == [True, False]
+    rows = db.query(models.QuizQuestion).filter(models.QuizQuestion.flashcard_id == card_id).all()
+    assert [row.question_text for row in rows] == ["V2"]
+
+
+def test_uncached_requests_skip_the_lookup_but_refresh_the_cache(monkeypatch):
+    monkeypatch.setattr(ai_service.config, "QUIZ_CACHE_ENABLED", True)
+    quiz_cache.memory.clear()
+    generator = AIQuizGenerator()
+    calls = []
+
+    async def generate(request):
+        calls.append(request)
+        return QuizResponse(quiz=[variant(f"V{len(calls)}")], summary="", provider_used="groq", generation_time=0.0)
+
+    monkeypatch.setattr(generator, "_generate_uncached", generate)
+    request = QuizGenerationRequest(content="Q: q\nA: a", question_count=1, question_types=["multiple_choice"])
+
+    asyncio.run(generator.generate_quiz(request))
+    fresh = asyncio.run(generator.generate_quiz(dataclasses.replace(request, use_cache=False)))
+    cached = asyncio.run(generator.generate_quiz(request))
+
+    assert len(calls) == 2
+    assert fresh.quiz[0]["question"] == cached.quiz[0]["question"] == "V2"
+    quiz_cache.memory.clear()
@@ -0,0 +1,76 @@
+import asyncio
+
+from app.services import quiz_cache as quiz_cache_module
+from app.services.quiz_cache import LRUCache, TieredCache, make_cache_key
+
+
+def test_cache_key_ignores_field_order_but_not_values():
+    key = make_cache_key("quiz", content="c", question_count=5)
+
+    assert key == make_cache_key("quiz", question_count=5, content="c")
+    assert key != make_cache_key("quiz", content="c", question_count=6)
+    assert key != make_cache_key("explanation", content="c", question_count=5)
+    assert len(key) == 64
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2, max_bytes=1000, ttl_seconds=60)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"
+    cache.set("c", "3")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_lru_bounds_total_bytes_and_skips_oversized_values():
+    cache = LRUCache(max_entries=10, max_bytes=10, ttl_seconds=60)
+    cache.set("a", "x" * 6)
+    cache.set("b", "y" * 6)
+    cache.set("huge", "z" * 11)
+
+    assert cache.get("a") is None
+    assert cache.get("b") == "y" * 6
+    assert cache.get("huge") is None
+    assert cache.stats()["bytes"] == 6
+
+
+def test_lru_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(quiz_cache_module.time, "monotonic", lambda: now[0])
+    cache = LRUCache(max_entries=10, max_bytes=1000, ttl_seconds=60)
+    cache.set("a", "1")
+
+    now[0] += 59
+    assert cache.get("a") == "1"
+    now[0] += 2
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_tiered_cache_hands_out_independent_copies():
+    cache = TieredCache(LRUCache(max_entries=10, max_bytes=10_000, ttl_seconds=60))
+
+    async def scenario():
+        await cache.set("k", {"quiz": [{"options": ["a", "b"]}]})
+        first = await cache.get("k")
+        first["quiz"][0]["options"].reverse()
+        return await cache.get("k")
+
+    assert asyncio.run(scenario()) == {"quiz": [{"options": ["a", "b"]}]}
+
+
+def test_persistent_tier_refills_memory():
+    cache = TieredCache(LRUCache(max_entries=10, max_bytes=10_000, ttl_seconds=60), persistent=True)
+
+    async def scenario():
+        await cache.set("persisted", {"quiz": [], "summary": "S"})
+        cache.memory.clear()
+        return await cache.get("persisted")
+
+    assert asyncio.run(scenario()) == {"quiz": [], "summary": "S"}
+    assert cache.persistent_hits == 1
+    assert cache.memory.get("persisted") is not None
@@ -0,0 +1,100 @@
+from app.services.quiz_parser import IncrementalQuizParser, parse_quiz_text
+
+QUIZ = (
+    '```json\n{"quiz": ['
+    '{"question": "Capital of Canada?", "type": "multiple_choice", '
+    '"options": ["Ottawa", "Toronto", "Montreal", "Halifax"], "answer": "Ottawa"},'
+    '{"question": "Canada has ten provinces.", "type": "true_false", "options": ["True", "False"], "answer": "True"}'
+    '], "summary": "Canadian basics."}\n```'
+)
+
+
+def feed_in_chunks(parser, text, size):
+    questions = []
+    for i in range(0, len(text), size):
+        questions.extend(parser.feed(text[i:i + size]))
+    return questions
+
+
+def test_questions_are_emitted_as_they_close():
+    parser = IncrementalQuizParser()
+    first_end = QUIZ.index('"Ottawa"},') + len('"Ottawa"}')
+
+    assert parser.feed(QUIZ[:first_end - 1]) == []
+    emitted = parser.feed(QUIZ[first_end - 1:first_end])
+    assert [q["answer"] for q in emitted] == ["Ottawa"]
+    assert parser.summary is None
+
+    emitted = parser.feed(QUIZ[first_end:])
+    assert [q["type"] for q in emitted] == ["true_false"]
+    assert parser.summary == "Canadian basics."
+    assert parser.quiz_complete
+    assert parser.errors == []
+
+
+def test_any_chunking_gives_the_same_result():
+    expected = parse_quiz_text(QUIZ).questions
+    for size in (1, 2, 7, 64):
+        parser = IncrementalQuizParser()
+        assert feed_in_chunks(parser, QUIZ, size) == expected
+        assert parser.summary == "Canadian basics."
+
+
+def test_partial_input_keeps_only_closed_questions():
+    parser = IncrementalQuizParser()
+    cut = QUIZ.index('"Canada has ten')
+    questions = parser.feed(QUIZ[:cut])
+
+    assert len(questions) == 1
+    assert not parser.quiz_complete
+    assert parser.summary is None
+    assert parser.errors == []
+
+
+def test_trailing_commas_and_stray_quotes_are_repaired():
+    text = (
+        '{"quiz": ['
+        '{"question": "Which lakes are the "Great" Lakes?", "type": "short_answer", "answer": "Five",},'
+        '{"question": "Pick one", "type": "multiple_choice", "options": ["A", "B",], "answer": "A"},'
+        '], "summary": "Repaired"}'
+    )
+    parser = IncrementalQuizParser()
+    questions = feed_in_chunks(parser, text, 5)
+
+    assert [q["question"] for q in questions] == ['Which lakes are the "Great" Lakes?', "Pick one"]
+    assert questions[1]["options"] == ["A", "B"]
+    assert parser.repairs >= 3
+    assert parser.summary == "Repaired"
+    assert parser.errors == []
+
+
+def test_undecodable_question_is_skipped_and_recorded():
+    text = (
+        '{"quiz": ['
+        '{"question": "Broken", "answer": tru},'
+        '{"question": "Fine", "type": "true_false", "answer": "False"}'
+        '], "summary": "One lost"}'
+    )
+    parser = IncrementalQuizParser()
+    questions = parser.feed(text)
+
+    assert [q["question"] for q in questions] == ["Fine"]
+    assert len(parser.errors) == 1
+    assert "Broken" in parser.errors[0]
+    assert parser.summary == "One lost"
+
+
+def test_bare_array_of_questions():
+    parser = IncrementalQuizParser()
+    questions = parser.feed('Here you go: [{"question": "Q1", "answer": "A1"}, {"question": "Q2", "answer": "A2"}]')
+
+    assert [q["question"] for q in questions] == ["Q1", "Q2"]
+    assert parser.quiz_complete
+
+
+def test_parse_quiz_text_salvages_malformed_documents():
+    parsed = parse_quiz_text('{"quiz": [{"question": "Q1", "answer": "A1",}, {"question": "Q2", "answer": nope}], "summary": "S"}')
+
+    assert [q["question"] for q in parsed.questions] == ["Q1"]
+    assert len(parsed.errors) == 1
+    assert parsed.summary == "S"
@@ -0,0 +1,115 @@
+import asyncio
+import json
+
+import pytest
+
+from app.services import ai_service
+from app.services.ai_providers import ChatResult
+from app.services.ai_service import AIQuizGenerator, QuizGenerationRequest, QuizResponse
+from app.services.provider_health import CircuitBreaker, provider_breakers
+from app.services.quiz_cache import quiz_cache
+
+
+class FakeClient:
+    """Answers chat calls from a list of canned completions"""
+
+    name = "groq"
+    is_configured = True
+
+    def __init__(self, *completions):
+        self.completions = list(completions)
+        self.prompts = []
+
+    async def chat(self, messages, **kwargs):
+        self.prompts.append(messages[-1]["content"])
+        return ChatResult(text=self.completions.pop(0))
+
+
+def completion(*questions):
+    return json.dumps({"quiz": list(questions), "summary": "S"})
+
+
+def mc(question, answer="Paris", options=("Paris", "Rome", "Oslo", "Bern")):
+    return {"question": question, "type": "multiple_choice", "options": list(options), "answer": answer}
+
+
+@pytest.fixture
+def generator(monkeypatch):
+    monkeypatch.setitem(provider_breakers, "groq", CircuitBreaker("groq"))
+    quiz_cache.memory.clear()
+    yield AIQuizGenerator()
+    quiz_cache.memory.clear()
+
+
+def test_validation_normalises_and_rejects_unanswerable_questions(generator):
+    parsed = generator._parse_response(completion(
+        {"question": "Sky is blue", "type": "True-False", "answer": "true"},
+        mc("Capital of France?", answer="b) paris", options=("A) Paris", "B) Rome", "C) rome")),
+        mc("Capital of Spain?", answer="Madrid"),
+        {"question": "No answer", "type": "short_answer"},
+    ))
+
+    assert [q["question"] for q in parsed["quiz"]] == ["Sky is blue", "Capital of France?"]
+    assert parsed["quiz"][0]["type"] == "true_false"
+    assert parsed["quiz"][0]["answer"] == "True"
+    assert sorted(parsed["quiz"][1]["options"]) == ["Paris", "Rome"]
+    assert parsed["quiz"][1]["answer"] == "Paris"
+    assert len(parsed["rejected"]) == 2
+
+
+def test_nothing_usable_raises(generator):
+    with pytest.raises(ValueError):
+        generator._parse_response(completion(mc("Capital of Spain?", answer="Madrid")))
+
+
+def test_repair_asks_only_for_the_missing_questions(generator):
+    client = FakeClient(
+        completion(mc("Q1"), mc("Q2")),
+        # The repair repeats an accepted question, which is dropped
+        completion(mc("q1!"), mc("Q3")),
+    )
+    request = QuizGenerationRequest(content="Europe", question_count=3, question_types=["multiple_choice"])
+
+    result = asyncio.run(generator._complete_with_retry(client, request))
+
+    assert [q["question"] for q in result["quiz"]] == ["Q1", "Q2", "Q3"]
+    assert result["repair_rounds"] == 1
+    assert "ALREADY ASKED" in client.prompts[1]
+    assert "- Q1" in client.prompts[1]
+
+
+def test_short_quiz_is_returned_but_not_cached(generator, monkeypatch):
+    monkeypatch.setattr(ai_service.config, "QUIZ_CACHE_ENABLED", True)
+    calls = []
+
+    async def short_generation(request):
+        calls.append(request)
+        return QuizResponse(quiz=[mc("Only one")], summary="", provider_used="groq", generation_time=0.0)
+
+    monkeypatch.setattr(generator, "_generate_uncached", short_generation)
+    request = QuizGenerationRequest(content="Europe", question_count=3, question_types=["multiple_choice"])
+
+    first = asyncio.run(generator.generate_quiz(request))
+    second = asyncio.run(generator.generate_quiz(request))
+
+    assert len(first.quiz) == len(second.quiz) == 1
+    assert len(calls) == 2
+    assert asyncio.run(quiz_cache.get(generator._cache_key(request))) is None
+
+
+def test_full_quiz_is_cached(generator, monkeypatch):
+    monkeypatch.setattr(ai_service.config, "QUIZ_CACHE_ENABLED", True)
+    calls = []
+
+    async def full_generation(request):
+        calls.append(request)
+        return QuizResponse(quiz=[mc("Q1"), mc("Q2")], summary="", provider_used="groq", generation_time=0.0)
+
+    monkeypatch.setattr(generator, "_generate_uncached", full_generation)
+    request = QuizGenerationRequest(content="Europe", question_count=2, question_types=["multiple_choice"])
+
+    asyncio.run(generator.generate_quiz(request))
+    cached = asyncio.run(generator.generate_quiz(request))
+
+    assert len(calls) == 1
+    assert cached.metadata["cache_hit"]
@@ -0,0 +1,69 @@
+from collections import Counter
+
+import pytest
+
+from app.services.stratified_sampling import stratified_sample
+
+
+def ids(flashcards):
+    return [flashcard.id for flashcard in flashcards]
+
+
+def per_chapter(flashcards):
+    return Counter(flashcard.chapter_id for flashcard in flashcards)
+
+
+def test_same_seed_same_cards(db, bank):
+    first = ids(stratified_sample(db, 12, per_chapter=2, seed=42))
+    assert len(first) == len(set(first)) == 12
+    assert ids(stratified_sample(db, 12, per_chapter=2, seed=42)) == first
+    assert ids(stratified_sample(db, 12, per_chapter=2, seed=43)) != first
+
+
+def test_unseeded_draws_vary(db, bank):
+    draws = {tuple(sorted(ids(stratified_sample(db, 12, per_chapter=2)))) for _ in range(5)}
+    assert len(draws) > 1
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_every_chapter_gets_its_quota(db, bank, seed):
+    chosen = stratified_sample(db, 10, per_chapter=3, seed=seed)
+    counts = per_chapter(chosen)
+    assert len(chosen) == 10
+    assert set(counts) == set(bank)
+    assert all(counts[chapter_id] >= 3 for chapter_id in bank)
+
+
+def test_quota_is_capped_by_chapter_size(db, bank):
+    smallest = min(bank, key=lambda chapter_id: len(bank[chapter_id]))
+    chosen = stratified_sample(db, 30, per_chapter=8, seed=9)
+    counts = per_chapter(chosen)
+    assert len(chosen) == 30
+    assert counts[smallest] == len(bank[smallest])
+    assert all(counts[chapter_id] >= 8 for chapter_id in bank if chapter_id != smallest)
+
+
+def test_chapter_filter(db, bank):
+    chapter_id = next(iter(bank))
+    chosen = stratified_sample(db, 7, chapter_id=chapter_id, seed=1)
+    assert len(chosen) == 7
+    assert set(per_chapter(chosen)) == {chapter_id}
+
+
+def test_more_than_the_bank_returns_every_card(db, bank):
+    total = sum(len(cards) for cards in bank.values())
+    assert sorted(ids(stratified_sample(db, total + 10, per_chapter=2, seed=1))) == sorted(
+        card_id for cards in bank.values() for card_id in cards
+    )
+
+
+def test_heavier_cards_are_drawn_more_often(db, bank):
+    chapter_id = next(iter(bank))
+    weights = {flashcard.id: flashcard.weight for flashcard in stratified_sample(db, 1000, chapter_id=chapter_id)}
+    draws = Counter()
+    for seed in range(300):
+        for flashcard in stratified_sample(db, 3, chapter_id=chapter_id, seed=seed):
+            draws[weights[flashcard.id]] += 1
+    cards_per_weight = Counter(weights.values())
+    rate = {weight: draws[weight] / cards_per_weight[weight] for weight in cards_per_weight}
+    assert rate[2.0] > rate[1.0] > rate[0.5]